@@ -9,6 +9,8 @@ License: GPLV2
 """
 
 import asyncio
+import bisect
+import sys
 import socket
 import ssl
 import math
@@ -18,15 +20,38 @@ import random
 import json
 import os
 import configparser
+import shutil
+import signal
+import functools
+import heapq
+import inspect
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
+# Async MySQL drivers: aiomysql (default) or asyncmy (Cython, same API), chosen with sql_driver
+SQL_DRIVERS = {}
 try:
-    import mysql.connector
-    from mysql.connector import Error
-    MYSQL_AVAILABLE = True
+    import aiomysql
+    SQL_DRIVERS['aiomysql'] = aiomysql
 except ImportError:
-    MYSQL_AVAILABLE = False
-    print("Warning: mysql-connector-python not available. SQL backend disabled.")
+    pass
+try:
+    import asyncmy
+    SQL_DRIVERS['asyncmy'] = asyncmy
+except ImportError:
+    pass
+MYSQL_AVAILABLE = bool(SQL_DRIVERS)
+if not MYSQL_AVAILABLE:
+    print("Warning: no MySQL driver (aiomysql or asyncmy) available. SQL backend disabled.")
+
+# Optional faster parser for the JSON player data file
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Import language manager
 try:
@@ -36,260 +61,640 @@ except ImportError:
     LANG_AVAILABLE = False
     print("Warning: language_manager not available. Multilanguage support disabled.")
 
+@functools.lru_cache(maxsize=1024)
+def normalize_channel_name(channel: str) -> str:
+    """Normalize an IRC channel name for use as a key (channels are case-insensitive)"""
+    return channel.strip().lower()
+
+@functools.lru_cache(maxsize=4096)
+def normalize_nick_name(nick: str) -> str:
+    """Normalize an IRC nick for comparison (nicks are case-insensitive)"""
+    return nick.lower().strip()
+
+def parse_nick_list(value: str) -> frozenset:
+    """Parse a comma-separated list of nicks (owner/admin settings) into a lowercased set"""
+    return frozenset(n.strip().lower() for n in value.split(',') if n.strip())
+
+def bare_channel_name(channel: str) -> str:
+    """Normalize a channel name and strip its prefix characters (#, &, +, @)"""
+    return channel.strip().lstrip('#&+@').lower()
+
+class ChannelCache:
+    """Channel membership for every network: {network: {channel: set(users)}}"""
+    def __init__(self):
+        self._networks = {}
+        self._indexes = {}  # {network: {bare channel name: channel key}}
+    
+    def view(self, network_name: str) -> 'ChannelView':
+        """Return the {channel: set(users)} mapping for one network"""
+        return ChannelView(self._networks.setdefault(network_name, {}),
+                           self._indexes.setdefault(network_name, {}))
+
+class ChannelView(MutableMapping):
+    """Per-network view of a ChannelCache; channel keys are normalized on every access"""
+    __slots__ = ('_channels', '_index')
+    
+    def __init__(self, channels: dict, index: dict):
+        self._channels = channels
+        self._index = index
+    
+    def __getitem__(self, channel):
+        return self._channels[normalize_channel_name(channel)]
+    
+    def __setitem__(self, channel, users):
+        key = normalize_channel_name(channel)
+        self._channels[key] = users
+        self._index[bare_channel_name(key)] = key
+    
+    def __delitem__(self, channel):
+        key = normalize_channel_name(channel)
+        del self._channels[key]
+        bare = bare_channel_name(key)
+        if self._index.get(bare) == key:
+            del self._index[bare]
+    
+    def find(self, channel):
+        """Return the key of a tracked channel, ignoring prefixes, or None"""
+        return self._index.get(bare_channel_name(channel))
+    
+    def __contains__(self, channel):
+        return normalize_channel_name(channel) in self._channels
+    
+    def __iter__(self):
+        return iter(self._channels)
+    
+    def __len__(self):
+        return len(self._channels)
+
 class NetworkConnection:
     """Represents a connection to a single IRC network"""
-    def __init__(self, name: str, config: dict):
+    def __init__(self, name: str, config: dict, channel_cache: ChannelCache = None):
         self.name = name
         self.config = config
         self.sock = None
+        self.reader = None
+        self.writer = None
         self.ssl_context = None
         self.registered = False
         self.motd_timeout_triggered = False
         self.message_count = 0
         self.motd_message_count = 0
         self.nick = config['bot_nick'].split(',')[0]
-        self.channels = {}  # {channel: set(users)}
-        self.channel_next_spawn = {}
-        self.channel_pre_notice = {}
-        self.channel_notice_sent = {}
-        self.channel_last_spawn = {}
+        self.channels = (channel_cache or ChannelCache()).view(name)  # {channel: set(users)}
+        self._channel_names = {}  # {raw channel name: normalized name}
+        self._channel_keys = {}  # {raw channel name: "network:channel" key}
+        self.channel_schedule = {}  # {normalized channel: ChannelSchedule}
         self.last_despawn_check = 0
+        self.duck_spawn_heap = []  # heap of (spawn_time, channel_key), oldest duck first
+        self.last_send_time = 0.0  # time.monotonic() of the last line sent (rate limiting)
+        self.refresh_config()
+    
+    def refresh_config(self):
+        """Rebuild the values parsed from config (call after the config changes)"""
+        self._owners = parse_nick_list(self.config.get('owner', ''))
+        self._admins = parse_nick_list(self.config.get('admin', ''))
+        self.channel_list = [c.strip() for c in self.config.get('channel', '').split(',') if c.strip()]
+        self.perform_commands = [c.strip() for c in self.config.get('perform', '').split(';') if c.strip()]
+    
+    def normalized_channel(self, channel: str) -> str:
+        """Return the canonical (normalized, interned) form of a channel name, cached per network"""
+        canonical = self._channel_names.get(channel)
+        if canonical is None:
+            if len(self._channel_names) >= 1024:
+                self._channel_names.clear()
+            canonical = self._channel_names[channel] = sys.intern(normalize_channel_name(channel))
+        return canonical
+    
+    def channel_key(self, channel: str) -> str:
+        """Return the network-prefixed key for a channel ("network:#channel"), cached per network"""
+        key = self._channel_keys.get(channel)
+        if key is None:
+            if len(self._channel_keys) >= 1024:
+                self._channel_keys.clear()
+            key = self._channel_keys[channel] = sys.intern(f"{self.name}:{self.normalized_channel(channel)}")
+        return key
+    
+    def schedule_for(self, channel: str) -> 'ChannelSchedule':
+        """Return the spawn schedule for a channel, creating an empty one if needed"""
+        channel = self.normalized_channel(channel)
+        schedule = self.channel_schedule.get(channel)
+        if schedule is None:
+            schedule = self.channel_schedule[channel] = ChannelSchedule()
+        return schedule
+
+class ChannelSchedule:
+    """Automatic spawn timing for one channel"""
+    __slots__ = ('last_spawn', 'next_spawn', 'pre_notice', 'notice_sent')
+    
+    def __init__(self):
+        self.last_spawn = 0           # time of the last automatic spawn (0 = never)
+        self.next_spawn = None        # when the next duck is due (None = not scheduled)
+        self.pre_notice = None        # when duck detector notices go out
+        self.notice_sent = False      # pre-notice already sent for next_spawn
+
+class DuckList:
+    """Active ducks in one channel, oldest first, stored as parallel arrays (one slot per duck)"""
+    __slots__ = ('spawn', 'gold', 'hp', 'revealed', 'hissed')
+    
+    def __init__(self):
+        self.spawn = array('d')    # spawn_time
+        self.gold = bytearray()    # 1 if golden
+        self.hp = array('h')       # remaining health
+        self.revealed = bytearray()  # golden duck has been revealed
+        self.hissed = bytearray()    # duck turned hostile on a failed !bef
+    
+    def __len__(self):
+        return len(self.spawn)
+    
+    def append(self, golden: bool, spawn_time: float):
+        """Add a duck at the back of the queue"""
+        self.spawn.append(spawn_time)
+        self.gold.append(1 if golden else 0)
+        self.hp.append(5 if golden else 1)
+        self.revealed.append(0)
+        self.hissed.append(0)
+    
+    def remove(self, index=0):
+        """Remove the duck in slot index, or a slice of slots (default: the oldest)"""
+        del self.spawn[index]
+        del self.gold[index]
+        del self.hp[index]
+        del self.revealed[index]
+        del self.hissed[index]
+    
+    def expire(self, cutoff: float) -> List[float]:
+        """Remove every duck spawned at or before cutoff; return their spawn times"""
+        # Ducks are appended in spawn order, so the expired ones are a prefix
+        count = 0
+        for spawn_time in self.spawn:
+            if spawn_time > cutoff:
+                break
+            count += 1
+        if not count:
+            return []
+        spawn_times = self.spawn[:count].tolist()
+        self.remove(slice(0, count))
+        return spawn_times
+
+@functools.lru_cache(maxsize=256)
+def _batch_update_sql(columns: Tuple[str, ...], row_count: int) -> str:
+    """UPDATE ... JOIN text for row_count channel_stats rows that all change these columns.
+    The new values arrive as a UNION ALL derived table, so each row is matched once by key
+    instead of every column's CASE scanning every row."""
+    first = ', '.join(['%s AS player_id', '%s AS network_name', '%s AS channel_name'] + [f'%s AS {column}' for column in columns])
+    rest = ', '.join(['%s'] * (3 + len(columns)))
+    rows = ' UNION ALL '.join([f"SELECT {first}"] + [f"SELECT {rest}"] * (row_count - 1))
+    set_clauses = ', '.join(f"cs.{column} = v.{column}" for column in columns)
+    return f"""UPDATE channel_stats cs
+                JOIN ({rows}) v
+                  ON cs.player_id = v.player_id AND cs.network_name = v.network_name AND cs.channel_name = v.channel_name
+                SET {set_clauses}"""
+
+class ChannelStatsRow(dict):
+    """A channel_stats row handed out for editing; base holds the values it was read with"""
+    __slots__ = ('base',)
+    
+    def __init__(self, stats):
+        super().__init__(stats)
+        self.base = dict(stats)
 
 class SQLBackend:
-    """SQL database backend for player data storage"""
+    """SQL database backend for player data storage
     
-    def __init__(self, host, port, database, user, password):
+    Channel names passed in must already be normalized (see normalize_channel_name).
+    """
+    
+    PLAYER_ID_CACHE_SIZE = 4096
+    FLUSH_BATCH_SIZE = 200
+    STATS_CACHE_SIZE = 10000
+    STATS_CACHE_TTL = 3600  # Seconds before a cached channel_stats row is re-read
+    RECONNECT_INTERVAL = 30  # Minimum seconds between attempts to create the pool
+    CONNECTION_LOST_ERRORS = (2006, 2013)  # CR_SERVER_GONE_ERROR, CR_SERVER_LOST
+    
+    # Valid fields that exist in the SQL schema
+    _VALID_FIELDS = frozenset({
+        'xp', 'ducks_shot', 'golden_ducks', 'misses', 'accidents', 'best_time',
+        'total_reaction_time', 'shots_fired', 'last_duck_time', 'wild_fires',
+        'confiscated', 'jammed', 'sabotaged', 'ammo', 'magazines', 'ap_shots',
+        'explosive_shots', 'bread_uses', 'befriended_ducks', 'trigger_lock_until',
+        'trigger_lock_uses', 'grease_until', 'silencer_until', 'sunglasses_until',
+        'ducks_detector_until', 'mirror_until', 'sand_until', 'soaked_until',
+        'life_insurance_until', 'liability_insurance_until', 'mag_upgrade_level',
+        'mag_capacity_level', 'magazine_capacity', 'magazines_max',
+        'clover_until', 'clover_bonus', 'brush_until', 'sight_next_shot',
+        'egged', 'last_egg_time'
+    })
+    # Running totals: concurrent edits to these are merged as deltas (floored at 0) instead of
+    # overwriting each other
+    _COUNTER_FIELDS = frozenset({
+        'xp', 'ducks_shot', 'golden_ducks', 'misses', 'accidents', 'total_reaction_time',
+        'shots_fired', 'wild_fires', 'befriended_ducks', 'ammo', 'magazines'
+    })
+    
+    def __init__(self, host, port, database, user, password, pool_size=8, driver='aiomysql'):
         if not MYSQL_AVAILABLE:
-            raise ImportError("mysql-connector-python not available")
-        
-        self.connection = None
+            raise ImportError("no MySQL driver (aiomysql or asyncmy) available")
+        if driver not in SQL_DRIVERS:
+            fallback = next(iter(SQL_DRIVERS))
+            print(f"Warning: SQL driver '{driver}' not available, using {fallback}")
+            driver = fallback
+        
+        self.driver = SQL_DRIVERS[driver]
+        self.error_class = self.driver.Error
+        self.pool = None
+        self._connect_lock = asyncio.Lock()
+        self._last_connect_attempt = 0
         self.host = host
         self.port = port
         self.database = database
         self.user = user
         self.password = password
-        self.connect()
+        self.pool_size = pool_size
+        self._player_id_cache = OrderedDict()  # {username: player_id}, LRU order
+        self._dirty = {}     # {(player_id, network, channel): {field: value}} awaiting flush()
+        self._inflight = {}  # Rows currently being written by flush()
+        self._flush_lock = asyncio.Lock()
+        self._table_columns = {}  # {table: [column, ...]} from information_schema
+        self._stats_cache = OrderedDict()  # {(player_id, network, channel): (loaded_at, stats)}, LRU order
     
-    def connect(self):
-        """Establish connection to MariaDB/MySQL"""
+    async def init(self):
+        """Create the connection pool (must be called from the event loop)"""
+        self._last_connect_attempt = time.time()
         try:
-            self.connection = mysql.connector.connect(
+            self.pool = await self.driver.create_pool(
                 host=self.host,
                 port=self.port,
-                database=self.database,
+                db=self.database,
                 user=self.user,
                 password=self.password,
-                autocommit=True
+                autocommit=True,
+                minsize=1,
+                maxsize=self.pool_size,
+                pool_recycle=3600
             )
-            if self.connection.is_connected():
-                print(f"Connected to MariaDB database: {self.database}")
-        except Error as e:
+            print(f"Connected to MariaDB database: {self.database} (driver: {self.driver.__name__})")
+        except (self.error_class, OSError) as e:
             print(f"Error connecting to MariaDB: {e}")
-            self.connection = None
+            self.pool = None
+            return
+        await self.ensure_indexes()
     
-    def reconnect(self):
-        """Reconnect if connection is lost"""
-        if self.connection and self.connection.is_connected():
+    async def ensure_indexes(self):
+        """Add the unique (player_id, network_name, channel_name) key to channel_stats if it is missing"""
+        query = """SELECT INDEX_NAME FROM information_schema.STATISTICS
+                   WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'channel_stats' AND NON_UNIQUE = 0
+                   GROUP BY INDEX_NAME
+                   HAVING GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) = 'player_id,network_name,channel_name'"""
+        result = await self.execute_query(query, fetch=True, dictionary=False)
+        if result is None or result:
             return
-        self.connect()
+        print("Adding missing unique key on channel_stats (player_id, network_name, channel_name)")
+        await self.execute_query("""CREATE UNIQUE INDEX unique_player_network_channel
+                                    ON channel_stats (player_id, network_name, channel_name)""")
     
-    def execute_query(self, query, params=None, fetch=False):
-        """Execute a SQL query safely"""
-        try:
-            if not self.connection or not self.connection.is_connected():
-                self.reconnect()
-                if not self.connection:
-                    return None
-            
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(query, params)
-            
-            if fetch:
-                result = cursor.fetchall()
-                cursor.close()
-                return result
-            else:
-                cursor.close()
-                return True
-        except Error as e:
-            print(f"SQL Error: {e}")
-            print(f"SQL Query: {query}")
-            print(f"SQL Params: {params}")
-            return None
+    async def reconnect(self):
+        """Create the pool if it could not be established, at most once per RECONNECT_INTERVAL"""
+        async with self._connect_lock:
+            if self.pool or time.time() - self._last_connect_attempt < self.RECONNECT_INTERVAL:
+                return
+            await self.init()
+    
+    async def _execute(self, query, params, result, cursor_class=None, retry=True):
+        """Run a query on a pooled connection.
+        result: 'fetch' (rows), 'lastrowid', 'rowcount' or 'ok' (True). Returns None on error.
+        If the pooled connection turns out to be dead the query is retried once on a fresh one
+        (pass retry=False for statements that must not run twice).
+        """
+        for attempt in range(2 if retry else 1):
+            try:
+                if not self.pool:
+                    await self.reconnect()
+                    if not self.pool:
+                        return None
+                
+                async with self.pool.acquire() as conn:
+                    async with conn.cursor(cursor_class or self.driver.cursors.DictCursor) as cursor:
+                        await cursor.execute(query, params)
+                        
+                        if result == 'fetch':
+                            return await cursor.fetchall()
+                        if result == 'lastrowid':
+                            return cursor.lastrowid
+                        if result == 'rowcount':
+                            return cursor.rowcount
+                        return True
+            except self.error_class as e:
+                # The pool drops closed connections on release, so a retry gets a fresh one
+                if attempt == 0 and retry and e.args and e.args[0] in self.CONNECTION_LOST_ERRORS:
+                    print(f"SQL connection lost ({e}), retrying")
+                    continue
+                print(f"SQL Error: {e}")
+                print(f"SQL Query: {query}")
+                print(f"SQL Params: {params}")
+                return None
+    
+    async def execute_query(self, query, params=None, fetch=False, dictionary=True):
+        """Execute a SQL query safely (dictionary=False returns rows as tuples)"""
+        return await self._execute(query, params, 'fetch' if fetch else 'ok',
+                                   None if dictionary else self.driver.cursors.Cursor)
+    
+    async def execute_insert(self, query, params=None):
+        """Execute an INSERT and return cursor.lastrowid (None on error)"""
+        return await self._execute(query, params, 'lastrowid', self.driver.cursors.Cursor)
+    
+    async def execute_rowcount(self, query, params=None):
+        """Execute a write and return the number of affected rows (None on error)"""
+        return await self._execute(query, params, 'rowcount', self.driver.cursors.Cursor)
     
-    def get_player_id(self, username):
+    async def get_table_columns(self, table):
+        """Return the column names of a table in schema order (cached after first lookup)"""
+        if table not in self._table_columns:
+            query = """SELECT COLUMN_NAME FROM information_schema.COLUMNS
+                       WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                       ORDER BY ORDINAL_POSITION"""
+            result = await self.execute_query(query, (table,), fetch=True, dictionary=False)
+            if not result:
+                return []
+            self._table_columns[table] = [row[0] for row in result]
+        return self._table_columns[table]
+    
+    async def get_player_id(self, username):
         """Get or create player ID"""
-        query = "SELECT id FROM players WHERE username = %s"
-        result = self.execute_query(query, (username,), fetch=True)
+        player_id = self._player_id_cache.get(username)
+        if player_id is not None:
+            self._player_id_cache.move_to_end(username)
+            return player_id
+        
+        # Get-or-create in one round-trip: on duplicate, LAST_INSERT_ID(id) makes
+        # lastrowid report the existing row's id
+        query = """INSERT INTO players (username) VALUES (%s)
+                   ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)"""
+        player_id = await self.execute_insert(query, (username,))
+        if not player_id:
+            return None
         
-        if result:
-            return result[0]['id']
-        else:
-            # Create new player
-            query = "INSERT INTO players (username) VALUES (%s)"
-            if self.execute_query(query, (username,)):
-                return self.get_player_id(username)
-        return None
+        self._player_id_cache[username] = player_id
+        if len(self._player_id_cache) > self.PLAYER_ID_CACHE_SIZE:
+            self._player_id_cache.popitem(last=False)
+        return player_id
     
-    def get_channel_stats(self, username, network_name, channel_name):
+    async def get_channel_stats(self, username, network_name, channel_name):
         """Get channel stats for a player"""
-        player_id = self.get_player_id(username)
+        player_id = await self.get_player_id(username)
         if not player_id:
             return None
         
-        # Normalize channel name (IRC channels are case-insensitive)
-        channel_name = channel_name.strip().lower()
+        key = (player_id, network_name, channel_name)
+        cached = self._stats_cache.get(key)
+        if cached is not None:
+            loaded_at, stats = cached
+            if time.time() - loaded_at < self.STATS_CACHE_TTL:
+                self._stats_cache.move_to_end(key)
+                return ChannelStatsRow(stats)  # Callers mutate the dict they get back
+            del self._stats_cache[key]
+        
+        # Capture buffered writes before the SELECT so a flush landing mid-query can't hide them
+        pending = self.get_pending_changes(key)
         
         query = """SELECT * FROM channel_stats 
                    WHERE player_id = %s AND network_name = %s AND channel_name = %s"""
-        result = self.execute_query(query, (player_id, network_name, channel_name), fetch=True)
+        result = await self.execute_query(query, key, fetch=True)
         
-        if result:
-            stats = result[0]
-            return stats
-        else:
+        if not result:
             # Create new channel stats with proper defaults
             # Level 1 (XP 0) should start with magazine_capacity=6, magazines_max=2
+            # On the unique (player_id, network_name, channel_name) key a concurrent create is a no-op,
+            # and LAST_INSERT_ID(id) reports the row's id either way
             query = """INSERT INTO channel_stats 
                        (player_id, network_name, channel_name, magazine_capacity, magazines_max) 
-                       VALUES (%s, %s, %s, 6, 2)"""
-            if self.execute_query(query, (player_id, network_name, channel_name)):
-                return self.get_channel_stats(username, network_name, channel_name)
-        return None
+                       VALUES (%s, %s, %s, 6, 2)
+                       ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)"""
+            row_id = await self.execute_insert(query, key)
+            if not row_id:
+                return None
+            result = await self.execute_query("""SELECT * FROM channel_stats WHERE id = %s""", (row_id,), fetch=True)
+            if not result:
+                return None
+        
+        stats = result[0]
+        stats.update(pending)
+        stats.update(self._dirty.get(key, {}))
+        self._stats_cache[key] = (time.time(), stats)
+        if len(self._stats_cache) > self.STATS_CACHE_SIZE:
+            self._stats_cache.popitem(last=False)
+        return ChannelStatsRow(stats)
     
-    def update_channel_stats(self, username, network_name, channel_name, stats_dict):
+    async def update_channel_stats(self, username, network_name, channel_name, stats_dict):
         """Update channel stats for a player"""
-        player_id = self.get_player_id(username)
+        base = getattr(stats_dict, 'base', None)
+        if base is not None and stats_dict == base:
+            # Untouched since get_channel_stats handed it out (one C-level dict compare)
+            return True
+        player_id = await self.get_player_id(username)
         if not player_id:
             print(f"ERROR: No player_id found for {username}")
             return False
         
-        # Normalize channel name (IRC channels are case-insensitive)
-        channel_name = channel_name.strip().lower()
-        
-        # Valid fields that exist in the SQL schema
-        valid_fields = {
-            'xp', 'ducks_shot', 'golden_ducks', 'misses', 'accidents', 'best_time',
-            'total_reaction_time', 'shots_fired', 'last_duck_time', 'wild_fires',
-            'confiscated', 'jammed', 'sabotaged', 'ammo', 'magazines', 'ap_shots',
-            'explosive_shots', 'bread_uses', 'befriended_ducks', 'trigger_lock_until',
-            'trigger_lock_uses', 'grease_until', 'silencer_until', 'sunglasses_until',
-            'ducks_detector_until', 'mirror_until', 'sand_until', 'soaked_until',
-            'life_insurance_until', 'liability_insurance_until', 'mag_upgrade_level',
-            'mag_capacity_level', 'magazine_capacity', 'magazines_max',
-            'clover_until', 'clover_bonus', 'brush_until', 'sight_next_shot',
-            'egged', 'last_egg_time'
-        }
-        
-        # Build dynamic update query - only include valid fields
-        set_clauses = []
+        key = (player_id, network_name, channel_name)
+        cached = self._stats_cache.get(key)
+        if base is None:
+            changes = {field: value for field, value in stats_dict.items() if field in self._VALID_FIELDS}
+        else:
+            # A row from get_channel_stats: only write what this caller changed since reading it,
+            # and add counter changes on top of the current value so concurrent commands both count
+            current = cached[1] if cached is not None else self._dirty.get(key, {})
+            changes = {}
+            for field, value in stats_dict.items():
+                if field not in self._VALID_FIELDS:
+                    continue
+                old = base.get(field)
+                if value == old:
+                    continue
+                if field in self._COUNTER_FIELDS and isinstance(old, (int, float)) and isinstance(value, (int, float)):
+                    # Floor at 0 like safe_xp_operation: two overlapping penalties can't take XP
+                    # (or two shots the last bullet) below zero
+                    value = max(0, current.get(field, old) + (value - old))
+                changes[field] = value
+            stats_dict.update(changes)
+            base.update(changes)
+        
+        # Buffer the changes; flush() writes them in one batched UPDATE
+        if changes:
+            self._dirty.setdefault(key, {}).update(changes)
+            # Write through to the cached row so reads don't need the database
+            if cached is not None:
+                cached[1].update(changes)
+        return True
+    
+    def invalidate_stats_cache(self, network_name=None, channel_name=None):
+        """Drop cached channel_stats rows, optionally only those for one network/channel"""
+        if network_name is None:
+            self._stats_cache.clear()
+            return
+        for key in [k for k in self._stats_cache
+                    if k[1] == network_name and (channel_name is None or k[2] == channel_name)]:
+            del self._stats_cache[key]
+    
+    def get_pending_changes(self, key):
+        """Return buffered (not yet written) changes for a (player_id, network, channel) row"""
+        pending = dict(self._inflight.get(key, {}))
+        pending.update(self._dirty.get(key, {}))
+        return pending
+    
+    def _build_batch_update(self, columns, keys, pending):
+        """Build one UPDATE ... JOIN for rows in keys, which all change exactly these columns"""
         params = []
-        
-        for key, value in stats_dict.items():
-            if key in valid_fields:
-                set_clauses.append(f"{key} = %s")
+        for key in keys:
+            changes = pending[key]
+            params.extend(key)
+            for column in columns:
+                value = changes[column]
                 # Convert Unix timestamp to DATETIME string for last_duck_time
-                if key == 'last_duck_time' and isinstance(value, (int, float)):
-                    from datetime import datetime
+                if column == 'last_duck_time' and isinstance(value, (int, float)):
                     value = datetime.fromtimestamp(value).strftime('%Y-%m-%d %H:%M:%S')
                 params.append(value)
         
-        if not set_clauses:
-            return True  # Nothing to update
-        
-        params.extend([player_id, network_name, channel_name])
-        
-        query = f"""UPDATE channel_stats 
-                    SET {', '.join(set_clauses)}
-                    WHERE player_id = %s AND network_name = %s AND channel_name = %s"""
-        
-        return self.execute_query(query, params)
+        return _batch_update_sql(columns, len(keys)), params
+    
+    async def flush(self):
+        """Write all buffered channel_stats changes, FLUSH_BATCH_SIZE rows per statement.
+        A call made while another flush is writing waits for it, so returning means the rows are in MySQL.
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return True
+            
+            pending, self._dirty = self._dirty, {}
+            self._inflight = pending
+            unwritten = set(pending)
+            success = True
+            try:
+                # Group rows by the set of columns they change so every statement has a fixed shape
+                groups = {}
+                for key, changes in pending.items():
+                    groups.setdefault(tuple(sorted(changes)), []).append(key)
+                
+                for columns, keys in groups.items():
+                    for i in range(0, len(keys), self.FLUSH_BATCH_SIZE):
+                        batch = keys[i:i + self.FLUSH_BATCH_SIZE]
+                        query, params = self._build_batch_update(columns, batch, pending)
+                        if not await self.execute_query(query, params):
+                            success = False
+                            self._requeue(batch, pending)
+                        unwritten.difference_update(batch)
+            except BaseException:
+                # Driver errors outside error_class, or cancellation at shutdown: keep what wasn't written
+                self._requeue(unwritten, pending)
+                raise
+            finally:
+                self._inflight = {}
+            return success
     
-    def get_all_players(self):
-        """Get all players with their channel stats"""
+    def _requeue(self, keys, pending):
+        """Put unwritten rows back into _dirty underneath anything buffered since"""
+        for key in keys:
+            changes = pending[key]
+            changes.update(self._dirty.get(key, {}))
+            self._dirty[key] = changes
+    
+    async def get_all_players(self):
+        """Get all players with their channel stats, streamed row by row"""
         query = """SELECT p.username, cs.network_name, cs.channel_name, cs.* 
                    FROM players p 
                    LEFT JOIN channel_stats cs ON p.id = cs.player_id"""
-        result = self.execute_query(query, fetch=True)
+        excluded = ('id', 'username', 'player_id', 'network_name', 'channel_name', 'created_at', 'updated_at')
         
         players = {}
-        for row in result:
-            username = row['username']
-            if username not in players:
-                players[username] = {'channel_stats': {}}
+        try:
+            if not self.pool:
+                await self.reconnect()
+                if not self.pool:
+                    return players
             
-            if row['network_name'] and row['channel_name']:
-                channel_key = f"{row['network_name']}:{row['channel_name']}"
-                # Convert row to dict, excluding player-specific fields
-                stats = {k: v for k, v in row.items() 
-                        if k not in ['id', 'username', 'player_id', 'network_name', 'channel_name', 'created_at', 'updated_at']}
-                players[username]['channel_stats'][channel_key] = stats
+            async with self.pool.acquire() as conn:
+                # Unbuffered cursor: rows are read off the socket as we go instead of all at once
+                cursor = conn.cursor(self.driver.cursors.SSDictCursor)
+                if inspect.isawaitable(cursor):
+                    cursor = await cursor  # aiomysql hands back an awaitable, asyncmy the cursor itself
+                try:
+                    await cursor.execute(query)
+                    async for row in cursor:
+                        username = row['username']
+                        if username not in players:
+                            players[username] = {'channel_stats': {}}
+                        
+                        if row['network_name'] and row['channel_name']:
+                            channel_key = f"{row['network_name']}:{row['channel_name']}"
+                            # Convert row to dict, excluding player-specific fields
+                            players[username]['channel_stats'][channel_key] = {
+                                k: v for k, v in row.items() if k not in excluded}
+                    await cursor.close()
+                except (asyncio.CancelledError, self.error_class):
+                    # Closing a cursor mid-stream drains every remaining row; on timeout (wait_for
+                    # cancels us) or error, drop the connection instead so we return promptly
+                    conn.close()
+                    raise
+        except self.error_class as e:
+            print(f"SQL Error: {e}")
+            print(f"SQL Query: {query}")
         
         return players
     
-    def backup_channel_stats(self, network_name, channel_name):
+    async def backup_channel_stats(self, network_name, channel_name):
         """Backup all channel stats for a specific network/channel before clearing"""
         import uuid
-        from datetime import datetime
         
-        # Normalize channel name (IRC channels are case-insensitive)
-        channel_name = channel_name.strip().lower()
+        # Make sure buffered writes are part of the backup
+        await self.flush()
         
         # Generate unique backup ID with timestamp
         backup_id = f"{network_name}_{channel_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid.uuid4())[:8]}"
         
-        # Get all channel stats to backup
-        select_query = """SELECT * FROM channel_stats 
-                          WHERE network_name = %s AND channel_name = %s"""
-        stats_to_backup = self.execute_query(select_query, (network_name, channel_name), fetch=True)
-        
-        if not stats_to_backup:
-            return backup_id, 0  # No data to backup
-        
-        # Insert into backup table
-        backup_count = 0
-        for stat in stats_to_backup:
-            # Remove fields that don't exist in backup table and add backup_id
-            backup_data = {k: v for k, v in stat.items() if k not in ['id', 'updated_at']}
-            backup_data['backup_id'] = backup_id
-            
-            # Build INSERT query
-            columns = ', '.join(backup_data.keys())
-            placeholders = ', '.join(['%s'] * len(backup_data))
-            insert_query = f"""INSERT INTO channel_stats_backup ({columns}) VALUES ({placeholders})"""
-            
-            if self.execute_query(insert_query, list(backup_data.values())):
-                backup_count += 1
-        
-        return backup_id, backup_count
+        # Copy the rows server-side in one statement; only columns present in both tables are copied
+        stats_columns = await self.get_table_columns('channel_stats')
+        backup_columns = set(await self.get_table_columns('channel_stats_backup'))
+        columns = [c for c in stats_columns if c in backup_columns and c not in ('id', 'updated_at')]
+        if not columns:
+            return backup_id, 0
+        
+        column_list = ', '.join(columns)
+        insert_query = f"""INSERT INTO channel_stats_backup (backup_id, {column_list})
+                           SELECT %s, {column_list} FROM channel_stats
+                           WHERE network_name = %s AND channel_name = %s"""
+        # Not retried: if the connection drops after the server ran it, a retry would copy the rows twice
+        backup_count = await self._execute(insert_query, (backup_id, network_name, channel_name), 'rowcount',
+                                           self.driver.cursors.Cursor, retry=False)
+        
+        return backup_id, backup_count or 0
     
-    def restore_channel_stats(self, backup_id):
+    async def restore_channel_stats(self, backup_id):
         """Restore channel stats from a backup"""
-        # Get all backup records
-        select_query = """SELECT * FROM channel_stats_backup WHERE backup_id = %s"""
-        backup_stats = self.execute_query(select_query, (backup_id,), fetch=True)
+        # Write buffered changes first so they can't overwrite restored rows later
+        await self.flush()
         
-        if not backup_stats:
+        count_query = """SELECT COUNT(*) FROM channel_stats_backup WHERE backup_id = %s"""
+        result = await self.execute_query(count_query, (backup_id,), fetch=True, dictionary=False)
+        backup_count = result[0][0] if result else 0
+        if not backup_count:
             return 0  # No backup found
         
-        restored_count = 0
-        for stat in backup_stats:
-            # Remove backup-specific fields
-            restore_data = {k: v for k, v in stat.items() if k not in ['id', 'backup_id', 'created_at']}
-            
-            # Build INSERT query for channel_stats table (updated_at will be set automatically)
-            columns = ', '.join(restore_data.keys())
-            placeholders = ', '.join(['%s'] * len(restore_data))
-            insert_query = f"""INSERT INTO channel_stats ({columns}) VALUES ({placeholders}) 
-                              ON DUPLICATE KEY UPDATE 
-                              {', '.join([f"{k} = VALUES({k})" for k in restore_data.keys() if k not in ['player_id', 'network_name', 'channel_name']])}"""
-            
-            if self.execute_query(insert_query, list(restore_data.values())):
-                restored_count += 1
-        
-        return restored_count
+        # Copy back server-side (updated_at will be set automatically)
+        stats_columns = set(await self.get_table_columns('channel_stats'))
+        backup_columns = await self.get_table_columns('channel_stats_backup')
+        columns = [c for c in backup_columns if c in stats_columns and c not in ('id', 'backup_id', 'created_at')]
+        column_list = ', '.join(columns)
+        update_list = ', '.join(f"{c} = VALUES({c})" for c in columns if c not in ('player_id', 'network_name', 'channel_name'))
+        insert_query = f"""INSERT INTO channel_stats ({column_list})
+                           SELECT {column_list} FROM channel_stats_backup WHERE backup_id = %s
+                           ON DUPLICATE KEY UPDATE {update_list}"""
+        
+        # Restored rows may belong to any channel, so drop the whole cache
+        self.invalidate_stats_cache()
+        if await self.execute_query(insert_query, (backup_id,)):
+            return backup_count
+        return 0
     
-    def list_backups(self, network_name=None, channel_name=None):
+    async def list_backups(self, network_name=None, channel_name=None):
         """List available backups, optionally filtered by network/channel"""
         if network_name and channel_name:
             query = """SELECT DISTINCT backup_id, network_name, channel_name, created_at, COUNT(*) as player_count
@@ -313,45 +718,237 @@ class SQLBackend:
                        LIMIT 20"""
             params = ()
         
-        return self.execute_query(query, params, fetch=True)
+        return await self.execute_query(query, params, fetch=True)
     
-    def clear_channel_stats(self, network_name, channel_name, backup=True):
+    async def clear_channel_stats(self, network_name, channel_name, backup=True):
         """Clear all channel stats for a specific network/channel, optionally with backup"""
-        # Normalize channel name (IRC channels are case-insensitive)
-        channel_name = channel_name.strip().lower()
+        await self.flush()
         
         backup_id = None
         if backup:
             # Create backup first
-            backup_id, backup_count = self.backup_channel_stats(network_name, channel_name)
+            backup_id, backup_count = await self.backup_channel_stats(network_name, channel_name)
             if backup_count == 0:
                 return 0, None  # No data to clear
         
-        # First get count of affected players
-        count_query = """SELECT COUNT(DISTINCT p.id) 
-                         FROM players p 
-                         JOIN channel_stats cs ON p.id = cs.player_id 
-                         WHERE cs.network_name = %s AND cs.channel_name = %s"""
-        result = self.execute_query(count_query, (network_name, channel_name), fetch=True)
-        affected_count = result[0]['COUNT(DISTINCT p.id)'] if result else 0
-        
-        # Delete all channel stats for this network/channel
+        # Delete all channel stats for this network/channel; (player_id, network, channel) is unique,
+        # so the deleted row count is the number of affected players
         delete_query = """DELETE FROM channel_stats 
                           WHERE network_name = %s AND channel_name = %s"""
-        success = self.execute_query(delete_query, (network_name, channel_name))
-        
-        if backup and success:
-            return affected_count, backup_id
-        else:
-            return affected_count if success else 0, None
+        # Not retried: if the connection drops after the server ran it, a retry would delete 0 rows
+        # and report no players affected
+        affected_count = await self._execute(delete_query, (network_name, channel_name), 'rowcount',
+                                             self.driver.cursors.Cursor, retry=False)
+        self.invalidate_stats_cache(network_name, channel_name)
+        
+        if affected_count is None:
+            return 0, None
+        return affected_count, backup_id
     
-    def close(self):
-        """Close database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
+    async def close(self):
+        """Close all pooled database connections"""
+        if self.pool:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+# mIRC color numbers, and the prefixes colorize() emits for them
+IRC_COLORS = {
+    'white': '00', 'black': '01', 'blue': '02', 'green': '03', 'red': '04',
+    'brown': '05', 'purple': '06', 'orange': '07', 'yellow': '08', 'lime': '09',
+    'cyan': '10', 'light_cyan': '11', 'light_blue': '12', 'pink': '13', 'grey': '14', 'light_grey': '15'
+}
+IRC_FG_CODES = {name: f'\x03{code}' for name, code in IRC_COLORS.items()}
+IRC_BG_CODES = {name: f',{code}' for name, code in IRC_COLORS.items()}
+
+# Shop catalogue: (id, name, config key for the price or None if fixed, default price, description)
+SHOP_ITEMS_SPEC = (
+    (1, "Extra bullet", 'shop_extra_bullet', 7, "Adds one bullet to your gun"),
+    (2, "Refill magazine", 'shop_extra_magazine', 20, "Adds one spare magazine to your stock"),
+    (3, "AP ammo", 'shop_ap_ammo', 15, "Armor-piercing ammunition"),
+    (4, "Explosive ammo", 'shop_explosive_ammo', 25, "Explosive ammunition (damage x3)"),
+    (5, "Repurchase confiscated gun", 'shop_repurchase_gun', 40, "Buy back your confiscated weapon"),
+    (6, "Grease", 'shop_grease', 8, "Halves jamming odds for 24h"),
+    (7, "Sight", 'shop_sight', 6, "Increases accuracy for next shot"),
+    (8, "Safety Lock", 'shop_infrared_detector', 15, "Locks gun when no duck present"),
+    (9, "Silencer", 'shop_silencer', 5, "Prevents scaring ducks when shooting"),
+    (10, "Four-leaf clover", 'shop_four_leaf_clover', 13, "Extra XP for each duck shot"),
+    (11, "Sunglasses", 'shop_sunglasses', 5, "Protects against mirror dazzle"),
+    (12, "Spare clothes", 'shop_spare_clothes', 7, "Dry clothes after being soaked"),
+    (13, "Brush for gun", 'shop_brush_for_gun', 7, "Restores weapon condition"),
+    (14, "Mirror", 'shop_mirror', 7, "Dazzles target, reducing accuracy"),
+    (15, "Handful of sand", 'shop_handful_of_sand', 7, "Reduces target's gun reliability"),
+    (16, "Water bucket", 'shop_water_bucket', 10, "Soaks target, prevents hunting for 1h"),
+    (17, "Sabotage", 'shop_sabotage', 14, "Jams target's gun"),
+    (18, "Life insurance", 'shop_life_insurance', 10, "Protects against accidents"),
+    (19, "Liability insurance", 'shop_liability_insurance', 5, "Reduces accident penalties"),
+    (20, "Piece of bread", 'shop_piece_of_bread', 50, "Lures ducks"),
+    (21, "Ducks detector", 'shop_ducks_detector', 50, "Warns of next duck spawn"),
+    (22, "Upgrade Magazine", None, 200, "Increase ammo per magazine (up to 5 levels)"),
+    (23, "Extra Magazine", None, 200, "Increase max carried magazines (up to 5 levels)"),
+    (24, "Duck Call", 'shop_duck_call', 15, "Lures ducks to arrive in 60s"),
+)
+
+# Level table: (min xp, level, accuracy %, reliability %, magazine capacity, magazines,
+#               miss penalty, wild fire penalty, accident penalty)
+LEVEL_TABLE = (
+    (-5, 0, 55, 85, 6, 1,  -1, -1, -25),
+    (-4, 1, 55, 85, 6, 2,  -1, -1, -25),
+    (20, 2, 56, 86, 6, 2,  -1, -1, -25),
+    (50, 3, 57, 87, 6, 2,  -1, -1, -25),
+    (90, 4, 58, 88, 6, 2,  -1, -1, -25),
+    (140,5, 59, 89, 6, 2,  -1, -1, -25),
+    (200,6, 60, 90, 6, 2,  -1, -1, -25),
+    (270,7, 65, 93, 4, 3,  -1, -1, -25),
+    (350,8, 67, 93, 4, 3,  -1, -1, -25),
+    (440,9, 69, 93, 4, 3,  -1, -1, -25),
+    (540,10,71, 94, 4, 3,  -1, -2, -25),
+    (650,11,73, 94, 4, 3,  -1, -2, -25),
+    (770,12,73, 94, 4, 3,  -1, -2, -25),
+    (900,13,74, 95, 4, 3,  -1, -2, -25),
+    (1040,14,74,95, 4, 3,  -1, -2, -25),
+    (1190,15,75,95, 4, 3,  -1, -2, -25),
+    (1350,16,80,97, 2, 4,  -1, -2, -25),
+    (1520,17,81,97, 2, 4,  -1, -2, -25),
+    (1700,18,81,97, 2, 4,  -1, -2, -25),
+    (1890,19,82,97, 2, 4,  -1, -2, -25),
+    (2090,20,82,97, 2, 4,  -3, -5, -25),
+    (2300,21,83,98, 2, 4,  -3, -5, -25),
+    (2520,22,83,98, 2, 4,  -3, -5, -25),
+    (2750,23,84,98, 2, 4,  -3, -5, -25),
+    (2990,24,84,98, 2, 4,  -3, -5, -25),
+    (3240,25,85,98, 2, 4,  -3, -5, -25),
+    (3500,26,90,99, 1, 5,  -3, -5, -25),
+    (3770,27,91,99, 1, 5,  -3, -5, -25),
+    (4050,28,91,99, 1, 5,  -3, -5, -25),
+    (4340,29,92,99, 1, 5,  -3, -5, -25),
+    (4640,30,92,99, 1, 5,  -5, -8, -25),
+    (4950,31,93,99, 1, 5,  -5, -8, -25),
+    (5270,32,93,99, 1, 5,  -5, -8, -25),
+    (5600,33,94,99, 1, 5,  -5, -8, -25),
+    (5940,34,94,99, 1, 5,  -5, -8, -25),
+    (6290,35,95,99, 1, 5,  -5, -8, -25),
+    (6650,36,95,99, 1, 5,  -5, -8, -25),
+    (7020,37,96,99, 1, 5,  -5, -8, -25),
+    (7400,38,96,99, 1, 5,  -5, -8, -25),
+    (7790,39,97,99, 1, 5,  -5, -8, -25),
+    (8200,40,97,99, 1, 5,  -5, -8, -25),
+)
+LEVEL_THRESHOLDS = tuple(row[0] for row in LEVEL_TABLE)
+# Property dicts returned by get_level_properties, built once (treat as read-only)
+LEVEL_PROPERTIES = tuple(
+    {
+        'level': level,
+        'accuracy_pct': acc,
+        'reliability_pct': rel,
+        'magazine_capacity': clip,
+        'magazines_max': clips,
+        'miss_penalty': -abs(misspen),
+        'wild_penalty': -abs(wildpen),
+        'accident_penalty': -abs(accpen),
+    }
+    for _, level, acc, rel, clip, clips, misspen, wildpen, accpen in LEVEL_TABLE
+)
 
 class DuckHuntBot:
+    # Default top-level fields for a new player (JSON backend); get_player adds
+    # 'inventory' and 'channel_stats' ({channel: stats}) as fresh dicts
+    PLAYER_DEFAULTS = {
+        'ammo': 10,
+        'magazines': 2,
+        'jammed': False,
+        'confiscated': False,
+        'sabotaged': False,
+        'karma': 0.0,
+    }
+    # Default per-channel stats for a new player (JSON backend)
+    STATS_DEFAULTS = {
+        'xp': 0,
+        'ducks_shot': 0,
+        'golden_ducks': 0,
+        'misses': 0,
+        'accidents': 0,
+        'best_time': None,
+        'total_reaction_time': 0.0,
+        'shots_fired': 0,
+        'last_duck_time': None,
+        'wild_fires': 0,
+        'confiscated': False,
+        'jammed': False,
+        'sabotaged': False,
+        'ammo': 0,
+        'magazines': 0,
+        'ap_shots': 0,
+        'explosive_shots': 0,
+        'bread_uses': 0,
+        'befriended_ducks': 0,
+        'trigger_lock_until': 0,
+        'trigger_lock_uses': 0,
+        'grease_until': 0,
+        'silencer_until': 0,
+        'sunglasses_until': 0,
+        'ducks_detector_until': 0,
+        'mirror_until': 0,
+        'sand_until': 0,
+        'soaked_until': 0,
+        'life_insurance_until': 0,
+        'liability_insurance_until': 0,
+        'brush_until': 0,
+        'clover_until': 0,
+        'clover_bonus': 0,
+        'sight_next_shot': False,
+        'mag_upgrade_level': 0,
+        'mag_capacity_level': 0,
+    }
+    # Bump when a field is added to STATS_DEFAULTS so stored stats are backfilled once
+    STATS_SCHEMA_VERSION = 7
+    # Fields every stored channel stats dict must have when duckhunt.data is loaded
+    LOAD_STATS_DEFAULTS = {
+        'xp': 0, 'confiscated': False, 'jammed': False, 'sabotaged': False,
+        'ammo': 10, 'magazines': 2, 'befriended_ducks': 0,
+    }
+    # Global per-player stats from before channel_stats existed, with their defaults
+    LEGACY_STATS_FIELDS = (
+        ('xp', 0), ('ducks_shot', 0), ('golden_ducks', 0), ('misses', 0), ('accidents', 0),
+        ('best_time', None), ('total_reaction_time', 0.0), ('shots_fired', 0), ('last_duck_time', None),
+    )
+    # Shop items that can't be bought again while active: {item_id: (is_active(stats, now), notice)}
+    SHOP_ALREADY_ACTIVE = {
+        3: (lambda stats, now: stats.get('ap_shots', 0) > 0 and stats.get('explosive_shots', 0) == 0,
+            "AP ammo already active. Use it up before buying more."),
+        4: (lambda stats, now: stats.get('explosive_shots', 0) > 0 and stats.get('ap_shots', 0) == 0,
+            "Explosive ammo already active. Use it up before buying more."),
+        6: (lambda stats, now: stats.get('grease_until', 0) > now,
+            "Grease already applied. Wait until it wears off to buy more."),
+        7: (lambda stats, now: stats.get('sight_next_shot', False),
+            "Sight already mounted for your next shot. Use it before buying more."),
+        8: (lambda stats, now: stats.get('trigger_lock_until', 0) > now and stats.get('trigger_lock_uses', 0) > 0,
+            "Safety Lock already active. Use it up before buying more."),
+        9: (lambda stats, now: stats.get('silencer_until', 0) > now,
+            "Silencer already active. Wait until it wears off to buy more."),
+        10: (lambda stats, now: stats.get('clover_until', 0) > now,
+             "Four-leaf clover already active. Wait until it expires to buy again."),
+        11: (lambda stats, now: stats.get('sunglasses_until', 0) > now,
+             "Sunglasses already active. Wait until they wear off to buy more."),
+        18: (lambda stats, now: stats.get('life_insurance_until', 0) > now,
+             "Life insurance already active. Wait until it expires to buy again."),
+        19: (lambda stats, now: stats.get('liability_insurance_until', 0) > now,
+             "Liability insurance already active. Wait until it expires to buy again."),
+        20: (lambda stats, now: stats.get('bread_uses', 0) > 0,
+             "Bread already active. Use it up before buying more."),
+        21: (lambda stats, now: stats.get('ducks_detector_until', 0) > now,
+             "Ducks detector already active. Wait until it expires to buy again."),
+    }
+    
     def __init__(self, config_file="duckhunt.conf"):
+        # duckhunt.log is held open for the bot's lifetime (see _write_to_log_file)
+        self.log_file = "duckhunt.log"
+        self.log_max_size = 10 * 1024 * 1024  # 10MB
+        self._log_fp = None
+        self._log_bytes = 0
+        self._log_flushed_at = 0.0
+        self._log_second = None
+        self._log_timestamp = ""
         print("DEBUG: Loading config...")
         self.config = self.load_config(config_file)
         print("DEBUG: Config loaded")
@@ -367,45 +964,15 @@ class DuckHuntBot:
                     'port': self.config.getint('DEFAULT', 'sql_port', fallback=3306),
                     'database': self.config.get('DEFAULT', 'sql_database', fallback='duckhunt'),
                     'user': self.config.get('DEFAULT', 'sql_user', fallback='duckhunt'),
-                    'password': self.config.get('DEFAULT', 'sql_password', fallback='CHANGE_ME')
+                    'password': self.config.get('DEFAULT', 'sql_password', fallback='CHANGE_ME'),
+                    'pool_size': self.config.getint('DEFAULT', 'sql_pool_size', fallback=8),
+                    'driver': self.config.get('DEFAULT', 'sql_driver', fallback='aiomysql')
                 }
                 print("DEBUG: Creating SQLBackend...")
                 self.db_backend = SQLBackend(**sql_config)
-                print("DEBUG: Getting all players from database...")
-                try:
-                    # Use a simple timeout approach - just try the query with a short timeout
-                    import threading
-                    import time
-                    
-                    result = [None]
-                    error = [None]
-                    
-                    def db_query():
-                        try:
-                            result[0] = self.db_backend.get_all_players()
-                        except Exception as e:
-                            error[0] = e
-                    
-                    # Start query in thread with 10 second timeout
-                    thread = threading.Thread(target=db_query)
-                    thread.daemon = True
-                    thread.start()
-                    thread.join(timeout=10)
-                    
-                    if thread.is_alive():
-                        print("WARNING: Database query timed out, starting with empty player data")
-                        self.players = {}
-                    elif error[0]:
-                        print(f"ERROR: Failed to load players from database: {error[0]}")
-                        print("Starting with empty player data")
-                        self.players = {}
-                    else:
-                        self.players = result[0]
-                        print("DEBUG: Players loaded from database")
-                except Exception as e:
-                    print(f"ERROR: Failed to load players from database: {e}")
-                    print("Starting with empty player data")
-                    self.players = {}
+                # Pool creation and the initial player load need a running event loop,
+                # so they happen in setup_backend() when run() starts
+                self.players = {}
                 print("Using SQL backend for data storage")
             except Exception as e:
                 print(f"Failed to initialize SQL backend: {e}")
@@ -420,14 +987,88 @@ class DuckHuntBot:
                 print("SQL backend requested but not available. Using JSON backend.")
         
         self.authenticated_users = set()
-        self.active_ducks = {}  # Per-channel duck lists: {channel: [ {'spawn_time': time, 'golden': bool, 'health': int}, ... ]}
+        self.active_ducks = {}  # Per-channel ducks, oldest first: {channel: DuckList}
         self.channel_last_duck_time = {}  # {channel: timestamp} - tracks when last duck was killed in each channel
-        self.version = "1.0_build94"
-        self.ducks_lock = asyncio.Lock()
+        self.confiscated_users = {}  # {channel: set(users)} - guns to return when the duck leaves (may include rearmed users)
+        self.detector_until = {}  # {channel: {user: ducks_detector_until}} - who gets pre-spawn notices
+        self.version = "1.0_build95"
+        self._duck_locks = {}  # {channel_key: asyncio.Lock} guarding that channel's active_ducks entry
         self.should_restart = False
-        
-        # Rebuild channel_last_duck_time from player data
-        self._rebuild_channel_last_duck_times()
+        self.sql_flush_interval = self.config.getfloat('DEFAULT', 'sql_flush_interval', fallback=2.0)
+        self.sql_load_timeout = self.config.getfloat('DEFAULT', 'sql_load_timeout', fallback=10.0)
+        self.debug_logging = self.config.getboolean('DEFAULT', 'debug_logging', fallback=False)
+        self.save_interval = self.config.getfloat('DEFAULT', 'save_interval', fallback=15.0)
+        self._flush_task = None
+        self._save_task = None
+        self._players_dirty = False  # JSON backend: duckhunt.data needs rewriting
+        
+        # Rebuild per-channel indexes from player data (SQL data is loaded later in setup_backend)
+        self._rebuild_channel_indexes()
+        
+        # Colored message fragments that never change, built once instead of per spawn/shot
+        # Duck art: dust=gray, duck=yellow, QUACK=red/green/yellow
+        self._duck_art = (self.colorize("-.,¸¸.-·°'`'°·-.,¸¸.-·°'`'°· ", 'grey') + self.colorize('\\_O<', 'yellow') + '   '
+                          + self.colorize('Q', 'red') + self.colorize('U', 'green') + self.colorize('A', 'yellow')
+                          + self.colorize('C', 'red') + self.colorize('K', 'green'))
+        self._clack = self.colorize('*CLACK*', 'red')
+        self._click = self.colorize('*CLICK*', 'red')
+        self._jammed = self.colorize('JAMMED', 'red', bold=True)
+        self._confiscated_wild_fire = self.colorize('[GUN CONFISCATED: wild fire]', 'red', bold=True)
+        self._confiscated_accident = self.colorize(' [GUN CONFISCATED: accident]', 'red', bold=True)
+        self._insured_accident = self.colorize(' [INSURED: no confiscation]', 'green')
+        self._bang = self.colorize('*BANG*', 'red', bold=True)
+        self._kwak = self.colorize('\\_X< *KWAK*', 'red')
+        self._golden_detected_bold = self.colorize('[GOLDEN DUCK DETECTED]', 'yellow', bold=True)
+        self._golden_detected = self.colorize('[GOLDEN DUCK DETECTED]', 'yellow')
+        self._duck_eye = self.colorize('\\_0<', 'yellow')
+        self._duck_head = self.colorize('\\_O<', 'yellow')
+        self._red_bracket = self.colorize('[', 'red')
+        self._life = self.colorize('life', 'red')
+        self._friend = self.colorize('friend', 'red')
+        self._friend_tag = self.colorize('FRIEND', 'red', bold=True)
+        self._unjam_click = self.colorize('*Crr..CLICK*', 'red')
+        self._clack_clack = self.colorize('*CLACK CLACK*', 'red', bold=True)
+        # !bang kill/miss/accident messages as str.format templates, so a shot only fills in the numbers
+        self._wild_fire_miss_msg = ("Luckily you missed, but what did you aim at? There is no duck in the area... "
+                                    + self.colorize('[missed: {miss_pen} xp]', 'red') + ' '
+                                    + self.colorize('[wild fire: {wild_pen} xp]', 'red') + ' ' + self._confiscated_wild_fire)
+        self._accident_msg = self.colorize('ACCIDENT!', 'red', bold=True) + ' You accidentally shot {victim}! ' + self.colorize('[{acc_pen} xp]', 'red')
+        self._missed_msg = self.colorize('*BANG*', 'red', bold=True) + ' You missed. ' + self.colorize('[{penalty} xp]', 'red')
+        self._kill_msg = (self._bang + '  You shot down the duck in {reaction_time:.3f}s, which makes you a total of {ducks_shot} ducks on {channel}. '
+                          + self._kwak + ' ' + self.colorize('[{sign}{xp_gain} xp]', 'green'))
+        self._ricochet_msg = (self.colorize('ACCIDENT', 'red', bold=True) + '     ' + self.colorize('Your bullet ricochets into', 'red')
+                              + ' {victim}! ' + self.colorize('[accident: {acc_pen} xp]', 'red'))
+        # Bound methods of the shared generator for the spawn/!bang/!bef paths (random.seed() still applies)
+        self._random = random.random
+        self._randint = random.randint
+        self._choice = random.choice
+        # !shop item handlers by item id, each called as handler(user, channel, args, network, channel_stats, cost, now)
+        self._shop_handlers = {
+            1: self._shop_extra_bullet,
+            2: self._shop_refill_magazine,
+            3: self._shop_ap_ammo,
+            4: self._shop_explosive_ammo,
+            5: self._shop_repurchase_gun,
+            6: self._shop_grease,
+            7: self._shop_sight,
+            8: self._shop_trigger_lock,
+            9: self._shop_silencer,
+            10: self._shop_clover,
+            11: self._shop_sunglasses,
+            12: self._shop_spare_clothes,
+            13: self._shop_brush,
+            14: self._shop_mirror,
+            15: self._shop_sand,
+            16: self._shop_water_bucket,
+            17: self._shop_sabotage,
+            18: self._shop_life_insurance,
+            19: self._shop_liability_insurance,
+            20: self._shop_bread,
+            21: self._shop_ducks_detector,
+            22: self._shop_upgrade_magazine,
+            23: self._shop_extra_magazine,
+            24: self._shop_duck_call,
+        }
         
         # Multi-language support
         if LANG_AVAILABLE:
@@ -439,14 +1080,61 @@ class DuckHuntBot:
         
         # Multi-network support
         self.networks = {}  # {network_name: NetworkConnection}
+        self.channel_cache = ChannelCache()  # Channel membership shared by all networks
+        self.refresh_config()
         print("DEBUG: Setting up networks...")
         self.setup_networks()
         print(f"DEBUG: Setup complete. {len(self.networks)} networks configured.")
         
         # Channel-specific configurations
-        self.channel_configs = {}  # {network:channel: {multilang_enabled: bool, default_language: str}}
+        self.channel_configs = {}  # {(network, channel): {multilang_enabled: bool, default_language: str}}
         self.load_channel_configs()
     
+    async def setup_backend(self):
+        """Open the SQL connection pool and load player data from the database"""
+        if not self.db_backend:
+            # JSON backend: player data is already loaded, just start the periodic save
+            self._save_task = asyncio.create_task(self._save_loop())
+            return
+        await self.db_backend.init()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        print("DEBUG: Getting all players from database...")
+        try:
+            self.players = await asyncio.wait_for(self.db_backend.get_all_players(), timeout=self.sql_load_timeout)
+            print("DEBUG: Players loaded from database")
+        except asyncio.TimeoutError:
+            print(f"WARNING: Database query timed out after {self.sql_load_timeout:g}s, starting with empty player data")
+            self.players = {}
+        except Exception as e:
+            print(f"ERROR: Failed to load players from database: {e}")
+            print("Starting with empty player data")
+            self.players = {}
+        self._rebuild_channel_indexes()
+    
+    async def _flush_loop(self):
+        """Periodically write buffered channel_stats changes to the database"""
+        while True:
+            await asyncio.sleep(self.sql_flush_interval)
+            try:
+                await self.db_backend.flush()
+            except Exception as e:
+                print(f"ERROR: Failed to flush channel stats: {e}")
+            # Log lines are otherwise only flushed by a later write, which may not come on a quiet network
+            self.flush_log_file()
+    
+    async def _save_loop(self):
+        """Periodically write duckhunt.data if player data changed (JSON backend)"""
+        while True:
+            await asyncio.sleep(self.save_interval)
+            self.save_dirty_player_data()
+            self.flush_log_file()
+    
+    def save_dirty_player_data(self):
+        """Write duckhunt.data if anything changed since the last save"""
+        if self._players_dirty:
+            self._players_dirty = False
+            self.save_player_data()
+    
     def setup_networks(self):
         """Setup network connections from config"""
         # Look for network sections in config
@@ -457,7 +1145,7 @@ class DuckHuntBot:
             for section in network_sections:
                 network_name = section.split(':', 1)[1]  # Extract name after 'network:'
                 network_config = dict(self.config[section])
-                self.networks[network_name] = NetworkConnection(network_name, network_config)
+                self.networks[network_name] = NetworkConnection(network_name, network_config, self.channel_cache)
         else:
             # Fallback to single network from DEFAULT section
             main_config = {
@@ -469,7 +1157,7 @@ class DuckHuntBot:
                 'owner': self.config.get('DEFAULT', 'owner', fallback=''),
                 'admin': self.config.get('DEFAULT', 'admin', fallback=''),
             }
-            self.networks['main'] = NetworkConnection('main', main_config)
+            self.networks['main'] = NetworkConnection('main', main_config, self.channel_cache)
         
         # Default game settings (fallback for backward compatibility)
         self.min_spawn = int(self.config.get('DEFAULT', 'min_spawn', fallback=600))
@@ -480,31 +1168,10 @@ class DuckHuntBot:
         
         # Shop items (prices loaded from config)
         self.shop_items = {
-            1: {"name": "Extra bullet", "cost": int(self.config.get('DEFAULT', 'shop_extra_bullet', fallback=7)), "description": "Adds one bullet to your gun"},
-            2: {"name": "Refill magazine", "cost": int(self.config.get('DEFAULT', 'shop_extra_magazine', fallback=20)), "description": "Adds one spare magazine to your stock"},
-            3: {"name": "AP ammo", "cost": int(self.config.get('DEFAULT', 'shop_ap_ammo', fallback=15)), "description": "Armor-piercing ammunition"},
-            4: {"name": "Explosive ammo", "cost": int(self.config.get('DEFAULT', 'shop_explosive_ammo', fallback=25)), "description": "Explosive ammunition (damage x3)"},
-            5: {"name": "Repurchase confiscated gun", "cost": int(self.config.get('DEFAULT', 'shop_repurchase_gun', fallback=40)), "description": "Buy back your confiscated weapon"},
-            6: {"name": "Grease", "cost": int(self.config.get('DEFAULT', 'shop_grease', fallback=8)), "description": "Halves jamming odds for 24h"},
-            7: {"name": "Sight", "cost": int(self.config.get('DEFAULT', 'shop_sight', fallback=6)), "description": "Increases accuracy for next shot"},
-            8: {"name": "Safety Lock", "cost": int(self.config.get('DEFAULT', 'shop_infrared_detector', fallback=15)), "description": "Locks gun when no duck present"},
-            9: {"name": "Silencer", "cost": int(self.config.get('DEFAULT', 'shop_silencer', fallback=5)), "description": "Prevents scaring ducks when shooting"},
-            10: {"name": "Four-leaf clover", "cost": int(self.config.get('DEFAULT', 'shop_four_leaf_clover', fallback=13)), "description": "Extra XP for each duck shot"},
-            11: {"name": "Sunglasses", "cost": int(self.config.get('DEFAULT', 'shop_sunglasses', fallback=5)), "description": "Protects against mirror dazzle"},
-            12: {"name": "Spare clothes", "cost": int(self.config.get('DEFAULT', 'shop_spare_clothes', fallback=7)), "description": "Dry clothes after being soaked"},
-            13: {"name": "Brush for gun", "cost": int(self.config.get('DEFAULT', 'shop_brush_for_gun', fallback=7)), "description": "Restores weapon condition"},
-            14: {"name": "Mirror", "cost": int(self.config.get('DEFAULT', 'shop_mirror', fallback=7)), "description": "Dazzles target, reducing accuracy"},
-            15: {"name": "Handful of sand", "cost": int(self.config.get('DEFAULT', 'shop_handful_of_sand', fallback=7)), "description": "Reduces target's gun reliability"},
-            16: {"name": "Water bucket", "cost": int(self.config.get('DEFAULT', 'shop_water_bucket', fallback=10)), "description": "Soaks target, prevents hunting for 1h"},
-            17: {"name": "Sabotage", "cost": int(self.config.get('DEFAULT', 'shop_sabotage', fallback=14)), "description": "Jams target's gun"},
-            18: {"name": "Life insurance", "cost": int(self.config.get('DEFAULT', 'shop_life_insurance', fallback=10)), "description": "Protects against accidents"},
-            19: {"name": "Liability insurance", "cost": int(self.config.get('DEFAULT', 'shop_liability_insurance', fallback=5)), "description": "Reduces accident penalties"},
-            20: {"name": "Piece of bread", "cost": int(self.config.get('DEFAULT', 'shop_piece_of_bread', fallback=50)), "description": "Lures ducks"},
-            21: {"name": "Ducks detector", "cost": int(self.config.get('DEFAULT', 'shop_ducks_detector', fallback=50)), "description": "Warns of next duck spawn"},
-            22: {"name": "Upgrade Magazine", "cost": 200, "description": "Increase ammo per magazine (up to 5 levels)"},
-            23: {"name": "Extra Magazine", "cost": 200, "description": "Increase max carried magazines (up to 5 levels)"},
-            24: {"name": "Duck Call", "cost": int(self.config.get('DEFAULT', 'shop_duck_call', fallback=15)), "description": "Lures ducks to arrive in 60s"}
+            item_id: {"name": name, "cost": int(self.config.get('DEFAULT', cost_key, fallback=cost)) if cost_key else cost, "description": description}
+            for item_id, name, cost_key, cost, description in SHOP_ITEMS_SPEC
         }
+        self._shop_menu_cache = {}  # {(upgrade cost, capacity cost): [menu lines]}, see get_shop_menu
         
     def load_config(self, config_file):
         """Load configuration from file"""
@@ -532,7 +1199,7 @@ class DuckHuntBot:
             
             network_name = parts[1]
             channel_name = parts[2]
-            key = f"{network_name}:{channel_name.lower()}"  # Normalize channel name
+            key = (network_name, normalize_channel_name(channel_name))
             
             # Load settings
             multilang_enabled = self.config.get(section, 'multilang_enabled', fallback='off').lower() in ['on', 'yes', 'true', '1']
@@ -548,16 +1215,16 @@ class DuckHuntBot:
     
     def is_multilang_enabled(self, network_name, channel):
         """Check if multilanguage support is enabled for a channel"""
-        key = f"{network_name}:{channel.lower()}"
-        if key in self.channel_configs:
-            return self.channel_configs[key]['multilang_enabled']
+        channel_config = self.channel_configs.get((network_name, normalize_channel_name(channel)))
+        if channel_config:
+            return channel_config['multilang_enabled']
         return True  # Default to enabled if not specified
     
     def get_channel_default_language(self, network_name, channel):
         """Get the default language for a channel"""
-        key = f"{network_name}:{channel.lower()}"
-        if key in self.channel_configs:
-            return self.channel_configs[key]['default_language']
+        channel_config = self.channel_configs.get((network_name, normalize_channel_name(channel)))
+        if channel_config:
+            return channel_config['default_language']
         return 'en'  # Default to English
     
     def create_default_config(self, config_file):
@@ -574,6 +1241,15 @@ sql_port = 3306
 sql_database = duckhunt
 sql_user = duckhunt
 sql_password = CHANGE_ME
+# Maximum number of pooled SQL connections
+sql_pool_size = 8
+# SQL driver: aiomysql (default) or asyncmy (faster, needs the asyncmy package)
+sql_driver = aiomysql
+# Seconds to wait for the startup player load before starting with empty data
+sql_load_timeout = 10
+
+# Write DEBUG lines to duckhunt.log (on/off)
+debug_logging = off
 
 # Network configurations
 [network:example]
@@ -623,128 +1299,99 @@ shop_extra_magazine = 400
     
     def load_player_data(self):
         """Load player data from file"""
-        if os.path.exists('duckhunt.data'):
+        try:
+            with open('duckhunt.data', 'rb') as f:
+                players = orjson.loads(f.read()) if ORJSON_AVAILABLE else json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            # Corrupt file: keep it aside, the next periodic save would overwrite it.
+            # Other errors (permissions, I/O) propagate so the bot doesn't start empty over good data
+            self.log_action(f"Error decoding player data, starting empty (kept as duckhunt.data.bad): {e}")
             try:
-                with open('duckhunt.data', 'r') as f:
-                    players = json.load(f)
-                    # Ensure all players have required fields and migrate to new structure
-                    for player_name, player_data in players.items():
-                        if 'sabotaged' not in player_data:
-                            player_data['sabotaged'] = False
-                        
-                        # Migrate old stats to channel_stats structure
-                        if 'channel_stats' not in player_data:
-                            # Create channel_stats from old global stats
-                            player_data['channel_stats'] = {}
-                            
-                            # Migrate stats to a default channel (we'll use the first channel from config)
-                            default_channel = self.config.get('channel', '#default').split(',')[0]
-                            
-                            # Store old values before deleting
-                            old_xp = player_data.get('xp', 0)
-                            old_ducks_shot = player_data.get('ducks_shot', 0)
-                            old_golden_ducks = player_data.get('golden_ducks', 0)
-                            old_misses = player_data.get('misses', 0)
-                            old_accidents = player_data.get('accidents', 0)
-                            old_best_time = player_data.get('best_time')
-                            old_total_reaction_time = player_data.get('total_reaction_time', 0.0)
-                            old_shots_fired = player_data.get('shots_fired', 0)
-                            old_last_duck_time = player_data.get('last_duck_time')
-                            
-                            player_data['channel_stats'][default_channel] = {
-                                'xp': old_xp,
-                                'ducks_shot': old_ducks_shot,
-                                'golden_ducks': old_golden_ducks,
-                                'misses': old_misses,
-                                'accidents': old_accidents,
-                                'best_time': old_best_time,
-                                'total_reaction_time': old_total_reaction_time,
-                                'shots_fired': old_shots_fired,
-                                'last_duck_time': old_last_duck_time
-                            }
-                            
-                            # Remove old global stats (including XP and level now)
-                            for old_field in ['xp', 'level', 'ducks_shot', 'golden_ducks', 'misses', 'accidents', 'best_time', 'total_reaction_time', 'shots_fired', 'last_duck_time']:
-                                if old_field in player_data:
-                                    del player_data[old_field]
-                        else:
-                            # channel_stats exists, but check if it needs XP migration
-                            old_xp = player_data.get('xp', 0)
-                            old_level = player_data.get('level', 1)
-                            
-                            # If we have old global XP/level, migrate to first channel
-                            if old_xp > 0 or old_level > 1:
-                                default_channel = self.config.get('channel', '#default').split(',')[0]
-                                if default_channel not in player_data['channel_stats']:
-                                    player_data['channel_stats'][default_channel] = {
-                                        'xp': 0,
-                                        'ducks_shot': 0,
-                                        'golden_ducks': 0,
-                                        'misses': 0,
-                                        'accidents': 0,
-                                        'best_time': None,
-                                        'total_reaction_time': 0.0,
-                                        'shots_fired': 0,
-                                        'last_duck_time': None
-                                    }
-                                
-                                # Add old XP to the default channel
-                                player_data['channel_stats'][default_channel]['xp'] += old_xp
-                            
-                            # Remove old global stats
-                            for old_field in ['xp', 'level']:
-                                if old_field in player_data:
-                                    del player_data[old_field]
-                            
-                            # Ensure all existing channel_stats have required fields
-                            for channel, stats in player_data['channel_stats'].items():
-                                if 'xp' not in stats:
-                                    stats['xp'] = 0
-                                if 'confiscated' not in stats:
-                                    stats['confiscated'] = False
-                                if 'jammed' not in stats:
-                                    stats['jammed'] = False
-                                if 'sabotaged' not in stats:
-                                    stats['sabotaged'] = False
-                                if 'ammo' not in stats:
-                                    stats['ammo'] = 10
-                                if 'magazines' not in stats:
-                                    stats['magazines'] = 2
-                                if 'befriended_ducks' not in stats:
-                                    stats['befriended_ducks'] = 0
+                os.replace('duckhunt.data', 'duckhunt.data.bad')
+            except OSError:
+                pass
+            return {}
+        
+        # Old global stats are migrated to a default channel (the first channel from config)
+        default_channel = self.config.get('DEFAULT', 'channel', fallback='#default').split(',')[0]
+        # Ensure all players have required fields and migrate to new structure
+        for player_name, player_data in players.items():
+            if 'sabotaged' not in player_data:
+                player_data['sabotaged'] = False
+            
+            # Migrate old stats to channel_stats structure
+            if 'channel_stats' not in player_data:
+                # Create channel_stats from old global stats
+                player_data['channel_stats'] = {}
+                
+                # Move the old global stats into it (level is recomputed from XP)
+                player_data['channel_stats'][default_channel] = {
+                    field: player_data.pop(field, default) for field, default in self.LEGACY_STATS_FIELDS
+                }
+                player_data.pop('level', None)
+            else:
+                # channel_stats exists, but check if it needs XP migration
+                old_xp = player_data.get('xp', 0)
+                old_level = player_data.get('level', 1)
+                
+                # If we have old global XP/level, migrate to first channel
+                if old_xp > 0 or old_level > 1:
+                    if default_channel not in player_data['channel_stats']:
+                        player_data['channel_stats'][default_channel] = dict(self.LEGACY_STATS_FIELDS)
                     
-                    return players
-            except:
-                return {}
-        return {}
+                    # Add old XP to the default channel
+                    player_data['channel_stats'][default_channel]['xp'] += old_xp
+                
+                # Remove old global stats
+                player_data.pop('xp', None)
+                player_data.pop('level', None)
+            
+            # Ensure all channel_stats (migrated or not) have required fields (stored values win)
+            channel_stats = player_data['channel_stats']
+            for channel, stats in channel_stats.items():
+                stats = channel_stats[channel] = {**self.LOAD_STATS_DEFAULTS, **stats}
+                # XP is kept an int from here on (as SQL stores it), so hot paths never convert it
+                stats['xp'] = int(float(stats['xp'] or 0))
+
+        return players
     
-    def _rebuild_channel_last_duck_times(self):
-        """Rebuild channel_last_duck_time dict from player data on startup"""
-        from datetime import datetime
-        
+    def _rebuild_channel_indexes(self):
+        """Rebuild channel_last_duck_time, confiscated_users and detector_until from player data on startup"""
+        last_times = self.channel_last_duck_time
+        now = time.time()
         for player_name, player_data in self.players.items():
             channel_stats = player_data.get('channel_stats', {})
             for channel, stats in channel_stats.items():
+                if stats.get('confiscated'):
+                    self.confiscated_users.setdefault(channel, set()).add(player_name)
+                detector_until = stats.get('ducks_detector_until') or 0
+                if detector_until > now:
+                    self.detector_until.setdefault(channel, {})[player_name] = detector_until
                 last_duck_time = stats.get('last_duck_time')
                 if last_duck_time:
-                    # Convert to timestamp if needed
-                    if isinstance(last_duck_time, str):
-                        try:
-                            last_duck_time = float(last_duck_time)
-                        except (ValueError, TypeError):
+                    # Convert to timestamp if needed: JSON stores numbers (or numeric strings),
+                    # SQL returns TIMESTAMP columns as datetime
+                    t = type(last_duck_time)
+                    if t is not float and t is not int:
+                        if t is str:
+                            try:
+                                last_duck_time = float(last_duck_time)
+                            except ValueError:
+                                continue
+                        elif t is datetime:
+                            last_duck_time = last_duck_time.timestamp()
+                        else:
                             continue
-                    elif isinstance(last_duck_time, datetime):
-                        last_duck_time = last_duck_time.timestamp()
-                    elif not isinstance(last_duck_time, (int, float)):
-                        continue
                     
                     # Keep the most recent time for each channel
-                    if channel not in self.channel_last_duck_time or last_duck_time > self.channel_last_duck_time[channel]:
-                        self.channel_last_duck_time[channel] = last_duck_time
+                    if last_duck_time > last_times.get(channel, 0):
+                        last_times[channel] = last_duck_time
     
     def safe_xp_operation(self, channel_stats, operation, value):
-        """Safely perform XP arithmetic operations with Decimal conversion"""
-        current_xp = float(channel_stats['xp'])
+        """Perform XP arithmetic (XP is an int with either backend)"""
+        current_xp = channel_stats['xp']
         if operation == 'add':
             channel_stats['xp'] = current_xp + value
         elif operation == 'subtract':
@@ -756,21 +1403,38 @@ shop_extra_magazine = 400
         return channel_stats['xp']
 
     def save_player_data(self):
-        """Save player data to SQL backend (deprecated - kept for compatibility with existing calls)"""
-        # SQL backend handles saving automatically via update_channel_stats calls
-        # This method is kept for backwards compatibility but does nothing
-        pass
+        """Save player data to duckhunt.data (JSON storage only; the SQL backend saves via update_channel_stats)"""
+        if self.data_storage == 'sql':
+            return
+        
+        # Write a temp file in one buffered pass, then swap it in so a crash never leaves a half-written file
+        tmp_file = 'duckhunt.data.tmp'
+        try:
+            with open(tmp_file, 'wb', buffering=1024 * 1024) as f:
+                if ORJSON_AVAILABLE:
+                    f.write(orjson.dumps(self.players, default=str))
+                else:
+                    f.write(json.dumps(self.players, separators=(',', ':'), default=str).encode('utf-8'))
+            os.replace(tmp_file, 'duckhunt.data')
+        except (OSError, TypeError, ValueError) as e:
+            self.log_action(f"Error saving player data: {e}")
+    
+    def _timestamp(self):
+        """Current log timestamp, formatted at most once per second"""
+        now = int(time.time())
+        if now != self._log_second:
+            self._log_second = now
+            self._log_timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+        return self._log_timestamp
     
     def log_message(self, msg_type, message):
         """Log message with timestamp"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"{timestamp} {msg_type}: {message}\n"
+        log_entry = f"{self._timestamp()} {msg_type}: {message}\n"
         self._write_to_log_file(log_entry)
     
     def log_action(self, action, debug_channel=None, debug_network=None):
         """Log bot action and optionally send to debug channel"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"{timestamp} DUCKHUNT {action}\n"
+        log_entry = f"{self._timestamp()} DUCKHUNT {action}\n"
         self._write_to_log_file(log_entry)
         
         # Send debug message to channel if specified
@@ -781,54 +1445,67 @@ shop_extra_magazine = 400
             except Exception as e:
                 pass  # Don't let debug messages break the bot
     
+    def _open_log_file(self):
+        """Open duckhunt.log for appending and note its current size"""
+        self._log_fp = open(self.log_file, 'a', buffering=65536, encoding='utf-8')
+        self._log_bytes = os.path.getsize(self.log_file)
+    
     def _write_to_log_file(self, log_entry):
         """Write to log file with size limiting"""
-        log_file = "duckhunt.log"
-        max_size = 10 * 1024 * 1024  # 10MB
-        
         try:
-            # Check if log file exists and get its size
-            if os.path.exists(log_file):
-                current_size = os.path.getsize(log_file)
-                
-                # If file is too large, trim it by keeping only the last 5MB
-                if current_size > max_size:
-                    with open(log_file, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                    
-                    # Keep only the last 50% of lines (roughly 5MB)
-                    keep_lines = len(lines) // 2
-                    trimmed_lines = lines[keep_lines:]
-                    
-                    with open(log_file, 'w', encoding='utf-8') as f:
-                        f.writelines(trimmed_lines)
+            if self._log_fp is None:
+                self._open_log_file()
             
-            # Append new log entry
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(log_entry)
+            self._log_fp.write(log_entry)
+            # Count UTF-8 bytes, not characters: language packs log non-ASCII text
+            self._log_bytes += len(log_entry) if log_entry.isascii() else len(log_entry.encode('utf-8'))
+            
+            # If file is too large, trim it by keeping only the last 5MB
+            if self._log_bytes > self.log_max_size:
+                self._log_fp.close()
+                self._log_fp = None
+                self._trim_log_file(self.log_file, self.log_max_size // 2)
+                self._open_log_file()
+            else:
+                now = time.monotonic()
+                if now - self._log_flushed_at >= 1.0:
+                    self._log_fp.flush()
+                    self._log_flushed_at = now
                 
         except Exception as e:
             # Fallback to print if file operations fail
             print(log_entry.strip())
     
+    def flush_log_file(self):
+        """Write out any buffered log lines (call before exiting)"""
+        if self._log_fp is not None:
+            try:
+                self._log_fp.flush()
+            except Exception:
+                pass
+    
+    def _trim_log_file(self, log_file, keep_bytes):
+        """Keep only the last keep_bytes of a log file, cut at a line boundary, without loading it into memory"""
+        tmp_file = f"{log_file}.tmp"
+        with open(log_file, 'rb') as src, open(tmp_file, 'wb') as dst:
+            src.seek(-keep_bytes, os.SEEK_END)
+            src.readline()  # Drop the partial line we landed in
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_file, log_file)
+    
     async def send_network(self, network: NetworkConnection, message):
         """Send message to IRC server for a specific network with rate limiting"""
         # Rate limiting: 2 messages per second (0.5s between messages)
-        now = time.time()
-        if hasattr(network, 'last_send_time'):
-            elapsed = now - network.last_send_time
-            if elapsed < 0.5:
-                await asyncio.sleep(0.5 - elapsed)
+        elapsed = time.monotonic() - network.last_send_time
+        if elapsed < 0.5:
+            await asyncio.sleep(0.5 - elapsed)
         
-        if network.writer:  # SSL connection
-            network.writer.write(f"{message}\r\n".encode('utf-8'))
+        if network.writer:
+            network.writer.write(message.encode('utf-8') + b"\r\n")
             await network.writer.drain()
             self.log_message("SEND", message)
-        elif network.sock:  # Non-SSL connection
-            await asyncio.get_event_loop().sock_sendall(network.sock, f"{message}\r\n".encode('utf-8'))
-            self.log_message("SEND", message)
         
-        network.last_send_time = time.time()
+        network.last_send_time = time.monotonic()
     
     async def send_message(self, network: NetworkConnection, channel, message):
         """Send message to channel"""
@@ -851,22 +1528,10 @@ shop_extra_magazine = 400
         codes = []
         if bold:
             codes.append('\x02')  # Bold
-        if color:
-            color_codes = {
-                'white': '00', 'black': '01', 'blue': '02', 'green': '03', 'red': '04',
-                'brown': '05', 'purple': '06', 'orange': '07', 'yellow': '08', 'lime': '09',
-                'cyan': '10', 'light_cyan': '11', 'light_blue': '12', 'pink': '13', 'grey': '14', 'light_grey': '15'
-            }
-            if color in color_codes:
-                codes.append(f'\x03{color_codes[color]}')
-        if bg_color:
-            bg_codes = {
-                'white': '00', 'black': '01', 'blue': '02', 'green': '03', 'red': '04',
-                'brown': '05', 'purple': '06', 'orange': '07', 'yellow': '08', 'lime': '09',
-                'cyan': '10', 'light_cyan': '11', 'light_blue': '12', 'pink': '13', 'grey': '14', 'light_grey': '15'
-            }
-            if bg_color in bg_codes:
-                codes.append(f',{bg_codes[bg_color]}')
+        if color in IRC_FG_CODES:
+            codes.append(IRC_FG_CODES[color])
+        if bg_color in IRC_BG_CODES:
+            codes.append(IRC_BG_CODES[bg_color])
         
         return ''.join(codes) + text + '\x0f'  # \x0f resets all formatting
     
@@ -878,10 +1543,9 @@ shop_extra_magazine = 400
         
         self.log_action(f"Connecting to {server}:{port} (network: {network.name})")
         
-        # Test DNS resolution first
+        # Test DNS resolution first (in the loop's executor so other networks keep running)
         try:
-            import socket as socket_module
-            resolved = socket_module.getaddrinfo(server, port, socket_module.AF_UNSPEC, socket_module.SOCK_STREAM)
+            resolved = await asyncio.get_running_loop().getaddrinfo(server, port, family=socket.AF_UNSPEC, type=socket.SOCK_STREAM)
             self.log_action(f"DNS resolution successful for {server}: {len(resolved)} addresses found")
             for i, addr in enumerate(resolved):
                 self.log_action(f"  Address {i+1}: {addr[4]} (family: {addr[0]})")
@@ -889,38 +1553,18 @@ shop_extra_magazine = 400
             self.log_action(f"DNS resolution failed for {server}: {e}")
             raise
         
+        # Plain and SSL connections both use asyncio streams (open_connection tries IPv4 and IPv6 addresses)
         if network.config.get('ssl', 'off').lower() == 'on':
-            # Create SSL context and connect using asyncio
             network.ssl_context = ssl.create_default_context()
             network.reader, network.writer = await asyncio.open_connection(
                 server, port, ssl=network.ssl_context, server_hostname=server
             )
-            # Get the underlying socket for compatibility with existing code
-            network.sock = network.writer.get_extra_info('socket')
             self.log_action(f"SSL connection established to {server}:{port}")
         else:
-            # Try IPv4 first, then IPv6 if that fails
-            try:
-                # Use AF_INET for IPv4 first
-                network.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                await asyncio.get_event_loop().sock_connect(network.sock, (server, port))
-                self.log_action(f"Connected to {server}:{port} via IPv4")
-            except Exception as e:
-                self.log_action(f"IPv4 connection failed: {e}, trying IPv6")
-                try:
-                    # Close the IPv4 socket and try IPv6
-                    network.sock.close()
-                    network.sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
-                    await asyncio.get_event_loop().sock_connect(network.sock, (server, port))
-                    self.log_action(f"Connected to {server}:{port} via IPv6")
-                except Exception as e2:
-                    self.log_action(f"Both IPv4 and IPv6 connections failed: IPv4={e}, IPv6={e2}")
-                    raise e2
-            
-            # Set socket to non-blocking mode
-            network.sock.setblocking(False)
-            network.reader = None
-            network.writer = None
+            network.reader, network.writer = await asyncio.open_connection(server, port)
+            self.log_action(f"Connected to {server}:{port}")
+        # Get the underlying socket for compatibility with existing code
+        network.sock = network.writer.get_extra_info('socket')
         
         # Send IRC handshake
         bot_nicks = network.config['bot_nick'].split(',')
@@ -940,42 +1584,34 @@ shop_extra_magazine = 400
         self.log_action(f"Registration complete for {network.name}, joining channels and running perform commands")
         
         # Join channels
-        channels = network.config['channel'].split(',')
-        for channel in channels:
-            channel = channel.strip()
-            if channel:
-                await self.send_network(network, f"JOIN {channel}")
-                network.channels[channel.lower()] = set()  # Normalize channel name
-                # Request user list for the channel
-                await self.send_network(network, f"NAMES {channel}")
+        for channel in network.channel_list:
+            await self.send_network(network, f"JOIN {channel}")
+            network.channels[channel] = set()
+            # Request user list for the channel
+            await self.send_network(network, f"NAMES {channel}")
         
         # Perform commands
-        if 'perform' in network.config:
-            perform_commands = network.config['perform'].split(';')
-            for cmd in perform_commands:
-                if cmd.strip():
-                    await self.send_network(network, cmd.strip())
+        for cmd in network.perform_commands:
+            await self.send_network(network, cmd)
         
         # Schedule first duck spawn per channel
         await self.schedule_next_duck(network)
     
+    def refresh_config(self):
+        """Rebuild the parsed config values (owner/admin sets, channel lists) globally and for every network"""
+        # Global config is the fallback for backward compatibility
+        self._default_owners = parse_nick_list(self.config.get('DEFAULT', 'owner', fallback=''))
+        self._default_admins = parse_nick_list(self.config.get('DEFAULT', 'admin', fallback=''))
+        for network in self.networks.values():
+            network.refresh_config()
+    
     def is_owner(self, user, network: NetworkConnection = None):
         """Check if user is owner for a specific network"""
-        if network:
-            owners = network.config.get('owner', '').split(',')
-        else:
-            # Fallback to global config for backward compatibility
-            owners = self.config.get('DEFAULT', 'owner', fallback='').split(',')
-        return user.lower() in [o.strip().lower() for o in owners]
+        return user.lower() in (network._owners if network else self._default_owners)
     
     def is_admin(self, user, network: NetworkConnection = None):
         """Check if user is admin for a specific network"""
-        if network:
-            admins = network.config.get('admin', '').split(',')
-        else:
-            # Fallback to global config for backward compatibility
-            admins = self.config.get('DEFAULT', 'admin', fallback='').split(',')
-        return user.lower() in [a.strip().lower() for a in admins]
+        return user.lower() in (network._admins if network else self._default_admins)
     
     def is_authenticated(self, user):
         """Check if user is authenticated (cached)"""
@@ -1020,29 +1656,19 @@ shop_extra_magazine = 400
 
     def normalize_channel(self, channel: str) -> str:
         """Normalize channel name for internal dictionaries (strip + lower)."""
-        return channel.strip().lower()
+        return normalize_channel_name(channel)
     
-    def find_channel_key(self, network, channel, debug_channel=None, debug_network=None):
+    def find_channel_key(self, network, channel):
         """Find the actual channel key in network.channels, ignoring prefixes"""
-        normalized_channel = channel.strip().lstrip('#&+@').lower()
-        self.log_action(f"DEBUG: Looking for channel '{channel}' (normalized: '{normalized_channel}') in network.channels: {list(network.channels.keys())}", debug_channel, debug_network)
-        for ch in network.channels.keys():
-            ch_normalized = ch.strip().lstrip('#&+@').lower()
-            self.log_action(f"DEBUG: Comparing '{ch}' (normalized: '{ch_normalized}') with '{normalized_channel}'", debug_channel, debug_network)
-            if ch_normalized == normalized_channel:
-                self.log_action(f"DEBUG: Found match! Returning '{ch}'", debug_channel, debug_network)
-                return ch
-        self.log_action(f"DEBUG: No match found for '{channel}'", debug_channel, debug_network)
-        return None
+        return network.channels.find(channel)
     
     def normalize_nick(self, nick):
         """Normalize IRC nick for comparison (case-insensitive)"""
-        return nick.lower().strip()
+        return normalize_nick_name(nick)
     
     def get_network_channel_key(self, network: NetworkConnection, channel: str) -> str:
         """Get network-prefixed channel key for global data structures."""
-        norm_channel = self.normalize_channel(channel)
-        return f"{network.name}:{norm_channel}"
+        return network.channel_key(channel)
     
     def get_network_channel_key_from_name(self, network_name: str, channel: str) -> str:
         """Get network-prefixed channel key from network name."""
@@ -1051,30 +1677,25 @@ shop_extra_magazine = 400
     
     def get_player(self, user):
         """Get or create player data"""
-        if user not in self.players:
-            self.players[user] = {
-                'ammo': 10,
-                'magazines': 2,
-                'jammed': False,
-                'confiscated': False,
-                'sabotaged': False,
-                'inventory': {},
-                'karma': 0.0,
-                'channel_stats': {}  # Per-channel stats: {channel: {xp, ducks_shot, golden_ducks, misses, accidents, best_time, total_reaction_time, shots_fired, last_duck_time}}
-            }
-        return self.players[user]
+        player = self.players.get(user)
+        if player is None:
+            # Fresh containers: PLAYER_DEFAULTS only holds immutable values
+            player = self.players[user] = dict(self.PLAYER_DEFAULTS, inventory={}, channel_stats={})
+        return player
     
-    def get_channel_stats(self, user, channel, network: NetworkConnection = None):
+    async def get_channel_stats(self, user, channel, network: NetworkConnection = None):
         """Get or create channel-specific stats for a player"""
-        # For SQL backend, load fresh from database every time
+        # For SQL backend, read through the backend's row cache
         if self.data_storage == 'sql' and self.db_backend and network:
-            stats = self.db_backend.get_channel_stats(user, network.name, channel)
+            channel_name = network.normalized_channel(channel)
+            stats = await self.db_backend.get_channel_stats(user, network.name, channel_name)
             if stats:
                 return stats
             # If no stats found, create default and return
-            return self.db_backend.get_channel_stats(user, network.name, channel)
+            return await self.db_backend.get_channel_stats(user, network.name, channel_name)
         
-        # For JSON backend, use in-memory player data
+        # For JSON backend, use in-memory player data; callers modify it in place
+        # and mark it for saving through update_stats_in_backend
         player = self.get_player(user)
         
         # Use network-prefixed key if network is provided
@@ -1106,89 +1727,14 @@ shop_extra_magazine = 400
                 self.log_action(f"Migrated player data for {user}: {old_key} -> {channel_key}")
             else:
                 # Create new empty stats if no old data found
-                player['channel_stats'][channel_key] = {
-                    'xp': 0,
-                    'ducks_shot': 0,
-                    'golden_ducks': 0,
-                    'misses': 0,
-                    'accidents': 0,
-                    'best_time': None,
-                    'total_reaction_time': 0.0,
-                    'shots_fired': 0,
-                    'last_duck_time': None,
-                    'wild_fires': 0,
-                    'confiscated': False,
-                    'jammed': False,
-                    'sabotaged': False,
-                    'ammo': 0,
-                    'magazines': 0,
-                    'ap_shots': 0,
-                    'explosive_shots': 0,
-                    'bread_uses': 0,
-                    'befriended_ducks': 0,
-                    'trigger_lock_until': 0,
-                    'trigger_lock_uses': 0,
-                    'grease_until': 0,
-                    'silencer_until': 0,
-                    'sunglasses_until': 0,
-                    'ducks_detector_until': 0,
-                    'mirror_until': 0,
-                    'sand_until': 0,
-                    'soaked_until': 0,
-                    'life_insurance_until': 0,
-                    'liability_insurance_until': 0,
-                    'brush_until': 0,
-                    'clover_until': 0,
-                    'clover_bonus': 0,
-                    'sight_next_shot': False
-                }
+                player['channel_stats'][channel_key] = dict(self.STATS_DEFAULTS)
             created_new = True
-        # Backfill newly introduced fields for existing channel stats
+            self._players_dirty = True
         stats = player['channel_stats'][channel_key]
-        if 'ap_shots' not in stats:
-            stats['ap_shots'] = 0
-        if 'explosive_shots' not in stats:
-            stats['explosive_shots'] = 0
-        if 'bread_uses' not in stats:
-            stats['bread_uses'] = 0
-        if 'trigger_lock_until' not in stats:
-            stats['trigger_lock_until'] = 0
-        if 'trigger_lock_uses' not in stats:
-            stats['trigger_lock_uses'] = 0
-        if 'grease_until' not in stats:
-            stats['grease_until'] = 0
-        if 'silencer_until' not in stats:
-            stats['silencer_until'] = 0
-        if 'sunglasses_until' not in stats:
-            stats['sunglasses_until'] = 0
-        if 'mirror_until' not in stats:
-            stats['mirror_until'] = 0
-        if 'sand_until' not in stats:
-            stats['sand_until'] = 0
-        if 'soaked_until' not in stats:
-            stats['soaked_until'] = 0
-        if 'life_insurance_until' not in stats:
-            stats['life_insurance_until'] = 0
-        if 'liability_insurance_until' not in stats:
-            stats['liability_insurance_until'] = 0
-        if 'brush_until' not in stats:
-            stats['brush_until'] = 0
-        if 'ducks_detector_until' not in stats:
-            stats['ducks_detector_until'] = 0
-        if 'clover_until' not in stats:
-            stats['clover_until'] = 0
-        if 'clover_bonus' not in stats:
-            stats['clover_bonus'] = 0
-        if 'sight_next_shot' not in stats:
-            stats['sight_next_shot'] = False
-        if 'wild_fires' not in stats:
-            stats['wild_fires'] = 0
-        if 'mag_upgrade_level' not in stats:
-            stats['mag_upgrade_level'] = 0
-        if 'mag_capacity_level' not in stats:
-            stats['mag_capacity_level'] = 0
-        if 'level' not in stats:
-            stats['level'] = min(50, (stats.get('xp', 0) // 100) + 1)
+        # Backfill newly introduced fields, once per stats dict
+        if stats.get('_v', 0) < self.STATS_SCHEMA_VERSION:
+            self._upgrade_stats(stats)
+            self._players_dirty = True
         # Dynamic properties will be (re)computed each fetch
         self.apply_level_bonuses(stats)
         # Initialize ammo/magazines to level-based capacities for newly created stats
@@ -1197,28 +1743,33 @@ shop_extra_magazine = 400
             stats['magazines'] = stats.get('magazines_max', 2)
         return stats
 
-    def _filter_computed_stats(self, stats_dict):
-        """Remove computed fields that shouldn't be persisted to database"""
-        return {k: v for k, v in stats_dict.items() if k not in [
-            'miss_penalty', 'wild_penalty', 'accident_penalty', 'reliability_pct'
-        ]}
+    def _upgrade_stats(self, stats):
+        """Backfill fields missing from stats saved by an older version"""
+        for field, default in self.STATS_DEFAULTS.items():
+            stats.setdefault(field, default)
+        if 'level' not in stats:
+            stats['level'] = min(50, (stats.get('xp', 0) // 100) + 1)
+        stats['_v'] = self.STATS_SCHEMA_VERSION
     
-    def update_stats_in_backend(self, user, channel, network, stats_dict):
+    async def update_stats_in_backend(self, user, channel, network, stats_dict):
         """Update stats in the appropriate backend (SQL or JSON)"""
         if self.data_storage == 'sql' and self.db_backend:
             # Update in SQL backend
-            # Remove computed fields before saving (these are recalculated by apply_level_bonuses)
-            save_stats = self._filter_computed_stats(stats_dict)
-            network_name = network.name if network else 'unknown'
-            channel_name = channel
-            return self.db_backend.update_channel_stats(user, network_name, channel_name, save_stats)
+            # Computed fields (recalculated by apply_level_bonuses) aren't SQL columns, so the
+            # backend skips them; the dict is passed as-is so it can diff against what was read
+            if network:
+                return await self.db_backend.update_channel_stats(user, network.name, network.normalized_channel(channel), stats_dict)
+            return await self.db_backend.update_channel_stats(user, 'unknown', normalize_channel_name(channel), stats_dict)
+        # JSON backend: stats_dict is the in-memory dict itself, so it only needs saving
+        self._players_dirty = True
+        return True
 
-    def compute_accuracy(self, channel_stats, mode: str) -> float:
+    def compute_accuracy(self, channel_stats, mode: str, now: float = None) -> float:
         """Compute hit chance based on level and temporary buffs.
-        mode: 'shoot' or 'bef'
+        mode: 'shoot' or 'bef'; now defaults to the current time
         """
         # Use table accuracy, then apply temporary modifiers
-        props = self.get_level_properties(int(float(channel_stats['xp'])))
+        props = self.get_level_properties(channel_stats['xp'])
         base = props['accuracy_pct'] / 100.0
         if mode == 'shoot' and channel_stats.get('explosive_shots', 0) > 0:
             # Explosive: Accuracy = A + (1 - A) * 0.25
@@ -1230,7 +1781,8 @@ shop_extra_magazine = 400
         if mode == 'bef' and channel_stats.get('bread_uses', 0) > 0:
             base += 0.10  # bread improves befriending effectiveness
         # Mirror (dazzle) reduces accuracy unless sunglasses are active
-        now = time.time()
+        if now is None:
+            now = time.time()
         if channel_stats.get('mirror_until', 0) > now and not (channel_stats.get('sunglasses_until', 0) > now):
             # Reduce current accuracy by 25%
             base = base * 0.75
@@ -1238,65 +1790,8 @@ shop_extra_magazine = 400
 
     def get_level_properties(self, xp: int) -> dict:
         """Return level properties based on XP using the provided table."""
-        thresholds = [
-            (-5, 0, 55, 85, 6, 1,  -1, -1, -25),
-            (-4, 1, 55, 85, 6, 2,  -1, -1, -25),
-            (20, 2, 56, 86, 6, 2,  -1, -1, -25),
-            (50, 3, 57, 87, 6, 2,  -1, -1, -25),
-            (90, 4, 58, 88, 6, 2,  -1, -1, -25),
-            (140,5, 59, 89, 6, 2,  -1, -1, -25),
-            (200,6, 60, 90, 6, 2,  -1, -1, -25),
-            (270,7, 65, 93, 4, 3,  -1, -1, -25),
-            (350,8, 67, 93, 4, 3,  -1, -1, -25),
-            (440,9, 69, 93, 4, 3,  -1, -1, -25),
-            (540,10,71, 94, 4, 3,  -1, -2, -25),
-            (650,11,73, 94, 4, 3,  -1, -2, -25),
-            (770,12,73, 94, 4, 3,  -1, -2, -25),
-            (900,13,74, 95, 4, 3,  -1, -2, -25),
-            (1040,14,74,95, 4, 3,  -1, -2, -25),
-            (1190,15,75,95, 4, 3,  -1, -2, -25),
-            (1350,16,80,97, 2, 4,  -1, -2, -25),
-            (1520,17,81,97, 2, 4,  -1, -2, -25),
-            (1700,18,81,97, 2, 4,  -1, -2, -25),
-            (1890,19,82,97, 2, 4,  -1, -2, -25),
-            (2090,20,82,97, 2, 4,  -3, -5, -25),
-            (2300,21,83,98, 2, 4,  -3, -5, -25),
-            (2520,22,83,98, 2, 4,  -3, -5, -25),
-            (2750,23,84,98, 2, 4,  -3, -5, -25),
-            (2990,24,84,98, 2, 4,  -3, -5, -25),
-            (3240,25,85,98, 2, 4,  -3, -5, -25),
-            (3500,26,90,99, 1, 5,  -3, -5, -25),
-            (3770,27,91,99, 1, 5,  -3, -5, -25),
-            (4050,28,91,99, 1, 5,  -3, -5, -25),
-            (4340,29,92,99, 1, 5,  -3, -5, -25),
-            (4640,30,92,99, 1, 5,  -5, -8, -25),
-            (4950,31,93,99, 1, 5,  -5, -8, -25),
-            (5270,32,93,99, 1, 5,  -5, -8, -25),
-            (5600,33,94,99, 1, 5,  -5, -8, -25),
-            (5940,34,94,99, 1, 5,  -5, -8, -25),
-            (6290,35,95,99, 1, 5,  -5, -8, -25),
-            (6650,36,95,99, 1, 5,  -5, -8, -25),
-            (7020,37,96,99, 1, 5,  -5, -8, -25),
-            (7400,38,96,99, 1, 5,  -5, -8, -25),
-            (7790,39,97,99, 1, 5,  -5, -8, -25),
-            (8200,40,97,99, 1, 5,  -5, -8, -25),
-        ]
-        # Pick the highest threshold <= xp
-        chosen = thresholds[0]
-        for t in thresholds:
-            if xp >= t[0]:
-                chosen = t
-        _, level, acc, rel, clip, clips, misspen, wildpen, accpen = chosen
-        return {
-            'level': level,
-            'accuracy_pct': acc,
-            'reliability_pct': rel,
-            'magazine_capacity': clip,
-            'magazines_max': clips,
-            'miss_penalty': -abs(misspen),
-            'wild_penalty': -abs(wildpen),
-            'accident_penalty': -abs(accpen),
-        }
+        # Pick the highest threshold <= xp (the first row if xp is below all of them)
+        return LEVEL_PROPERTIES[max(0, bisect.bisect_right(LEVEL_THRESHOLDS, xp) - 1)]
 
     def format_xp_display(self, cost: int, current_xp: int) -> str:
         """Format XP cost and current XP for display"""
@@ -1304,18 +1799,17 @@ shop_extra_magazine = 400
     
     def get_next_level_xp_requirement(self, current_xp: int) -> tuple:
         """Get the next level number and XP requirement"""
-        current_level = min(50, (current_xp // 100) + 1)
+        current_level = current_xp // 100 + 1
         if current_level >= 50:
             return 50, 0  # Max level reached
-        next_level = current_level + 1
-        next_level_xp = (next_level - 1) * 100  # XP needed for next level
-        xp_needed = next_level_xp - current_xp
-        return next_level, xp_needed
+        # Level n starts at (n - 1) * 100 XP, so the next level starts at current_level * 100
+        return current_level + 1, current_level * 100 - current_xp
 
     async def check_level_change(self, user: str, channel: str, stats: dict, prev_xp: int, network: NetworkConnection) -> None:
         """Announce promotion/demotion when XP crosses thresholds."""
-        prev_level = min(50, (int(float(prev_xp)) // 100) + 1)
-        new_level = min(50, (int(float(stats.get('xp', 0))) // 100) + 1)
+        new_xp = stats.get('xp', 0)
+        prev_level = min(50, prev_xp // 100 + 1)
+        new_level = min(50, new_xp // 100 + 1)
         if new_level == prev_level:
             return
         titles = [
@@ -1325,12 +1819,14 @@ shop_extra_magazine = 400
         title = titles[min(new_level-1, len(titles)-1)] if new_level > 0 else "unknown"
         
         # Calculate old and new level capacities (including upgrades)
-        old_props = self.get_level_properties(int(float(prev_xp)))
-        new_props = self.get_level_properties(int(float(stats.get('xp', 0))))
-        old_mag_cap = old_props['magazine_capacity'] + int(stats.get('mag_upgrade_level', 0))
-        old_mags_max = old_props['magazines_max'] + int(stats.get('mag_capacity_level', 0))
-        new_mag_cap = new_props['magazine_capacity'] + int(stats.get('mag_upgrade_level', 0))
-        new_mags_max = new_props['magazines_max'] + int(stats.get('mag_capacity_level', 0))
+        old_props = self.get_level_properties(prev_xp)
+        new_props = self.get_level_properties(new_xp)
+        mag_upgrade_level = int(stats.get('mag_upgrade_level', 0))
+        mag_capacity_level = int(stats.get('mag_capacity_level', 0))
+        old_mag_cap = old_props['magazine_capacity'] + mag_upgrade_level
+        old_mags_max = old_props['magazines_max'] + mag_capacity_level
+        new_mag_cap = new_props['magazine_capacity'] + mag_upgrade_level
+        new_mags_max = new_props['magazines_max'] + mag_capacity_level
         
         mag_change_msg = ""
         ammo_change_msg = ""
@@ -1358,7 +1854,7 @@ shop_extra_magazine = 400
                     ammo_change_msg = f" You found {ammo_diff} bullets."
             
             # Add next level XP requirement
-            next_level, xp_needed = self.get_next_level_xp_requirement(int(float(stats.get('xp', 0))))
+            next_level, xp_needed = self.get_next_level_xp_requirement(new_xp)
             if next_level <= 50:
                 level_info = f" {xp_needed} XP for lvl {next_level}."
             else:
@@ -1384,7 +1880,7 @@ shop_extra_magazine = 400
                     mag_change_msg = f" You lost {lost_mags} magazines."
             
             # Add next level XP requirement
-            next_level, xp_needed = self.get_next_level_xp_requirement(int(float(stats.get('xp', 0))))
+            next_level, xp_needed = self.get_next_level_xp_requirement(new_xp)
             if next_level <= 50:
                 level_info = f" {xp_needed} XP for lvl {next_level}."
             else:
@@ -1395,7 +1891,7 @@ shop_extra_magazine = 400
         stats['level'] = new_level
 
     def apply_level_bonuses(self, channel_stats):
-        props = self.get_level_properties(int(float(channel_stats['xp'])))
+        props = self.get_level_properties(channel_stats['xp'])
         # Base capacities from level table
         base_magazine_capacity = props['magazine_capacity']
         base_mags = props['magazines_max']
@@ -1408,105 +1904,94 @@ shop_extra_magazine = 400
         channel_stats['wild_penalty'] = props['wild_penalty']
         channel_stats['accident_penalty'] = props['accident_penalty']
 
-    def unconfiscate_confiscated_in_channel(self, channel: str, network: NetworkConnection = None) -> None:
+    def confiscate_gun(self, user: str, channel: str, network: NetworkConnection, channel_stats: dict) -> None:
+        """Confiscate a player's gun; it is returned when the channel's duck is shot or leaves."""
+        channel_stats['confiscated'] = True
+        self.confiscated_users.setdefault(self.get_network_channel_key(network, channel), set()).add(user)
+    
+    def activate_duck_detector(self, user: str, channel: str, network: NetworkConnection, channel_stats: dict, until: float) -> None:
+        """Give a player pre-spawn notices on a channel until the given time."""
+        channel_stats['ducks_detector_until'] = until
+        self.detector_until.setdefault(self.get_network_channel_key(network, channel), {})[user] = until
+    
+    async def unconfiscate_confiscated_in_channel(self, channel: str, network: NetworkConnection = None) -> None:
         """Quietly return confiscated guns to all players on a channel."""
-        if network:
-            target_key = self.get_network_channel_key(network, channel)
-            for _player_name, player_data in self.players.items():
-                channel_stats_map = player_data.get('channel_stats', {})
-                if target_key in channel_stats_map and channel_stats_map[target_key].get('confiscated'):
-                    channel_stats_map[target_key]['confiscated'] = False
-        else:
-            # Fallback for backward compatibility
-            target_norm = self.normalize_channel(channel)
-            for _player_name, player_data in self.players.items():
-                channel_stats_map = player_data.get('channel_stats', {})
-                for ch_key, stats in channel_stats_map.items():
-                    if self.normalize_channel(ch_key) == target_norm and stats.get('confiscated'):
-                        stats['confiscated'] = False
+        # Without a network, channel is already a channel key (despawn fallback)
+        target_key = self.get_network_channel_key(network, channel) if network else channel
+        users = self.confiscated_users.pop(target_key, None)
+        if not users:
+            return
+        for user in users:
+            if self.data_storage == 'sql' and self.db_backend:
+                if network:
+                    await self.update_stats_in_backend(user, channel, network, {'confiscated': False})
+            else:
+                stats = self.players.get(user, {}).get('channel_stats', {}).get(target_key)
+                if stats and stats.get('confiscated'):
+                    stats['confiscated'] = False
+                    self._players_dirty = True
     
     async def spawn_duck(self, network: NetworkConnection, channel=None, schedule: bool = True):
         """Spawn a new duck in a specific channel. If schedule is False, do not reset the auto timer."""
         if channel is None:
             # Pick a random channel from the network
-            channels = [ch.strip() for ch in network.config.get('channel', '#default').split(',') if ch.strip()]
-            if not channels:
+            if not network.channel_list:
                 return
-            channel = random.choice(channels)
+            channel = self._choice(network.channel_list)
         
-        async with self.ducks_lock:
-            channel_key = self.get_network_channel_key(network, channel)
-            if channel_key not in self.active_ducks:
-                self.active_ducks[channel_key] = []
+        channel_key = self.get_network_channel_key(network, channel)
+        async with self.duck_lock(channel_key):
+            ducks = self.active_ducks.get(channel_key)
             # Enforce max_ducks from network config
             max_ducks = self.get_network_max_ducks(network)
-            if len(self.active_ducks[channel_key]) >= max_ducks:
+            if len(ducks or ()) >= max_ducks:
                 return
             gold_ratio = self.get_network_gold_ratio(network)
-            is_golden = random.random() < gold_ratio
-            duck = {
-                'golden': is_golden,
-                'health': 5 if is_golden else 1,
-                'spawn_time': time.time(),
-                'revealed': False
-            }
+            is_golden = self._random() < gold_ratio
+            spawn_time = time.time()
+            if ducks is None:
+                ducks = self.active_ducks[channel_key] = DuckList()
             # Append new duck (FIFO)
-            self.active_ducks[channel_key].append(duck)
+            ducks.append(is_golden, spawn_time)
+            heapq.heappush(network.duck_spawn_heap, (spawn_time, channel_key))
         
         # Debug logging
-        self.log_action(f"Spawned {'golden' if is_golden else 'regular'} duck in {channel} - spawn_time: {duck['spawn_time']}")
-        
-        # Create duck art with custom coloring: dust=gray, duck=yellow, QUACK=red/green/gold
-        dust = "-.,¸¸.-·°'`'°·-.,¸¸.-·°'`'°· "
-        duck_char = "\\_O<"
-        quack = "   QUACK"
-        
-        # Color the parts separately
-        dust_colored = self.colorize(dust, 'grey')
-        duck_colored = self.colorize(duck_char, 'yellow')
-        quack_colored = f"   {self.colorize('Q', 'red')}{self.colorize('U', 'green')}{self.colorize('A', 'yellow')}{self.colorize('C', 'red')}{self.colorize('K', 'green')}"
-        
-        duck_art = f"{dust_colored}{duck_colored}{quack_colored}"
+        self.log_action(f"Spawned {'golden' if is_golden else 'regular'} duck in {channel} - spawn_time: {spawn_time}")
         
-        await self.send_message(network, channel, duck_art)
-        
-        # Check active_ducks state after sending messages
-        async with self.ducks_lock:
-            self.log_action(f"Duck spawned in {channel} on {network.name} - spawn_time: {duck['spawn_time']}")
+        await self.send_message(network, channel, self._duck_art)
+        self.log_action(f"Duck spawned in {channel} on {network.name} - spawn_time: {spawn_time}")
         
         # Mark last spawn time for guarantees (only for automatic spawns)
         if schedule:
-            try:
-                network.channel_last_spawn[channel] = time.time()
-            except Exception:
-                pass
+            network.schedule_for(channel).last_spawn = time.time()
             await self.schedule_channel_next_duck(network, channel)
     
     async def schedule_next_duck(self, network: NetworkConnection):
         """Schedule next duck spawn for all channels on a network."""
+        now = time.time()
         # Schedule each joined channel independently
         for ch in list(network.channels.keys()):
-            await self.schedule_channel_next_duck(network, ch)
+            await self.schedule_channel_next_duck(network, ch, now=now)
         # Summary for visibility
-        try:
-            summary = {ch: int(network.channel_next_spawn.get(ch, 0) - time.time()) for ch in network.channels.keys()}
-            self.log_action(f"Per-channel schedules for {network.name} (s): {summary}")
-        except Exception:
-            pass
+        if self.debug_logging:
+            summary = {ch: int((network.schedule_for(ch).next_spawn or 0) - now) for ch in network.channels.keys()}
+            self.log_action(f"DEBUG: Per-channel schedules for {network.name} (s): {summary}")
 
-    async def schedule_channel_next_duck(self, network: NetworkConnection, channel: str, allow_immediate: bool = True):
+    async def schedule_channel_next_duck(self, network: NetworkConnection, channel: str, allow_immediate: bool = True, now: float = None):
         """Schedule next duck spawn for a specific channel with pre-notice.
         Hard guarantee: never allow gap > max_spawn; if overdue, schedule immediate
         unless allow_immediate is False (e.g., when probing via !nextduck).
         """
-        now = time.time()
-        last = network.channel_last_spawn.get(channel, 0)
+        if now is None:
+            now = time.time()
+        schedule = network.schedule_for(channel)
+        last = schedule.last_spawn
         min_spawn = self.get_network_min_spawn(network)
         max_spawn = self.get_network_max_spawn(network)
         
         # If we've never spawned, schedule randomly within window
         if last == 0:
-            spawn_delay = random.randint(min_spawn, max_spawn)
+            spawn_delay = self._randint(min_spawn, max_spawn)
             due_time = now + spawn_delay
         else:
             # Calculate when the minimum spawn time would be satisfied
@@ -1519,23 +2004,30 @@ shop_extra_magazine = 400
                     due_time = now
                 else:
                     # Set a short delay to avoid !nextduck causing an instant spawn
-                    due_time = now + random.randint(10, 30)
+                    due_time = now + self._randint(10, 30)
             elif now >= earliest_allowed:
                 # Minimum time has passed, schedule within remaining window
                 remaining_window = max(0, int(latest_allowed - now))
-                spawn_delay = random.randint(1, max(1, remaining_window))
+                spawn_delay = self._randint(1, max(1, remaining_window))
                 due_time = now + spawn_delay
             else:
                 # Minimum time hasn't passed yet, wait until at least min_spawn has elapsed
                 min_remaining = int(earliest_allowed - now)
                 max_remaining = int(latest_allowed - now)
-                spawn_delay = random.randint(min_remaining, max_remaining)
+                spawn_delay = self._randint(min_remaining, max_remaining)
                 due_time = now + spawn_delay
-        network.channel_next_spawn[channel] = due_time
-        network.channel_pre_notice[channel] = max(now, due_time - 120)
-        network.channel_notice_sent[channel] = False
+        schedule.next_spawn = due_time
+        schedule.pre_notice = max(now, due_time - 120)
+        schedule.notice_sent = False
         self.log_action(f"Next duck scheduled for {channel} on {network.name} at {int(due_time - now)}s from now")
 
+    def duck_lock(self, channel_key: str) -> asyncio.Lock:
+        """Return the lock guarding one channel's active ducks"""
+        lock = self._duck_locks.get(channel_key)
+        if lock is None:
+            lock = self._duck_locks[channel_key] = asyncio.Lock()
+        return lock
+    
     async def can_spawn_duck(self, channel: str, network: NetworkConnection = None) -> bool:
         """Return True if the channel is below max active ducks and can accept a new duck."""
         if network:
@@ -1543,109 +2035,84 @@ shop_extra_magazine = 400
         else:
             channel_key = self.normalize_channel(channel)  # Fallback for backward compatibility
         max_ducks = self.get_network_max_ducks(network) if network else self.max_ducks
-        async with self.ducks_lock:
-            current_count = len(self.active_ducks.get(channel_key, []))
-            return current_count < max_ducks
+        # A plain read with no await in between, so no lock is needed
+        return len(self.active_ducks.get(channel_key, ())) < max_ducks
 
     async def notify_duck_detector(self, network: NetworkConnection):
         """Notify players with an active duck detector 120s before spawn, per channel."""
         now = time.time()
-        for channel in list(network.channel_next_spawn.keys()):
-            pre = network.channel_pre_notice.get(channel)
-            if pre is None:
-                continue
-            if not network.channel_notice_sent.get(channel, False) and now >= pre:
-                self.log_action(f"Duck detector pre-notice triggered for {channel} on {network.name}")
-                
-                # Query database for all users with active detector for this channel
-                if self.data_storage == 'sql' and self.db_backend:
-                    # SQL backend - query directly
-                    query = """SELECT p.username, cs.ducks_detector_until
-                               FROM players p
-                               JOIN channel_stats cs ON p.id = cs.player_id
-                               WHERE cs.network_name = %s AND cs.channel_name = %s
-                               AND cs.ducks_detector_until > %s"""
-                    users_with_detector = self.db_backend.execute_query(
-                        query, (network.name, channel, now), fetch=True
-                    ) or []
-                
-                # Send notice to each user with active detector
-                for user_data in users_with_detector:
-                    username = user_data['username']
-                    nxt = network.channel_next_spawn.get(channel)
-                    seconds_left = int(nxt - now) if nxt else 120
-                    seconds_left = max(0, seconds_left)
-                    # Show approximate time range instead of exact seconds
-                    if seconds_left > 60:
-                        msg = f"Your duck detector indicates the next duck will arrive soon... (approximately {seconds_left//60}m remaining)"
-                    else:
-                        msg = f"Your duck detector indicates the next duck will arrive soon... (less than 1m remaining)"
-                    self.log_action(f"Sending duck detector notice to {username}: {msg}")
-                    await self.send_notice(network, username, msg)
-                
-                network.channel_notice_sent[channel] = True
+        # Snapshot only the channels whose notice is due (sending below can yield to other tasks)
+        due = [(channel, schedule) for channel, schedule in network.channel_schedule.items()
+               if schedule.pre_notice is not None and now >= schedule.pre_notice and not schedule.notice_sent]
+        for channel, schedule in due:
+            self.log_action(f"Duck detector pre-notice triggered for {channel} on {network.name}")
+            
+            # Players with a detector on this channel; expired ones are dropped as we go
+            detectors = self.detector_until.get(self.get_network_channel_key(network, channel), {})
+            for username, until in list(detectors.items()):
+                if until <= now:
+                    del detectors[username]
+                    continue
+                nxt = schedule.next_spawn
+                seconds_left = int(nxt - now) if nxt else 120
+                seconds_left = max(0, seconds_left)
+                # Show approximate time range instead of exact seconds
+                if seconds_left > 60:
+                    msg = f"Your duck detector indicates the next duck will arrive soon... (approximately {seconds_left//60}m remaining)"
+                else:
+                    msg = f"Your duck detector indicates the next duck will arrive soon... (less than 1m remaining)"
+                self.log_action(f"Sending duck detector notice to {username}: {msg}")
+                await self.send_notice(network, username, msg)
+            
+            schedule.notice_sent = True
     
     async def despawn_old_ducks(self, network: NetworkConnection = None):
         """Remove ducks that have been alive too long"""
+        if network is None:
+            for net in list(self.networks.values()):
+                await self.despawn_old_ducks(net)
+            return
         current_time = time.time()
-        total_removed = 0
-        despawn_time = self.get_network_despawn_time(network) if network else self.despawn_time
-        
-        async with self.ducks_lock:
-            # Check each channel's active ducks
-            for channel_key, ducks in list(self.active_ducks.items()):
-                # Filter ducks that are still within lifespan
-                remaining_ducks = []
-                for duck in ducks:
-                    age = current_time - duck['spawn_time']
-                    if age < despawn_time:
-                        remaining_ducks.append(duck)
-                    else:
-                        total_removed += 1
-                        age_minutes = int(age / 60)
-                        self.log_action(f"Despawning duck in {channel_key} after {age_minutes} minutes")
-                        
-                        # Find the network and channel for this duck
-                        target_network = None
-                        target_channel = None
-                        
-                        if ':' in channel_key:
-                            # New format: network:channel
-                            network_name, channel_name = channel_key.split(':', 1)
-                            for net in self.networks.values():
-                                if net.name == network_name:
-                                    target_network = net
-                                    # Find the actual channel name (case-sensitive)
-                                    for ch in net.channels.keys():
-                                        if self.normalize_channel(ch) == channel_name:
-                                            target_channel = ch
-                                            break
-                                    break
-                        else:
-                            # Old format - find by normalized channel name
-                            for net in self.networks.values():
-                                for ch in net.channels.keys():
-                                    if self.normalize_channel(ch) == channel_key:
-                                        target_network = net
-                                        target_channel = ch
-                                        break
-                                if target_network:
-                                    break
-                        
-                        if target_network and target_channel:
-                            await self.send_message(target_network, target_channel, self.colorize("The duck flies away.     ·°'`'°-.,¸¸.·°'`", 'grey'))
-                        
-                        # Quietly unconfiscate all on this channel when a duck despawns
-                        if target_network and target_channel:
-                            self.unconfiscate_confiscated_in_channel(target_channel, target_network)
-                        else:
-                            # Fallback for old format
-                            self.unconfiscate_confiscated_in_channel(channel_key)
-                            
-                if remaining_ducks:
-                    self.active_ducks[channel_key] = remaining_ducks
-                else:
+        cutoff = current_time - self.get_network_despawn_time(network)
+        heap = network.duck_spawn_heap
+        
+        # Only channels whose oldest spawn is past the cutoff need looking at;
+        # entries for ducks already shot or cleared are just skipped
+        while heap and heap[0][0] <= cutoff:
+            _, channel_key = heapq.heappop(heap)
+            # Take the expired ducks under the lock; the messages go out after it is released
+            async with self.duck_lock(channel_key):
+                ducks = self.active_ducks.get(channel_key)
+                if ducks is None:
+                    continue
+                # Drop ducks that have outlived their lifespan
+                expired = ducks.expire(cutoff)
+                if not ducks:
                     del self.active_ducks[channel_key]
+            
+            channel_name = channel_key.split(':', 1)[-1]
+            target_channel = network.channels.find(channel_name)
+            for spawn_time in expired:
+                age_minutes = int((current_time - spawn_time) / 60)
+                self.log_action(f"Despawning duck in {channel_key} after {age_minutes} minutes")
+                
+                if target_channel:
+                    await self.send_message(network, target_channel, self.colorize("The duck flies away.     ·°'`'°-.,¸¸.·°'`", 'grey'))
+                    # Quietly unconfiscate all on this channel when a duck despawns
+                    await self.unconfiscate_confiscated_in_channel(target_channel, network)
+                else:
+                    await self.unconfiscate_confiscated_in_channel(channel_name, network)
+    
+    def pick_accident_victim(self, network: NetworkConnection, channel: str, shooter: str, chance: float) -> Optional[str]:
+        """Roll for a stray bullet; return the other player in the channel it hits, or None"""
+        # Roll first so the member list is only copied when someone actually gets hit
+        if self._random() >= chance:
+            return None
+        members = network.channels.get(channel)
+        if not members:
+            return None
+        candidates = [u for u in members if u != shooter and u != network.nick]
+        return self._choice(candidates) if candidates else None
     
     async def handle_bang(self, user, channel, network: NetworkConnection):
         """Handle !bang command"""
@@ -1654,7 +2121,8 @@ shop_extra_magazine = 400
             return
         
         player = self.get_player(user)
-        channel_stats = self.get_channel_stats(user, channel, network)
+        channel_stats = await self.get_channel_stats(user, channel, network)
+        now = time.time()  # One clock read for every *_until check and the reaction time
         
         if channel_stats['confiscated']:
             await self.send_message(network, channel, self.pm(user, "You are not armed."))
@@ -1663,17 +2131,17 @@ shop_extra_magazine = 400
         if channel_stats['jammed']:
             magazine_capacity = channel_stats.get('magazine_capacity', 10)
             mags_max = channel_stats.get('magazines_max', 2)
-            await self.send_message(network, channel, self.pm(user, f"{self.colorize('*CLACK*', 'red')} Your gun is {self.colorize('JAMMED', 'red', bold=True)} you must reload to unjam it... | Ammo: {channel_stats['ammo']}/{magazine_capacity} | Magazines : {channel_stats['magazines']}/{mags_max}"))
+            await self.send_message(network, channel, self.pm(user, f"{self._clack} Your gun is {self._jammed} you must reload to unjam it... | Ammo: {channel_stats['ammo']}/{magazine_capacity} | Magazines : {channel_stats['magazines']}/{mags_max}"))
             return
         
         if channel_stats['ammo'] <= 0:
             magazine_capacity = channel_stats.get('magazine_capacity', 10)
             mags_max = channel_stats.get('magazines_max', 2)
-            await self.send_message(network, channel, self.pm(user, f"{self.colorize('*CLICK*', 'red')} EMPTY MAGAZINE | Ammo: 0/{magazine_capacity} | Magazines: {channel_stats['magazines']}/{mags_max}"))
+            await self.send_message(network, channel, self.pm(user, f"{self._click} EMPTY MAGAZINE | Ammo: 0/{magazine_capacity} | Magazines: {channel_stats['magazines']}/{mags_max}"))
             return
         
         # Soaked players cannot shoot
-        if channel_stats.get('soaked_until', 0) > time.time():
+        if channel_stats.get('soaked_until', 0) > now:
             await self.send_message(network, channel, self.pm(user, "You are soaked and cannot shoot. Use spare clothes or wait."))
             return
         
@@ -1682,261 +2150,227 @@ shop_extra_magazine = 400
             await self.send_message(network, channel, self.pm(user, "You are covered in egg and cannot shoot. Use spare clothes to clean up."))
             return
         
-        # Check if there is a duck in this channel
-        async with self.ducks_lock:
-            channel_key = self.get_network_channel_key(network, channel)
-            if channel_key not in self.active_ducks:
-                # Trigger Lock: if active AND has uses, allow safe trigger lock and consume one use
-                now = time.time()
-                if channel_stats.get('trigger_lock_until', 0) > now and channel_stats.get('trigger_lock_uses', 0) > 0:
-                    channel_stats['trigger_lock_uses'] = max(0, channel_stats.get('trigger_lock_uses', 0) - 1)
-                    remaining_uses = channel_stats.get('trigger_lock_uses', 0)
-                    remaining_color = 'red' if remaining_uses == 0 else 'green'
-                    await self.send_message(network, channel, self.pm(user, f"{self.colorize('*CLICK*', 'red', bold=True)} Safety locked. {self.colorize(f'[{remaining_uses} remaining]', remaining_color)}"))
+        # Check if there is a duck in this channel. Only the duck itself is touched
+        # under the lock; messages and database writes happen after it is released.
+        channel_key = self.get_network_channel_key(network, channel)
+        found = jammed = hit = duck_killed = revealed = False
+        async with self.duck_lock(channel_key):
+            ducks = self.active_ducks.get(channel_key)
+            if ducks:
+                found = True
+                # Target the oldest active duck in this channel (slot 0)
+                is_golden = bool(ducks.gold[0])
+                
+                # Reliability (jam) check before consuming ammo
+                props = self.get_level_properties(channel_stats['xp'])
+                reliability = props['reliability_pct'] / 100.0
+                # Grease halves jam odds while active
+                if channel_stats.get('grease_until', 0) > now:
+                    reliability = 1.0 - (1.0 - reliability) * 0.5
+                # Sand makes jams more likely (halve reliability)
+                if channel_stats.get('sand_until', 0) > now:
+                    reliability = reliability * 0.5
+                # Brush slightly improves reliability while active (+10% of remaining)
+                if channel_stats.get('brush_until', 0) > now:
+                    reliability = reliability + (1.0 - reliability) * 0.10
+                jammed = self._random() > reliability
+                if not jammed:
+                    # Shoot at duck (consume ammo on non-jam)
+                    channel_stats['ammo'] -= 1
+                    channel_stats['shots_fired'] += 1
+                    reaction_time = max(0.0, now - ducks.spawn[0])  # now is read before waiting on the duck lock
                     
-                    # If uses reached 0, remove the safety lock completely
-                    if remaining_uses == 0:
-                        channel_stats['trigger_lock_until'] = 0
+                    # Accuracy check
+                    hit_roll = self._random()
+                    hit = hit_roll <= self.compute_accuracy(channel_stats, 'shoot', now)
+                if hit:
+                    # Compute damage
+                    damage = 1
+                    if is_golden:
+                        if channel_stats.get('explosive_shots', 0) > 0:
+                            damage = 2
+                            channel_stats['explosive_shots'] = max(0, channel_stats['explosive_shots'] - 1)
+                        elif channel_stats.get('ap_shots', 0) > 0:
+                            damage = 2
+                            channel_stats['ap_shots'] = max(0, channel_stats['ap_shots'] - 1)
                     
-                    if self.data_storage == 'sql' and self.db_backend:
-                        self.db_backend.update_channel_stats(user, network.name, channel, self._filter_computed_stats(channel_stats))
-                    else:
-                    return
-                # No duck present - apply wild fire penalties and confiscation
-                miss_pen = -random.randint(1, 5)  # Random penalty (-1 to -5) on miss
-                wild_pen = -2
-                if channel_stats.get('liability_insurance_until', 0) > now:
-                    # Liability insurance should only reduce accident-related penalties (wildfire/ricochet), not plain miss
-                    if wild_pen < 0:
-                        wild_pen = math.floor(wild_pen / 2)
-                total_pen = miss_pen + wild_pen
-                channel_stats['confiscated'] = True
-                prev_xp = float(channel_stats['xp'])
-                self.safe_xp_operation(channel_stats, 'subtract', -total_pen)
-                channel_stats['wild_fires'] += 1
-                await self.send_message(network, channel, self.pm(user, f"Luckily you missed, but what did you aim at? There is no duck in the area... {self.colorize(f'[missed: {miss_pen} xp]', 'red')} {self.colorize(f'[wild fire: {wild_pen} xp]', 'red')} {self.colorize('[GUN CONFISCATED: wild fire]', 'red', bold=True)}"))
-                # Accidental shooting (wild fire): 50% chance to hit a random player
-                victim = None
-                if channel in network.channels and network.channels[channel]:
-                    candidates = [u for u in list(network.channels[channel]) if u != user]
-                    try:
-                        bot_nick = self.config['bot_nick'].split(',')[0]
-                        candidates = [u for u in candidates if u != bot_nick]
-                    except Exception:
-                        pass
-                    if candidates and random.random() < 0.50:
-                        victim = random.choice(candidates)
-                if victim:
-                    acc_pen = channel_stats.get('accident_penalty', -25)
-                    if channel_stats.get('liability_insurance_until', 0) > now and acc_pen < 0:
-                        acc_pen = math.floor(acc_pen / 2)
-                    channel_stats['accidents'] += 1
-                    self.safe_xp_operation(channel_stats, 'subtract', -acc_pen)
-                    insured = channel_stats.get('life_insurance_until', 0) > now
-                    if insured:
-                        channel_stats['confiscated'] = False
-                    # Mirror on victim can add extra penalty if shooter lacks sunglasses
-                    vstats = self.get_channel_stats(victim, channel, network)
-                    if vstats.get('mirror_until', 0) > now and not (channel_stats.get('sunglasses_until', 0) > now):
-                        extra = -1
-                        if channel_stats.get('liability_insurance_until', 0) > now:
-                            extra = math.floor(extra / 2)
-                        self.safe_xp_operation(channel_stats, 'add', extra)
-                        await self.send_message(network, channel, self.pm(user, f"{self.colorize('ACCIDENT!', 'red', bold=True)} You accidentally shot {victim}! {self.colorize(f'[{acc_pen} xp]', 'red')} [mirror glare: {extra} xp]{' [INSURED: no confiscation]' if insured else ''}"))
-                    else:
-                        await self.send_message(network, channel, self.pm(user, f"{self.colorize('ACCIDENT!', 'red', bold=True)} You accidentally shot {victim}! {self.colorize(f'[{acc_pen} xp]', 'red')}{' [INSURED: no confiscation]' if insured else ''}"))
-                await self.check_level_change(user, channel, channel_stats, prev_xp, network)
-                if self.data_storage == 'sql' and self.db_backend:
-                    self.db_backend.update_channel_stats(user, network.name, channel, self._filter_computed_stats(channel_stats))
-                else:
+                    ducks.hp[0] -= damage
+                    duck_killed = ducks.hp[0] <= 0
+                    remaining = max(0, ducks.hp[0])
+                    # First hit on a golden duck reveals it
+                    if is_golden and not ducks.revealed[0]:
+                        ducks.revealed[0] = 1
+                        revealed = True
+                    # Remove the first (oldest) duck if dead
+                    if duck_killed:
+                        ducks.remove(0)
+                        if not ducks:
+                            del self.active_ducks[channel_key]
+        
+        # Liability insurance halves wild fire and accident penalties (read once for every branch below)
+        liability_insured = channel_stats.get('liability_insurance_until', 0) > now
+        
+        if not found:
+            # Trigger Lock: if active AND has uses, allow safe trigger lock and consume one use
+            if channel_stats.get('trigger_lock_until', 0) > now and channel_stats.get('trigger_lock_uses', 0) > 0:
+                channel_stats['trigger_lock_uses'] = max(0, channel_stats.get('trigger_lock_uses', 0) - 1)
+                remaining_uses = channel_stats.get('trigger_lock_uses', 0)
+                remaining_color = 'red' if remaining_uses == 0 else 'green'
+                await self.send_message(network, channel, self.pm(user, f"{self.colorize('*CLICK*', 'red', bold=True)} Safety locked. {self.colorize(f'[{remaining_uses} remaining]', remaining_color)}"))
+                    
+                # If uses reached 0, remove the safety lock completely
+                if remaining_uses == 0:
+                    channel_stats['trigger_lock_until'] = 0
+                    
+                await self.update_stats_in_backend(user, channel, network, channel_stats)
                 return
-            
-            # Target the active duck in this channel
-            target_duck = self.active_ducks[channel_key][0]
-            
-            # Reliability (jam) check before consuming ammo
-            props = self.get_level_properties(int(float(channel_stats['xp'])))
-            reliability = props['reliability_pct'] / 100.0
-            # Grease halves jam odds while active
-            if channel_stats.get('grease_until', 0) > time.time():
-                reliability = 1.0 - (1.0 - reliability) * 0.5
-            # Sand makes jams more likely (halve reliability)
-            if channel_stats.get('sand_until', 0) > time.time():
-                reliability = reliability * 0.5
-            # Brush slightly improves reliability while active (+10% of remaining)
-            if channel_stats.get('brush_until', 0) > time.time():
-                reliability = reliability + (1.0 - reliability) * 0.10
-            if random.random() > reliability:
-                channel_stats['jammed'] = True
-                magazine_capacity = channel_stats.get('magazine_capacity', 10)
-                mags_max = channel_stats.get('magazines_max', 2)
-                await self.send_message(network, channel, self.pm(user, f"{self.colorize('*CLACK*', 'red')} Your gun is {self.colorize('JAMMED', 'red', bold=True)} you must reload to unjam it... | Ammo: {channel_stats['ammo']}/{magazine_capacity} | Magazines : {channel_stats['magazines']}/{mags_max}"))
-                if self.data_storage == 'sql' and self.db_backend:
-                    self.db_backend.update_channel_stats(user, network.name, channel, self._filter_computed_stats(channel_stats))
+            # No duck present - apply wild fire penalties and confiscation
+            miss_pen = -self._randint(1, 5)  # Random penalty (-1 to -5) on miss
+            wild_pen = -2
+            if liability_insured:
+                # Liability insurance should only reduce accident-related penalties (wildfire/ricochet), not plain miss
+                if wild_pen < 0:
+                    wild_pen = math.floor(wild_pen / 2)
+            total_pen = miss_pen + wild_pen
+            self.confiscate_gun(user, channel, network, channel_stats)
+            prev_xp = channel_stats['xp']
+            self.safe_xp_operation(channel_stats, 'subtract', -total_pen)
+            channel_stats['wild_fires'] += 1
+            await self.send_message(network, channel, self.pm(user, self._wild_fire_miss_msg.format(miss_pen=miss_pen, wild_pen=wild_pen)))
+            # Accidental shooting (wild fire): 50% chance to hit a random player
+            victim = self.pick_accident_victim(network, channel, user, 0.50)
+            if victim:
+                acc_pen = channel_stats.get('accident_penalty', -25)
+                if liability_insured and acc_pen < 0:
+                    acc_pen = math.floor(acc_pen / 2)
+                channel_stats['accidents'] += 1
+                self.safe_xp_operation(channel_stats, 'subtract', -acc_pen)
+                insured = channel_stats.get('life_insurance_until', 0) > now
+                if insured:
+                    channel_stats['confiscated'] = False
+                # Mirror on victim can add extra penalty if shooter lacks sunglasses
+                vstats = await self.get_channel_stats(victim, channel, network)
+                if vstats.get('mirror_until', 0) > now and not (channel_stats.get('sunglasses_until', 0) > now):
+                    extra = -1
+                    if liability_insured:
+                        extra = math.floor(extra / 2)
+                    self.safe_xp_operation(channel_stats, 'add', extra)
+                    await self.send_message(network, channel, self.pm(user, self._accident_msg.format(victim=victim, acc_pen=acc_pen) + f" [mirror glare: {extra} xp]{' [INSURED: no confiscation]' if insured else ''}"))
                 else:
-                return
-
-            # Shoot at duck (consume ammo on non-jam)
-            channel_stats['ammo'] -= 1
-            channel_stats['shots_fired'] += 1
-            reaction_time = time.time() - target_duck['spawn_time']
+                    await self.send_message(network, channel, self.pm(user, self._accident_msg.format(victim=victim, acc_pen=acc_pen) + (' [INSURED: no confiscation]' if insured else '')))
+            await self.check_level_change(user, channel, channel_stats, prev_xp, network)
+            await self.update_stats_in_backend(user, channel, network, channel_stats)
+            return
             
-            # Accuracy check
-            hit_roll = random.random()
-            hit_chance = self.compute_accuracy(channel_stats, 'shoot')
-            if hit_roll > hit_chance:
-                channel_stats['misses'] += 1
-                # Random penalty (-1 to -5) on miss
-                penalty = -random.randint(1, 5)
-                prev_xp = channel_stats['xp']
-                self.safe_xp_operation(channel_stats, 'subtract', -penalty)
-                await self.send_message(network, channel, self.pm(user, f"{self.colorize('*BANG*', 'red', bold=True)} You missed. {self.colorize(f'[{penalty} xp]', 'red')}"))
-                # Ricochet accident: 20% chance to hit a random player
-                victim = None
-                if channel in network.channels and network.channels[channel]:
-                    candidates = [u for u in list(network.channels[channel]) if u != user]
-                    try:
-                        bot_nick = self.config['bot_nick'].split(',')[0]
-                        candidates = [u for u in candidates if u != bot_nick]
-                    except Exception:
-                        pass
-                    if candidates and random.random() < 0.20:
-                        victim = random.choice(candidates)
-                if victim:
-                    now2 = time.time()
-                    acc_pen = channel_stats.get('accident_penalty', -25)
-                    if channel_stats.get('liability_insurance_until', 0) > now2 and acc_pen < 0:
-                        acc_pen = math.floor(acc_pen / 2)
-                    channel_stats['accidents'] += 1
-                    self.safe_xp_operation(channel_stats, 'subtract', -acc_pen)
-                    insured = channel_stats.get('life_insurance_until', 0) > now2
-                    if insured:
-                        channel_stats['confiscated'] = False
-                    else:
-                        channel_stats['confiscated'] = True
-                    vstats = self.get_channel_stats(victim, channel, network)
-                    if vstats.get('mirror_until', 0) > now2 and not (channel_stats.get('sunglasses_until', 0) > now2):
-                        extra = -1
-                        if channel_stats.get('liability_insurance_until', 0) > now2:
-                            extra = math.floor(extra / 2)
-                        self.safe_xp_operation(channel_stats, 'add', extra)
-                        await self.send_message(network, channel, self.pm(user, f"{self.colorize('ACCIDENT', 'red', bold=True)}     {self.colorize('Your bullet ricochets into', 'red')} {victim}! {self.colorize(f'[accident: {acc_pen} xp]', 'red')} {self.colorize(f'[mirror glare: {extra} xp]', 'purple')}{self.colorize(' [INSURED: no confiscation]', 'green') if insured else self.colorize(' [GUN CONFISCATED: accident]', 'red', bold=True)}"))
-                    else:
-                        await self.send_message(network, channel, self.pm(user, f"{self.colorize('ACCIDENT', 'red', bold=True)}     {self.colorize('Your bullet ricochets into', 'red')} {victim}! {self.colorize(f'[accident: {acc_pen} xp]', 'red')}{self.colorize(' [INSURED: no confiscation]', 'green') if insured else self.colorize(' [GUN CONFISCATED: accident]', 'red', bold=True)}"))
-                # Save after miss (with or without ricochet)
-                await self.check_level_change(user, channel, channel_stats, prev_xp, network)
-                if self.data_storage == 'sql' and self.db_backend:
-                    self.db_backend.update_channel_stats(user, network.name, channel, self._filter_computed_stats(channel_stats))
-                else:
-                return
+        if jammed:
+            channel_stats['jammed'] = True
+            magazine_capacity = channel_stats.get('magazine_capacity', 10)
+            mags_max = channel_stats.get('magazines_max', 2)
+            await self.send_message(network, channel, self.pm(user, f"{self._clack} Your gun is {self._jammed} you must reload to unjam it... | Ammo: {channel_stats['ammo']}/{magazine_capacity} | Magazines : {channel_stats['magazines']}/{mags_max}"))
+            await self.update_stats_in_backend(user, channel, network, channel_stats)
+            return
 
-            # Compute damage
-            damage = 1
-            if target_duck['golden']:
-                if channel_stats.get('explosive_shots', 0) > 0:
-                    damage = 2
-                    channel_stats['explosive_shots'] = max(0, channel_stats['explosive_shots'] - 1)
-                elif channel_stats.get('ap_shots', 0) > 0:
-                    damage = 2
-                    channel_stats['ap_shots'] = max(0, channel_stats['ap_shots'] - 1)
-            
-            target_duck['health'] -= damage
-            duck_killed = target_duck['health'] <= 0
-            
-            # Handle golden duck hits
-            if target_duck['golden']:
-                if not target_duck.get('revealed', False):
-                    # First hit - reveal the golden duck
-                    target_duck['revealed'] = True
-                    remaining = max(0, target_duck['health'])
-                    hit_msg = f"{self.colorize('*BANG*', 'red', bold=True)} You hit the duck! {self.colorize('[GOLDEN DUCK DETECTED]', 'yellow', bold=True)} {self.colorize('[', 'red')}{self.colorize('\\_0<', 'yellow')} {self.colorize('life', 'red')} {remaining}]"
-                    await self.send_message(network, channel, self.pm(user, hit_msg))
-                    # Don't return early - continue to process the hit/kill logic
-                elif not duck_killed:
-                    # Already revealed golden duck - show survival message if not killed
-                    remaining = max(0, target_duck['health'])
-                    await self.send_message(network, channel, self.pm(user, f"{self.colorize('*BANG*', 'red', bold=True)} The golden duck survived! {self.colorize('[', 'red')}{self.colorize('\\_O<', 'yellow')} {self.colorize('life', 'red')} {remaining}]"))
-                    # Don't return early - continue to process the hit/kill logic
-            
-            # Remove if dead
-            if duck_killed and channel_key in self.active_ducks:
-                # Remove the first (oldest) duck
-                if self.active_ducks[channel_key]:
-                    self.active_ducks[channel_key].pop(0)
-                if not self.active_ducks[channel_key]:
-                    del self.active_ducks[channel_key]
-                # Quietly unconfiscate all on this channel
-                self.unconfiscate_confiscated_in_channel(channel, network)
-            channel_stats['last_duck_time'] = time.time()  # Record when duck was shot
-            if duck_killed:
-                # Only record when duck is actually killed
-                old_count = channel_stats['ducks_shot']
-                channel_stats['ducks_shot'] += 1
-                self.channel_last_duck_time[channel_key] = time.time()
-                # Base XP for kill (golden vs regular)
-                if target_duck['golden']:
-                    channel_stats['golden_ducks'] += 1
-                    base_xp = 50
+        if not hit:
+            channel_stats['misses'] += 1
+            # Random penalty (-1 to -5) on miss
+            penalty = -self._randint(1, 5)
+            prev_xp = channel_stats['xp']
+            self.safe_xp_operation(channel_stats, 'subtract', -penalty)
+            await self.send_message(network, channel, self.pm(user, self._missed_msg.format(penalty=penalty)))
+            # Ricochet accident: 20% chance to hit a random player
+            victim = self.pick_accident_victim(network, channel, user, 0.20)
+            if victim:
+                acc_pen = channel_stats.get('accident_penalty', -25)
+                if liability_insured and acc_pen < 0:
+                    acc_pen = math.floor(acc_pen / 2)
+                channel_stats['accidents'] += 1
+                self.safe_xp_operation(channel_stats, 'subtract', -acc_pen)
+                insured = channel_stats.get('life_insurance_until', 0) > now
+                if insured:
+                    channel_stats['confiscated'] = False
                 else:
-                    base_xp = int(self.config.get('DEFAULT', 'default_xp', fallback=10))
-
-                # Apply clover bonus if active (affects both golden and regular)
-                if channel_stats.get('clover_until', 0) > time.time():
-                    xp_gain = base_xp + int(channel_stats.get('clover_bonus', 0))
+                    self.confiscate_gun(user, channel, network, channel_stats)
+                vstats = await self.get_channel_stats(victim, channel, network)
+                if vstats.get('mirror_until', 0) > now and not (channel_stats.get('sunglasses_until', 0) > now):
+                    extra = -1
+                    if liability_insured:
+                        extra = math.floor(extra / 2)
+                    self.safe_xp_operation(channel_stats, 'add', extra)
+                    await self.send_message(network, channel, self.pm(user, self._ricochet_msg.format(victim=victim, acc_pen=acc_pen) + f" {self.colorize(f'[mirror glare: {extra} xp]', 'purple')}{self._insured_accident if insured else self._confiscated_accident}"))
                 else:
-                    xp_gain = base_xp
+                    await self.send_message(network, channel, self.pm(user, self._ricochet_msg.format(victim=victim, acc_pen=acc_pen) + (self._insured_accident if insured else self._confiscated_accident)))
+            # Save after miss (with or without ricochet)
+            await self.check_level_change(user, channel, channel_stats, prev_xp, network)
+            await self.update_stats_in_backend(user, channel, network, channel_stats)
+            return
+        
+        # Handle golden duck hits
+        if revealed:
+            hit_msg = f"{self._bang} You hit the duck! {self._golden_detected_bold} {self._red_bracket}{self._duck_eye} {self._life} {remaining}]"
+            await self.send_message(network, channel, self.pm(user, hit_msg))
+        elif is_golden and not duck_killed:
+            # Already revealed golden duck - show survival message if not killed
+            await self.send_message(network, channel, self.pm(user, f"{self._bang} The golden duck survived! {self._red_bracket}{self._duck_head} {self._life} {remaining}]"))
+        
+        if duck_killed:
+            # Quietly unconfiscate all on this channel
+            await self.unconfiscate_confiscated_in_channel(channel, network)
+        channel_stats['last_duck_time'] = now  # Record when duck was shot
+        if duck_killed:
+            # Only record when duck is actually killed
+            old_count = channel_stats['ducks_shot']
+            channel_stats['ducks_shot'] += 1
+            self.channel_last_duck_time[channel_key] = now
+            # Base XP for kill (golden vs regular)
+            if is_golden:
+                channel_stats['golden_ducks'] += 1
+                base_xp = 50
+            else:
+                base_xp = int(self.config.get('DEFAULT', 'default_xp', fallback=10))
+
+            # Apply clover bonus if active (affects both golden and regular)
+            if channel_stats.get('clover_until', 0) > now:
+                xp_gain = base_xp + int(channel_stats.get('clover_bonus', 0))
             else:
-                xp_gain = 0
+                xp_gain = base_xp
+        else:
+            xp_gain = 0
             
-            prev_xp = channel_stats['xp']
-            self.safe_xp_operation(channel_stats, 'add', xp_gain)
-            channel_stats['total_reaction_time'] = float(channel_stats.get('total_reaction_time') or 0) + float(reaction_time)
+        prev_xp = channel_stats['xp']
+        self.safe_xp_operation(channel_stats, 'add', xp_gain)
+        channel_stats['total_reaction_time'] = float(channel_stats.get('total_reaction_time') or 0) + float(reaction_time)
             
-            if not channel_stats['best_time'] or float(reaction_time) < float(channel_stats['best_time']):
-                channel_stats['best_time'] = float(reaction_time)
+        if not channel_stats['best_time'] or float(reaction_time) < float(channel_stats['best_time']):
+            channel_stats['best_time'] = float(reaction_time)
             
-            # Check for level up (based on channel XP)
-            new_level = min(50, (int(float(channel_stats['xp'])) // 100) + 1)
-        # Build item display string
-        item_display = ""
-        if 'inventory' in player and player['inventory']:
-            item_list = []
-            for item, count in player['inventory'].items():
-                if count > 0:
-                    item_list.append(f"{item} x{count}")
-            if item_list:
-                item_display = f" [{', '.join(item_list)}]"
-        
-        # Level is now per-channel, but we'll use a simple calculation for display
-        current_channel_level = min(50, (int(float(channel_stats['xp'])) // 100) + 1)
-        
-        if new_level > current_channel_level:
-            level_titles = ["tourist", "noob", "duck hater", "duck hunter", "member of the Comitee Against Ducks", 
-                          "duck pest", "duck hassler", "duck killer", "duck demolisher", "duck disassembler"]
-            title = level_titles[min(new_level-1, len(level_titles)-1)]
-            await self.send_message(network, channel, self.pm(user, f"{self.colorize('*BANG*', 'red', bold=True)}  You shot down the duck in {reaction_time:.3f}s, which makes you a total of {channel_stats['ducks_shot']} ducks on {channel}. You are promoted to level {new_level} ({title}). {self.colorize('\\_X< *KWAK*', 'red')} {self.colorize(f'[{xp_gain} xp]', 'green')}{item_display}"))
-        else:
-            if duck_killed:
-                sign = '+' if xp_gain > 0 else ''
-                await self.send_message(network, channel, self.pm(user, f"{self.colorize('*BANG*', 'red', bold=True)}  You shot down the duck in {reaction_time:.3f}s, which makes you a total of {channel_stats['ducks_shot']} ducks on {channel}. {self.colorize('\\_X< *KWAK*', 'red')} {self.colorize(f'[{sign}{xp_gain} xp]', 'green')}{item_display}"))
-            # Note: Golden duck survival messages are handled above in the golden duck hit logic
+        if duck_killed:
+            # Build item display string
+            item_display = ""
+            if 'inventory' in player and player['inventory']:
+                item_list = []
+                for item, count in player['inventory'].items():
+                    if count > 0:
+                        item_list.append(f"{item} x{count}")
+                if item_list:
+                    item_display = f" [{', '.join(item_list)}]"
+            
+            sign = '+' if xp_gain > 0 else ''
+            kill_msg = self._kill_msg.format(reaction_time=reaction_time, ducks_shot=channel_stats['ducks_shot'], channel=channel, sign=sign, xp_gain=xp_gain)
+            await self.send_message(network, channel, self.pm(user, kill_msg + item_display))
         
         # Announce promotion/demotion if level changed (any XP change path)
         if xp_gain != 0:
             await self.check_level_change(user, channel, channel_stats, prev_xp, network)
         
         # Random weighted loot drop (10% chance) on kill only
-        if duck_killed and random.random() < 0.10:
+        if duck_killed and self._random() < 0.10:
             await self.apply_weighted_loot(user, channel, channel_stats, network)
         
         # Save changes to database
         try:
-            if self.data_storage == 'sql' and self.db_backend:
-                filtered_stats = self._filter_computed_stats(channel_stats)
-                result = self.db_backend.update_channel_stats(user, network.name, channel, filtered_stats)
-                if not result:
-                    print(f"ERROR: Database update failed for {user} in {network.name}:{channel}")
-            else:
+            result = await self.update_stats_in_backend(user, channel, network, channel_stats)
+            if not result:
+                print(f"ERROR: Database update failed for {user} in {network.name}:{channel}")
         except Exception as e:
             print(f"CRITICAL ERROR in database save for {user} in {network.name}:{channel}: {e}")
             import traceback
@@ -1949,159 +2383,137 @@ shop_extra_magazine = 400
             return
         
         player = self.get_player(user)
-        channel_stats = self.get_channel_stats(user, channel, network)
+        channel_stats = await self.get_channel_stats(user, channel, network)
+        now = time.time()  # One clock read for the whole command, as in handle_bang
         
-        # Check if there is a duck in this channel
-        async with self.ducks_lock:
-            channel_key = self.get_network_channel_key(network, channel)
-            if channel_key not in self.active_ducks:
-                self.log_action(f"No ducks to befriend in {channel} - active_ducks keys: {list(self.active_ducks.keys())}")
-                # Apply random penalty (-1 to -10) for befriending when no ducks are present
-                penalty = -random.randint(1, 10)
-                prev_xp = channel_stats['xp']
-                self.safe_xp_operation(channel_stats, 'subtract', -penalty)
-                await self.send_message(network, channel, self.pm(user, f"There are no ducks to befriend. {self.colorize(f'[{penalty} XP]', 'red')}"))
-                
-                # Check for level change after penalty
-                await self.check_level_change(user, channel, channel_stats, prev_xp, network)
-                
-                if self.data_storage == 'sql' and self.db_backend:
-                    self.db_backend.update_channel_stats(user, network.name, channel, self._filter_computed_stats(channel_stats))
+        # Check if there is a duck in this channel. Only the duck itself is touched
+        # under the lock; messages and database writes happen after it is released.
+        channel_key = self.get_network_channel_key(network, channel)
+        outcome = None
+        async with self.duck_lock(channel_key):
+            ducks = self.active_ducks.get(channel_key)
+            if ducks:
+                # Befriend the active duck (slot 0)
+                was_golden = bool(ducks.gold[0])
+                if ducks.hissed[0]:
+                    # Hissed (hostile) duck thrashes anyone trying to befriend it, then flies away
+                    outcome = 'thrash'
+                    ducks.remove(0)
+                elif self._random() > self.compute_accuracy(channel_stats, 'bef', now):
+                    # Accuracy-style check for befriending (duck might not notice)
+                    penalty = -self._randint(1, 10)
+                    # 1/20 chance for duck to hiss (become hostile)
+                    if self._randint(1, 20) == 1:
+                        ducks.hissed[0] = 1
+                        outcome = 'hiss'
+                    else:
+                        outcome = 'miss'
                 else:
-                return
+                    # Compute befriend effectiveness
+                    bef_damage = 1
+                    if was_golden and channel_stats.get('bread_uses', 0) > 0:
+                        bef_damage = 2
+                        channel_stats['bread_uses'] = max(0, channel_stats['bread_uses'] - 1)
+                    
+                    ducks.hp[0] -= bef_damage
+                    remaining = max(0, ducks.hp[0])
+                    if was_golden and not ducks.revealed[0]:
+                        # Reveal golden duck on first befriend attempt
+                        ducks.revealed[0] = 1
+                        outcome = 'revealed'
+                    elif ducks.hp[0] <= 0:
+                        outcome = 'befriended'
+                        reaction_time = max(0.0, now - ducks.spawn[0])  # now is read before waiting on the duck lock
+                        # Remove FIFO
+                        ducks.remove(0)
+                    else:
+                        outcome = 'comfort'
+                if not ducks:
+                    del self.active_ducks[channel_key]
+        
+        if outcome is None:
+            self.log_action(f"No ducks to befriend in {channel} - active_ducks keys: {list(self.active_ducks.keys())}")
+            # Apply random penalty (-1 to -10) for befriending when no ducks are present
+            penalty = -self._randint(1, 10)
+            prev_xp = channel_stats['xp']
+            self.safe_xp_operation(channel_stats, 'subtract', -penalty)
+            await self.send_message(network, channel, self.pm(user, f"There are no ducks to befriend. {self.colorize(f'[{penalty} XP]', 'red')}"))
             
-            # Get the active duck
-            duck = self.active_ducks[channel_key][0]
+            # Check for level change after penalty
+            await self.check_level_change(user, channel, channel_stats, prev_xp, network)
+        elif outcome == 'thrash':
+            channel_stats['misses'] += 1
+            prev_xp = channel_stats['xp']
+            self.safe_xp_operation(channel_stats, 'subtract', 250)
+            await self.send_message(network, channel, f"{self.colorize(user, 'red')} - {self.colorize('*THRASH*', 'red', bold=True)} The duck gives you a serious thrashing that requires medical attention. {self.colorize('<(\'v\')>', 'yellow')} {self.colorize('[-250 XP]', 'red')}")
             
-            # Check if duck is hissed (hostile) - thrash penalty for anyone trying to befriend
-            if duck.get('hissed', False):
-                channel_stats['misses'] += 1
-                prev_xp = channel_stats['xp']
-                self.safe_xp_operation(channel_stats, 'subtract', 250)
-                await self.send_message(network, channel, f"{self.colorize(user, 'red')} - {self.colorize('*THRASH*', 'red', bold=True)} The duck gives you a serious thrashing that requires medical attention. {self.colorize('<(\'v\')>', 'yellow')} {self.colorize('[-250 XP]', 'red')}")
-                
-                # Remove the hissed duck after thrashing (it flies away)
-                if self.active_ducks[channel_key]:
-                    self.active_ducks[channel_key].pop(0)
-                if not self.active_ducks[channel_key]:
-                    del self.active_ducks[channel_key]
-                # Quietly unconfiscate all on this channel
-                self.unconfiscate_confiscated_in_channel(channel, network)
-                
-                # Send the duck flies away message
-                await self.send_message(network, channel, self.colorize("The duck flies away.     ·°'`'°-.,¸¸.·°'`", 'grey'))
-                
-                # Check for level change after thrash penalty
-                await self.check_level_change(user, channel, channel_stats, prev_xp, network)
-                
-                if self.data_storage == 'sql' and self.db_backend:
-                    self.db_backend.update_channel_stats(user, network.name, channel, self._filter_computed_stats(channel_stats))
-                else:
-                return
+            # Quietly unconfiscate all on this channel
+            await self.unconfiscate_confiscated_in_channel(channel, network)
             
-            # Accuracy-style check for befriending (duck might not notice)
-            bef_roll = random.random()
-            bef_chance = self.compute_accuracy(channel_stats, 'bef')
-            if bef_roll > bef_chance:
-                # Random penalty (-1 to -10) on failed befriend (duck distracted)
-                penalty = -random.randint(1, 10)
-                channel_stats['misses'] += 1
-                prev_xp = channel_stats['xp']
-                self.safe_xp_operation(channel_stats, 'subtract', -penalty)
-                
-                # 1/20 chance for duck to hiss (become hostile)
-                if random.randint(1, 20) == 1:
-                    duck['hissed'] = True
-                    await self.send_message(network, channel, f"{self.colorize(user, 'red')} - {self.colorize('*HISS*', 'red', bold=True)} The duck hisses at you ferociously. {self.colorize('[DO NOT MESS WITH THIS DUCK!]', 'yellow')} {self.colorize(f'[{penalty} XP]', 'red')}")
-                else:
-                    await self.send_message(network, channel, self.pm(user, f"{self.colorize('FRIEND', 'red', bold=True)} The duck seems distracted. Try again. {self.colorize(f'[{penalty} XP]', 'red')}"))
-                
-                # Check for level change after miss penalty
-                await self.check_level_change(user, channel, channel_stats, prev_xp, network)
-                
-                if self.data_storage == 'sql' and self.db_backend:
-                    self.db_backend.update_channel_stats(user, network.name, channel, self._filter_computed_stats(channel_stats))
-                else:
-                return
-
-            # Compute befriend effectiveness
-            bef_damage = 1
-            if duck['golden'] and channel_stats.get('bread_uses', 0) > 0:
-                bef_damage = 2
-                channel_stats['bread_uses'] = max(0, channel_stats['bread_uses'] - 1)
+            # Send the duck flies away message
+            await self.send_message(network, channel, self.colorize("The duck flies away.     ·°'`'°-.,¸¸.·°'`", 'grey'))
             
-            duck['health'] -= bef_damage
-            bef_killed = duck['health'] <= 0
+            # Check for level change after thrash penalty
+            await self.check_level_change(user, channel, channel_stats, prev_xp, network)
+        elif outcome in ('hiss', 'miss'):
+            # Random penalty (-1 to -10) on failed befriend (duck distracted)
+            channel_stats['misses'] += 1
+            prev_xp = channel_stats['xp']
+            self.safe_xp_operation(channel_stats, 'subtract', -penalty)
             
-            # Reveal golden duck on first befriend attempt
-            if duck['golden'] and not duck.get('revealed', False):
-                duck['revealed'] = True
-                # Add golden duck message to the same line as the befriend message
-                remaining = max(0, duck['health'])
-                bef_msg = f"{self.colorize('FRIEND', 'red', bold=True)} You comfort the duck! {self.colorize('[GOLDEN DUCK DETECTED]', 'yellow')} {self.colorize('[', 'red')}{self.colorize('\\_0<', 'yellow')} {self.colorize('friend', 'red')} {remaining}]"
-                await self.send_message(network, channel, self.pm(user, bef_msg))
-                return
+            if outcome == 'hiss':
+                await self.send_message(network, channel, f"{self.colorize(user, 'red')} - {self.colorize('*HISS*', 'red', bold=True)} The duck hisses at you ferociously. {self.colorize('[DO NOT MESS WITH THIS DUCK!]', 'yellow')} {self.colorize(f'[{penalty} XP]', 'red')}")
+            else:
+                await self.send_message(network, channel, self.pm(user, f"{self._friend_tag} The duck seems distracted. Try again. {self.colorize(f'[{penalty} XP]', 'red')}"))
             
-            # Remove the duck if fully befriended and handle XP rewards
-            if bef_killed:
-                # Store duck info before removal
-                was_golden = duck['golden']
-                
-                # Calculate reaction time
-                reaction_time = time.time() - duck['spawn_time']
-                
-                # Remove FIFO
-                if self.active_ducks[channel_key]:
-                    self.active_ducks[channel_key].pop(0)
-                if not self.active_ducks[channel_key]:
-                    del self.active_ducks[channel_key]
-                # Quietly unconfiscate all on this channel
-                self.unconfiscate_confiscated_in_channel(channel, network)
-                
-                # Record when duck was befriended (for !lastduck)
-                channel_stats['last_duck_time'] = time.time()
-                self.channel_last_duck_time[channel_key] = time.time()
-                
-                # Update reaction time stats
-                channel_stats['total_reaction_time'] = float(channel_stats.get('total_reaction_time') or 0) + float(reaction_time)
-                if not channel_stats.get('best_time') or float(reaction_time) < float(channel_stats['best_time']):
-                    channel_stats['best_time'] = float(reaction_time)
-                
-                # Award XP for befriending when completed
-                # Base XP for befriending (golden vs regular)
-                base_xp = 50 if was_golden else int(self.config.get('DEFAULT', 'default_xp', fallback=10))
-                # Four-leaf clover bonus if active
-                if channel_stats.get('clover_until', 0) > time.time():
-                    xp_gained = base_xp + int(channel_stats.get('clover_bonus', 0))
-                else:
-                    xp_gained = base_xp
-                prev_xp = channel_stats['xp']
-                self.safe_xp_operation(channel_stats, 'add', xp_gained)
-                channel_stats['befriended_ducks'] += 1
-                response = f"{self.colorize('*QUAACK!*', 'red', bold=True)} "
-                if was_golden:
-                    response += "The GOLDEN DUCK"
-                else:
-                    response += "The DUCK"
-                response += f" was befriended in {reaction_time:.3f}s! {self.colorize('\\_0<', 'yellow')} {self.colorize(f'[BEFRIENDED DUCKS: {channel_stats['befriended_ducks']}]', 'green')} {self.colorize(f'[+{xp_gained} xp]', 'green')}"
-                await self.send_message(network, channel, self.pm(user, response))
-                self.log_action(f"{user} befriended a {'golden ' if was_golden else ''}duck in {channel} in {reaction_time:.3f}s")
-                await self.check_level_change(user, channel, channel_stats, prev_xp, network)
+            # Check for level change after miss penalty
+            await self.check_level_change(user, channel, channel_stats, prev_xp, network)
+        elif outcome == 'revealed':
+            # Add golden duck message to the same line as the befriend message
+            bef_msg = f"{self._friend_tag} You comfort the duck! {self._golden_detected} {self._red_bracket}{self._duck_eye} {self._friend} {remaining}]"
+            await self.send_message(network, channel, self.pm(user, bef_msg))
+        elif outcome == 'befriended':
+            # Quietly unconfiscate all on this channel
+            await self.unconfiscate_confiscated_in_channel(channel, network)
+            
+            # Record when duck was befriended (for !lastduck)
+            channel_stats['last_duck_time'] = now
+            self.channel_last_duck_time[channel_key] = now
+            
+            # Update reaction time stats
+            channel_stats['total_reaction_time'] = float(channel_stats.get('total_reaction_time') or 0) + float(reaction_time)
+            if not channel_stats.get('best_time') or float(reaction_time) < float(channel_stats['best_time']):
+                channel_stats['best_time'] = float(reaction_time)
+            
+            # Award XP for befriending when completed
+            # Base XP for befriending (golden vs regular)
+            base_xp = 50 if was_golden else int(self.config.get('DEFAULT', 'default_xp', fallback=10))
+            # Four-leaf clover bonus if active
+            if channel_stats.get('clover_until', 0) > now:
+                xp_gained = base_xp + int(channel_stats.get('clover_bonus', 0))
             else:
-                remaining = max(0, duck['health'])
-                response = f"{self.colorize('FRIEND', 'red', bold=True)} You comfort the duck. {self.colorize('[', 'red')}{self.colorize('\\_0<', 'yellow')} {self.colorize('friend', 'red')} {remaining}]"
-                await self.send_message(network, channel, self.pm(user, response))
-        
-        # Save changes to database (moved inside lock to prevent race conditions)
-        if self.data_storage == 'sql' and self.db_backend:
-            try:
-                self.db_backend.update_channel_stats(user, network.name, channel, self._filter_computed_stats(channel_stats))
-            except Exception as e:
-                print(f"Database save error in handle_bef for {user}: {e}")
+                xp_gained = base_xp
+            prev_xp = channel_stats['xp']
+            self.safe_xp_operation(channel_stats, 'add', xp_gained)
+            channel_stats['befriended_ducks'] += 1
+            response = f"{self.colorize('*QUAACK!*', 'red', bold=True)} "
+            if was_golden:
+                response += "The GOLDEN DUCK"
+            else:
+                response += "The DUCK"
+            response += f" was befriended in {reaction_time:.3f}s! {self._duck_eye} {self.colorize(f'[BEFRIENDED DUCKS: {channel_stats['befriended_ducks']}]', 'green')} {self.colorize(f'[+{xp_gained} xp]', 'green')}"
+            await self.send_message(network, channel, self.pm(user, response))
+            self.log_action(f"{user} befriended a {'golden ' if was_golden else ''}duck in {channel} in {reaction_time:.3f}s")
+            await self.check_level_change(user, channel, channel_stats, prev_xp, network)
         else:
-            try:
-            except Exception as e:
-                print(f"Player data save error in handle_bef for {user}: {e}")
+            response = f"{self._friend_tag} You comfort the duck. {self._red_bracket}{self._duck_eye} {self._friend} {remaining}]"
+            await self.send_message(network, channel, self.pm(user, response))
+        
+        # Save changes to database
+        try:
+            await self.update_stats_in_backend(user, channel, network, channel_stats)
+        except Exception as e:
+            print(f"Database save error in handle_bef for {user}: {e}")
     
     async def handle_reload(self, user, channel, network: NetworkConnection):
         """Handle !reload command"""
@@ -2109,43 +2521,68 @@ shop_extra_magazine = 400
             return
         
         player = self.get_player(user)
-        channel_stats = self.get_channel_stats(user, channel, network)
+        channel_stats = await self.get_channel_stats(user, channel, network)
         
         if channel_stats['confiscated']:
             await self.send_message(network, channel, self.pm(user, "You are not armed."))
             return
         
+        magazine_capacity = channel_stats.get('magazine_capacity', 10)
+        mags_max = channel_stats.get('magazines_max', 2)
+        
         # Only allow reload if out of bullets, jammed, or sabotaged
         if channel_stats['jammed']:
             channel_stats['jammed'] = False
-            magazine_capacity = channel_stats.get('magazine_capacity', 10)
-            mags_max = channel_stats.get('magazines_max', 2)
-            await self.send_message(network, channel, self.pm(user, f"{self.colorize('*Crr..CLICK*', 'red')} You unjam your gun. | Ammo: {channel_stats['ammo']}/{magazine_capacity} | Magazines: {channel_stats['magazines']}/{mags_max}"))
+            await self.send_message(network, channel, self.pm(user, f"{self._unjam_click} You unjam your gun. | Ammo: {channel_stats['ammo']}/{magazine_capacity} | Magazines: {channel_stats['magazines']}/{mags_max}"))
         elif channel_stats['sabotaged']:
             channel_stats['sabotaged'] = False
-            magazine_capacity = channel_stats.get('magazine_capacity', 10)
-            mags_max = channel_stats.get('magazines_max', 2)
             await self.send_message(network, channel, self.pm(user, f"*Crr..CLICK*     You fix the sabotage. | Ammo: {channel_stats['ammo']}/{magazine_capacity} | Magazines: {channel_stats['magazines']}/{mags_max}"))
         elif channel_stats['ammo'] == 0:
             if channel_stats['magazines'] <= 0:
                 await self.send_message(network, channel, self.pm(user, "You have no filled magazines to reload your weapon."))
+                return
             else:
-                magazine_capacity = channel_stats.get('magazine_capacity', 10)
                 channel_stats['ammo'] = magazine_capacity
                 channel_stats['magazines'] -= 1
-                mags_max = channel_stats.get('magazines_max', 2)
-                await self.send_message(network, channel, self.pm(user, f"{self.colorize('*CLACK CLACK*', 'red', bold=True)} You reload. | Ammo: {channel_stats['ammo']}/{magazine_capacity} | Magazines: {channel_stats['magazines']}/{mags_max}"))
+                await self.send_message(network, channel, self.pm(user, f"{self._clack_clack} You reload. | Ammo: {channel_stats['ammo']}/{magazine_capacity} | Magazines: {channel_stats['magazines']}/{mags_max}"))
         else:
-            magazine_capacity = channel_stats.get('magazine_capacity', 10)
-            mags_max = channel_stats.get('magazines_max', 2)
             await self.send_message(network, channel, self.pm(user, f"Your gun doesn't need to be reloaded. | Ammo: {channel_stats['ammo']}/{magazine_capacity} | Magazines: {channel_stats['magazines']}/{mags_max}"))
+            return
         
         # Save changes to database (only save fields that are persisted, not computed)
-        if self.data_storage == 'sql' and self.db_backend:
-            filtered_stats = self._filter_computed_stats(channel_stats)
-            self.log_action(f"RELOAD SAVE DEBUG: user={user}, magazines={filtered_stats.get('magazines')}, ammo={filtered_stats.get('ammo')}")
-            self.db_backend.update_channel_stats(user, network.name, channel, filtered_stats)
-        else:
+        if self.debug_logging:
+            self.log_action(f"DEBUG: Reload save: user={user}, magazines={channel_stats.get('magazines')}, ammo={channel_stats.get('ammo')}")
+        await self.update_stats_in_backend(user, channel, network, channel_stats)
+    
+    def get_shop_menu(self, upgrade_cost: int, capacity_cost: int) -> List[str]:
+        """Return the shop item list split into IRC-sized lines, built once per pair of upgrade prices"""
+        key = (upgrade_cost, capacity_cost)
+        lines = self._shop_menu_cache.get(key)
+        if lines is not None:
+            return lines
+        
+        items = []
+        for item_id, item in self.shop_items.items():
+            cost = upgrade_cost if item_id == 22 else capacity_cost if item_id == 23 else item['cost']
+            items.append(f"{item_id}- {item['name']} ({cost} xp)")
+        
+        # Split into chunks of ~400 characters each
+        lines = []
+        current_chunk = ""
+        for item in items:
+            if len(current_chunk + " | " + item) > 400:
+                if current_chunk:
+                    lines.append(current_chunk)
+                current_chunk = item
+            elif current_chunk:
+                current_chunk += " | " + item
+            else:
+                current_chunk = item
+        if current_chunk:
+            lines.append(current_chunk)
+        
+        self._shop_menu_cache[key] = lines
+        return lines
     
     async def handle_shop(self, user, channel, args, network: NetworkConnection):
         """Handle !shop command"""
@@ -2154,41 +2591,16 @@ shop_extra_magazine = 400
         
         if not args:
             # Show shop menu (split into multiple messages due to IRC length limits)
-            channel_stats = self.get_channel_stats(user, channel, network)
+            channel_stats = await self.get_channel_stats(user, channel, network)
             current_xp = int(channel_stats.get('xp', 0))
             xp_display = self.colorize(f"[XP: {current_xp}]", 'green')
             await self.send_notice(network, user, f"[Duck Hunt] Purchasable items {xp_display}:")
             
-            # Group items into chunks that fit IRC message limits
-            items = []
-            for item_id, item in self.shop_items.items():
-                # Dynamic costs for upgrades (22/23) are per-player based on current level
-                if item_id == 22:
-                    lvl = self.get_channel_stats(user, channel, network).get('mag_upgrade_level', 0)
-                    dyn_cost = min(1000, 200 * (lvl + 1))
-                    items.append(f"{item_id}- {item['name']} ({dyn_cost} xp)")
-                elif item_id == 23:
-                    lvl = self.get_channel_stats(user, channel, network).get('mag_capacity_level', 0)
-                    dyn_cost = min(1000, 200 * (lvl + 1))
-                    items.append(f"{item_id}- {item['name']} ({dyn_cost} xp)")
-                else:
-                    items.append(f"{item_id}- {item['name']} ({item['cost']} xp)")
-            
-            # Split into chunks of ~400 characters each
-            current_chunk = ""
-            for item in items:
-                if len(current_chunk + " | " + item) > 400:
-                    if current_chunk:
-                        await self.send_notice(network, user, current_chunk)
-                    current_chunk = item
-                else:
-                    if current_chunk:
-                        current_chunk += " | " + item
-                    else:
-                        current_chunk = item
-            
-            if current_chunk:
-                await self.send_notice(network, user, current_chunk)
+            # Dynamic costs for upgrades (22/23) are per-player based on current level
+            upgrade_cost = min(1000, 200 * (channel_stats.get('mag_upgrade_level', 0) + 1))
+            capacity_cost = min(1000, 200 * (channel_stats.get('mag_capacity_level', 0) + 1))
+            for line in self.get_shop_menu(upgrade_cost, capacity_cost):
+                await self.send_notice(network, user, line)
             
             await self.send_notice(network, user, "Syntax: !shop [id [target]]")
         else:
@@ -2200,7 +2612,7 @@ shop_extra_magazine = 400
                     return
                 
                 player = self.get_player(user)
-                channel_stats = self.get_channel_stats(user, channel, network)
+                channel_stats = await self.get_channel_stats(user, channel, network)
                 item = self.shop_items[item_id]
                 # Determine dynamic cost for upgrades
                 cost = item['cost']
@@ -2214,380 +2626,321 @@ shop_extra_magazine = 400
                     await self.send_notice(network, user, f"You don't have enough XP in {channel}. You need {cost} xp.")
                     return
                 
-                # Check if item is already active before deducting XP
-                already_active = False
-                if item_id == 3:  # AP ammo
-                    ap = channel_stats.get('ap_shots', 0)
-                    ex = channel_stats.get('explosive_shots', 0)
-                    if ap > 0 and ex == 0:
-                        already_active = True
-                elif item_id == 4:  # Explosive ammo
-                    ap = channel_stats.get('ap_shots', 0)
-                    ex = channel_stats.get('explosive_shots', 0)
-                    if ex > 0 and ap == 0:
-                        already_active = True
-                elif item_id == 6:  # Grease
-                    now = time.time()
-                    if channel_stats.get('grease_until', 0) > now:
-                        already_active = True
-                elif item_id == 7:  # Sight
-                    if channel_stats.get('sight_next_shot', False):
-                        already_active = True
-                elif item_id == 11:  # Sunglasses
-                    now = time.time()
-                    if channel_stats.get('sunglasses_until', 0) > now:
-                        already_active = True
+                now = time.time()  # One clock read for the guard and the item's effect
                 
-                if already_active:
-                    # Send appropriate "already active" message and refund XP
-                    if item_id == 3:
-                        await self.send_notice(network, user, "AP ammo already active. Use it up before buying more.")
-                    elif item_id == 4:
-                        await self.send_notice(network, user, "Explosive ammo already active. Use it up before buying more.")
-                    elif item_id == 6:
-                        await self.send_notice(network, user, "Grease already applied. Wait until it wears off to buy more.")
-                    elif item_id == 7:
-                        await self.send_notice(network, user, "Sight already mounted for your next shot. Use it before buying more.")
-                    elif item_id == 11:
-                        await self.send_notice(network, user, "Sunglasses already active. Wait until they wear off to buy more.")
-                    self.safe_xp_operation(channel_stats, 'add', cost)  # Refund XP
+                # Check if item is already active before deducting XP (nothing to refund)
+                already_active = self.SHOP_ALREADY_ACTIVE.get(item_id)
+                if already_active and already_active[0](channel_stats, now):
+                    await self.send_notice(network, user, already_active[1])
                     return
                 
                 prev_xp = channel_stats['xp']
                 self.safe_xp_operation(channel_stats, 'subtract', cost)
                 
                 # Apply item effects
-                if item_id == 1:  # Extra bullet
-                    magazine_capacity = channel_stats.get('magazine_capacity', 10)
-                    if channel_stats['ammo'] < magazine_capacity:
-                        channel_stats['ammo'] = min(magazine_capacity, channel_stats['ammo'] + 1)
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"You just added an extra bullet. {xp_display} | Ammo: {channel_stats['ammo']}/{magazine_capacity}"))
-                    else:
-                        await self.send_message(network, channel, self.pm(user, f"Your magazine is already full."))
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])  # Refund XP
-                elif item_id == 2:  # Extra magazine
-                    mags_max = channel_stats.get('magazines_max', 2)
-                    current_mags = channel_stats['magazines']
-                    self.log_action(f"DEBUG: Magazine purchase - current_mags={current_mags}, mags_max={mags_max}")
-                    if current_mags < mags_max:
-                        channel_stats['magazines'] = min(mags_max, current_mags + 1)
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"You just added an extra magazine. {xp_display} | Magazines: {channel_stats['magazines']}/{mags_max}"))
-                    else:
-                        await self.send_message(network, channel, self.pm(user, f"You already have the maximum magazines."))
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])  # Refund XP
-                elif item_id == 3:  # AP ammo: next 20 shots do +1 dmg vs golden (i.e., 2 total)
-                    ex = channel_stats.get('explosive_shots', 0)
-                    switched = ex > 0
-                    channel_stats['explosive_shots'] = 0
-                    channel_stats['ap_shots'] = 20
-                    xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                    if switched:
-                        await self.send_message(network, channel, self.pm(user, f"You switched to AP ammo. Next 20 shots are AP. {xp_display}"))
-                    else:
-                        await self.send_message(network, channel, self.pm(user, f"You purchased AP ammo. Next 20 shots deal extra damage to golden ducks. {xp_display}"))
-                elif item_id == 4:  # Explosive ammo: next 20 shots do +1 dmg vs golden and boost accuracy
-                    ap = channel_stats.get('ap_shots', 0)
-                    switched = ap > 0
-                    channel_stats['ap_shots'] = 0
-                    channel_stats['explosive_shots'] = 20
-                    xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                    if switched:
-                        await self.send_message(network, channel, self.pm(user, f"You switched to explosive ammo. Next 20 shots are explosive. {xp_display}"))
-                    else:
-                        await self.send_message(network, channel, self.pm(user, f"You purchased explosive ammo. Next 20 shots deal extra damage to golden ducks. {xp_display}"))
-                elif item_id == 6:  # Grease: 24h reliability boost
-                    now = time.time()
-                    duration = 24 * 3600
-                    channel_stats['grease_until'] = float(now + duration)
-                    xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                    await self.send_message(network, channel, self.pm(user, f"You purchased grease. Your gun will jam half as often for 24h. {xp_display}"))
-                elif item_id == 7:  # Sight: next shot accuracy boost; cannot stack
-                    channel_stats['sight_next_shot'] = True
-                    xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                    await self.send_message(network, channel, self.pm(user, f"You purchased a sight. Your next shot will be more accurate. {xp_display}"))
-                elif item_id == 11:  # Sunglasses: 24h protection against mirror / reduce accident penalty
-                    now = time.time()
-                    channel_stats['sunglasses_until'] = float(now + 24*3600)
-                    xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                    await self.send_message(network, channel, self.pm(user, f"You put on sunglasses for 24h. You're protected against mirror glare. {xp_display}"))
-                elif item_id == 12:  # Spare clothes: clear soaked and egged if present
-                    soaked = channel_stats.get('soaked_until', 0) > time.time()
-                    egged = channel_stats.get('egged', False)
-                    
-                    if soaked or egged:
-                        if soaked:
-                            channel_stats['soaked_until'] = 0
-                        if egged:
-                            channel_stats['egged'] = False
-                        
-                        status_msg = []
-                        if soaked:
-                            status_msg.append("soaked")
-                        if egged:
-                            status_msg.append("covered in egg")
-                        
-                        status_text = " and ".join(status_msg)
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"You change into spare clothes. You're no longer {status_text}. {xp_display}"))
-                    else:
-                        await self.send_notice(network, user, "You're not soaked or covered in egg. Refunding XP.")
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])
-                elif item_id == 13:  # Brush for gun: unjam, clear sand, and small reliability buff for 24h
-                    channel_stats['jammed'] = False
-                    # Clear sand debuff if present
-                    if channel_stats.get('sand_until', 0) > time.time():
-                        channel_stats['sand_until'] = 0
-                    channel_stats['brush_until'] = max(float(channel_stats.get('brush_until', 0)), float(time.time() + 24*3600))
-                    xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                    await self.send_message(network, channel, self.pm(user, f"You clean your gun and remove sand. It feels smoother for 24h. {xp_display}"))
-                elif item_id == 14:  # Mirror: apply dazzle debuff to target unless countered by sunglasses (target required)
-                    if len(args) < 2:
-                        await self.send_notice(network, user, "Usage: !shop 14 <nick>")
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])
-                    else:
-                        target = args[1]
-                        tstats = self.get_channel_stats(target, channel, network)
-                        # If target has sunglasses active, mirror is countered
-                        if tstats.get('sunglasses_until', 0) > time.time():
-                            await self.send_message(network, channel, self.pm(user, f"{target} is wearing sunglasses. The mirror has no effect."))
-                            self.safe_xp_operation(channel_stats, 'add', item['cost'])
-                        else:
-                            tstats['mirror_until'] = max(tstats.get('mirror_until', 0), time.time() + 24*3600)
-                            xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                            await self.send_message(network, channel, self.pm(user, f"You dazzle {target} with a mirror for 24h. Their accuracy is reduced. {xp_display}"))
-                            # Save target's mirror status to database
-                            if self.data_storage == 'sql' and self.db_backend:
-                                self.db_backend.update_channel_stats(target, network.name, channel, self._filter_computed_stats(tstats))
-                elif item_id == 15:  # Handful of sand: victim reliability worse for 1h (target required)
-                    if len(args) < 2:
-                        await self.send_notice(network, user, "Usage: !shop 15 <nick>")
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])
-                    else:
-                        target = args[1]
-                        tstats = self.get_channel_stats(target, channel, network)
-                        tstats['sand_until'] = max(tstats.get('sand_until', 0), time.time() + 3600)
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"You throw sand into {target}'s gun. Their gun will jam more for 1h. {xp_display}"))
-                        # Save target's sand status to database
-                        if self.data_storage == 'sql' and self.db_backend:
-                            self.db_backend.update_channel_stats(target, network.name, channel, self._filter_computed_stats(tstats))
-                elif item_id == 16:  # Water bucket: soak target for 1h (target required)
-                    if len(args) < 2:
-                        await self.send_notice(network, user, "Usage: !shop 16 <nick>")
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])
-                    else:
-                        target = args[1]
-                        tstats = self.get_channel_stats(target, channel, network)
-                        now = time.time()
-                        if tstats.get('soaked_until', 0) > now:
-                            await self.send_notice(network, user, f"{target} is already soaked. Refunding XP.")
-                            self.safe_xp_operation(channel_stats, 'add', item['cost'])
-                        else:
-                            tstats['soaked_until'] = max(tstats.get('soaked_until', 0), now + 3600)
-                            xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                            await self.send_message(network, channel, self.pm(user, f"You soak {target} with a water bucket. They're out for 1h unless they change clothes. {xp_display}"))
-                            # Save target's soaked status to database
-                            if self.data_storage == 'sql' and self.db_backend:
-                                self.db_backend.update_channel_stats(target, network.name, channel, self._filter_computed_stats(tstats))
-                elif item_id == 17:  # Sabotage: jam target immediately (target required)
-                    if len(args) < 2:
-                        await self.send_notice(network, user, "Usage: !shop 17 <nick>")
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])
-                    else:
-                        target = args[1]
-                        tstats = self.get_channel_stats(target, channel, network)
-                        tstats['jammed'] = True
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"You sabotage {target}'s weapon. It's jammed. {xp_display}"))
-                        # Save target's jammed status to database
-                        if self.data_storage == 'sql' and self.db_backend:
-                            self.db_backend.update_channel_stats(target, network.name, channel, self._filter_computed_stats(tstats))
-                elif item_id == 18:  # Life insurance: protect against confiscation for 24h
-                    now = time.time()
-                    if channel_stats.get('life_insurance_until', 0) > now:
-                        await self.send_notice(network, user, "Life insurance already active. Wait until it expires to buy again.")
-                        self.safe_xp_operation(channel_stats, 'add', cost)
-                    else:
-                        channel_stats['life_insurance_until'] = float(now + 24*3600)
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"You purchase life insurance. Confiscations will be prevented for 24h. {xp_display}"))
-                elif item_id == 19:  # Liability insurance: reduce penalties by 50% for 24h
-                    now = time.time()
-                    if channel_stats.get('liability_insurance_until', 0) > now:
-                        await self.send_notice(network, user, "Liability insurance already active. Wait until it expires to buy again.")
-                        self.safe_xp_operation(channel_stats, 'add', cost)
-                    else:
-                        channel_stats['liability_insurance_until'] = float(now + 24*3600)
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"You purchase liability insurance. Penalties reduced by 50% for 24h. {xp_display}"))
-                elif item_id == 22:  # Upgrade Magazine: increase magazine_capacity size (level 1-5), dynamic cost per level
-                    current_level = channel_stats.get('mag_upgrade_level', 0)
-                    if current_level >= 5:
-                        await self.send_message(network, channel, self.pm(user, "Your magazine is already fully upgraded."))
-                        self.safe_xp_operation(channel_stats, 'add', cost)
-                    else:
-                        next_level = current_level + 1
-                        channel_stats['mag_upgrade_level'] = next_level
-                        # Recompute magazine_capacity via level bonuses so upgrades stack correctly
-                        self.apply_level_bonuses(channel_stats)
-                        # Don't add ammo - just increase capacity. Current ammo stays the same.
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"Upgrade applied. Magazine capacity increased to {channel_stats['magazine_capacity']}. {xp_display}"))
-                elif item_id == 10:  # Four-leaf clover: +N XP per duck for 24h; single active at a time
-                    now = time.time()
-                    duration = 24 * 3600
-                    if channel_stats.get('clover_until', 0) > now:
-                        # Already active; refund
-                        await self.send_notice(network, user, "Four-leaf clover already active. Wait until it expires to buy again.")
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])
-                    else:
-                        bonus = random.choice([1, 2, 3, 4, 5, 6, 7, 8, 9, 10])
-                        channel_stats['clover_bonus'] = bonus
-                        channel_stats['clover_until'] = float(now + duration)
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"Four-leaf clover activated for 24h. +{bonus} XP per duck. {xp_display}"))
-                elif item_id == 8:  # Trigger Lock: 24h trigger lock window when no duck, limited uses
-                    now = time.time()
-                    duration = 24 * 3600
-                    # Disallow purchase if active and has uses remaining
-                    if channel_stats.get('trigger_lock_until', 0) > now and channel_stats.get('trigger_lock_uses', 0) > 0:
-                        await self.send_notice(network, user, "Safety Lock already active. Use it up before buying more.")
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])
-                    else:
-                        new_until = now + duration
-                        channel_stats['trigger_lock_until'] = new_until
-                        channel_stats['trigger_lock_uses'] = 6
-                        hours = duration // 3600
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"Safety Lock enabled for {hours}h00m. Safety lock has 6 uses. {xp_display}"))
-                elif item_id == 9:  # Silencer: 24h protection against scaring ducks
-                    now = time.time()
-                    duration = 24 * 3600
-                    if channel_stats.get('silencer_until', 0) > now:
-                        await self.send_notice(network, user, "Silencer already active. Wait until it wears off to buy more.")
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])
-                    else:
-                        channel_stats['silencer_until'] = float(now + duration)
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"{self.colorize('You purchased a silencer.', 'green')} It will prevent frightening ducks for 24h. {xp_display}"))
-                elif item_id == 20:  # Bread: next 20 befriends count double vs golden
-                    if channel_stats.get('bread_uses', 0) > 0:
-                        await self.send_notice(network, user, "Bread already active. Use it up before buying more.")
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])
-                    else:
-                        channel_stats['bread_uses'] = 20
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"{self.colorize('You purchased bread.', 'green')} Next 20 befriends are more effective. {xp_display}"))
-                elif item_id == 5:  # Repurchase confiscated gun
-                    if channel_stats['confiscated']:
-                        channel_stats['confiscated'] = False
-                        magazine_capacity = channel_stats.get('magazine_capacity', 10)
-                        mags_max = channel_stats.get('magazines_max', 2)
-                        channel_stats['ammo'] = magazine_capacity
-                        channel_stats['magazines'] = mags_max
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"You repurchased your confiscated gun. {xp_display} | Ammo: {magazine_capacity}/{magazine_capacity} | Magazines: {mags_max}/{mags_max}"))
-                    else:
-                        await self.send_message(network, channel, f"Your gun is not confiscated.")
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])  # Refund XP
-                elif item_id == 21:  # Ducks detector (shop: 4h duration)
-                    now = time.time()
-                    duration = 4 * 3600
-                    if channel_stats.get('ducks_detector_until', 0) > now:
-                        await self.send_notice(network, user, "Ducks detector already active. Wait until it expires to buy again.")
-                        self.safe_xp_operation(channel_stats, 'add', cost)
-                    else:
-                        channel_stats['ducks_detector_until'] = float(now + duration)
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"Ducks detector activated for 4h. You'll get a 60s pre-spawn notice. {xp_display}"))
-                        # Check if there's a spawn coming soon and send immediate notice if within 60s
-                        next_spawn = network.channel_next_spawn.get(channel)
-                        if next_spawn:
-                            seconds_until = int(next_spawn - now)
-                            if 0 < seconds_until <= 60:
-                                msg = f"Your duck detector indicates the next duck will arrive any minute now... ({seconds_until}s remaining)"
-                                await self.send_notice(network, user, msg)
-                elif item_id == 23:  # Extra Magazine: increase magazines_max (level 1-5), cost scales
-                    current_level = channel_stats.get('mag_capacity_level', 0)
-                    if current_level >= 5:
-                        await self.send_message(network, channel, self.pm(user, "You already carry the maximum extra magazines."))
-                        self.safe_xp_operation(channel_stats, 'add', item['cost'])
-                    else:
-                        channel_stats['mag_capacity_level'] = current_level + 1
-                        channel_stats['magazines_max'] = channel_stats.get('magazines_max', 2) + 1
-                        # Grant one extra empty magazine immediately
-                        channel_stats['magazines'] = min(channel_stats['magazines_max'], channel_stats['magazines'] + 1)
-                        xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                        await self.send_message(network, channel, self.pm(user, f"Upgrade applied. You can now carry {channel_stats['magazines_max']} magazines. {xp_display}"))
-                        item['cost'] = min(1000, item['cost'] + 200)
-                elif item_id == 24:  # Duck Call: schedule 1-5 ducks with varying probability
-                    # Determine number of ducks to spawn based on probabilities
-                    # 50% = 1 duck, 25% = 2 ducks, 12% = 3 ducks, 6% = 4 ducks, 3% = 5 ducks
-                    # Remaining 4% = 1 duck (to sum to 100%)
-                    roll = random.random() * 100
-                    if roll < 50:
-                        num_ducks = 1
-                    elif roll < 75:  # 50 + 25
-                        num_ducks = 2
-                    elif roll < 87:  # 75 + 12
-                        num_ducks = 3
-                    elif roll < 93:  # 87 + 6
-                        num_ducks = 4
-                    elif roll < 96:  # 93 + 3
-                        num_ducks = 5
-                    else:  # remaining 4%
-                        num_ducks = 1
-                    
-                    # Find the correct channel key by normalizing (channels might be stored with different case)
-                    norm = self.normalize_channel(channel)
-                    channel_key = None
-                    for k in list(network.channel_next_spawn.keys()):
-                        if self.normalize_channel(k) == norm:
-                            channel_key = k
-                            break
-                    
-                    # If no key found, use the channel as-is (shouldn't happen but safe fallback)
-                    if not channel_key:
-                        channel_key = channel
-                    
-                    # Schedule ducks at 1-minute intervals starting 1 minute from now
-                    # Store multiple scheduled times in a list for this channel
-                    if not hasattr(network, 'duck_call_schedule'):
-                        network.duck_call_schedule = {}
-                    
-                    if channel_key not in network.duck_call_schedule:
-                        network.duck_call_schedule[channel_key] = []
-                    
-                    now = time.time()
-                    for i in range(num_ducks):
-                        spawn_time = now + 60 + (i * 60)  # 1min, 2min, 3min, 4min, 5min
-                        network.duck_call_schedule[channel_key].append(spawn_time)
-                    
-                    self.log_action(f"Duck call used in {channel} on {network.name} - scheduled {num_ducks} duck(s) starting in 60s")
-                    
-                    xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                    await self.send_message(network, channel, self.pm(user, f"You use the duck call. {self.colorize('*QUACK*', 'red')} Duck(s) may arrive any minute now. {xp_display}"))
+                handler = self._shop_handlers.get(item_id)
+                if handler:
+                    await handler(user, channel, args, network, channel_stats, cost, now)
                 else:
                     # For other items, just show generic message
-                    xp_display = self.format_xp_display(cost, channel_stats['xp'])
-                    await self.send_message(network, channel, self.pm(user, f"{self.colorize(f'You purchased {item['name']}.', 'green')} {xp_display}"))
+                    await self._shop_notify(network, channel, user, cost, channel_stats, self.colorize(f"You purchased {item['name']}.", 'green'))
                 
                 # After any shop purchase that changes XP or capacities, re-apply level bonuses and announce level changes
                 self.apply_level_bonuses(channel_stats)
                 if channel_stats.get('xp', 0) != prev_xp:
                     await self.check_level_change(user, channel, channel_stats, prev_xp, network)
                 
-                # Update SQL database with the changes
-                if self.data_storage == 'sql' and self.db_backend:
-                    self.db_backend.update_channel_stats(user, network.name, channel, self._filter_computed_stats(channel_stats))
-                else:
-                
+                # Save the changes
+                await self.update_stats_in_backend(user, channel, network, channel_stats)
             except ValueError:
                 await self.send_notice(network, user, "Invalid item ID.")
     
     
+    async def _shop_notify(self, network: NetworkConnection, channel, user, cost: int, channel_stats: dict, text: str, suffix: str = ""):
+        """Announce a completed purchase: text, the XP cost and balance, then an optional suffix"""
+        await self.send_message(network, channel, self.pm(user, f"{text} {self.format_xp_display(cost, channel_stats['xp'])}{suffix}"))
+    
+    async def _shop_extra_bullet(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 1 - Extra bullet"""
+        magazine_capacity = channel_stats.get('magazine_capacity', 10)
+        if channel_stats['ammo'] < magazine_capacity:
+            channel_stats['ammo'] = min(magazine_capacity, channel_stats['ammo'] + 1)
+            await self._shop_notify(network, channel, user, cost, channel_stats, "You just added an extra bullet.", f" | Ammo: {channel_stats['ammo']}/{magazine_capacity}")
+        else:
+            await self.send_message(network, channel, self.pm(user, f"Your magazine is already full."))
+            self.safe_xp_operation(channel_stats, 'add', cost)  # Refund XP
+    
+    async def _shop_refill_magazine(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 2 - Extra magazine"""
+        mags_max = channel_stats.get('magazines_max', 2)
+        current_mags = channel_stats['magazines']
+        if self.debug_logging:
+            self.log_action(f"DEBUG: Magazine purchase - current_mags={current_mags}, mags_max={mags_max}")
+        if current_mags < mags_max:
+            channel_stats['magazines'] = min(mags_max, current_mags + 1)
+            await self._shop_notify(network, channel, user, cost, channel_stats, "You just added an extra magazine.", f" | Magazines: {channel_stats['magazines']}/{mags_max}")
+        else:
+            await self.send_message(network, channel, self.pm(user, f"You already have the maximum magazines."))
+            self.safe_xp_operation(channel_stats, 'add', cost)  # Refund XP
+    
+    async def _shop_ap_ammo(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 3 - AP ammo: next 20 shots do +1 dmg vs golden (i.e., 2 total)"""
+        ex = channel_stats.get('explosive_shots', 0)
+        switched = ex > 0
+        channel_stats['explosive_shots'] = 0
+        channel_stats['ap_shots'] = 20
+        if switched:
+            await self._shop_notify(network, channel, user, cost, channel_stats, "You switched to AP ammo. Next 20 shots are AP.")
+        else:
+            await self._shop_notify(network, channel, user, cost, channel_stats, "You purchased AP ammo. Next 20 shots deal extra damage to golden ducks.")
+    
+    async def _shop_explosive_ammo(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 4 - Explosive ammo: next 20 shots do +1 dmg vs golden and boost accuracy"""
+        ap = channel_stats.get('ap_shots', 0)
+        switched = ap > 0
+        channel_stats['ap_shots'] = 0
+        channel_stats['explosive_shots'] = 20
+        if switched:
+            await self._shop_notify(network, channel, user, cost, channel_stats, "You switched to explosive ammo. Next 20 shots are explosive.")
+        else:
+            await self._shop_notify(network, channel, user, cost, channel_stats, "You purchased explosive ammo. Next 20 shots deal extra damage to golden ducks.")
+    
+    async def _shop_repurchase_gun(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 5 - Repurchase confiscated gun"""
+        if channel_stats['confiscated']:
+            channel_stats['confiscated'] = False
+            magazine_capacity = channel_stats.get('magazine_capacity', 10)
+            mags_max = channel_stats.get('magazines_max', 2)
+            channel_stats['ammo'] = magazine_capacity
+            channel_stats['magazines'] = mags_max
+            await self._shop_notify(network, channel, user, cost, channel_stats, "You repurchased your confiscated gun.", f" | Ammo: {magazine_capacity}/{magazine_capacity} | Magazines: {mags_max}/{mags_max}")
+        else:
+            await self.send_message(network, channel, f"Your gun is not confiscated.")
+            self.safe_xp_operation(channel_stats, 'add', cost)  # Refund XP
+    
+    async def _shop_grease(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 6 - Grease: 24h reliability boost"""
+        duration = 24 * 3600
+        channel_stats['grease_until'] = float(now + duration)
+        await self._shop_notify(network, channel, user, cost, channel_stats, "You purchased grease. Your gun will jam half as often for 24h.")
+    
+    async def _shop_sight(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 7 - Sight: next shot accuracy boost; cannot stack"""
+        channel_stats['sight_next_shot'] = True
+        await self._shop_notify(network, channel, user, cost, channel_stats, "You purchased a sight. Your next shot will be more accurate.")
+    
+    async def _shop_trigger_lock(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 8 - Trigger Lock: 24h trigger lock window when no duck, limited uses"""
+        duration = 24 * 3600
+        new_until = now + duration
+        channel_stats['trigger_lock_until'] = new_until
+        channel_stats['trigger_lock_uses'] = 6
+        hours = duration // 3600
+        await self._shop_notify(network, channel, user, cost, channel_stats, f"Safety Lock enabled for {hours}h00m. Safety lock has 6 uses.")
+    
+    async def _shop_silencer(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 9 - Silencer: 24h protection against scaring ducks"""
+        duration = 24 * 3600
+        channel_stats['silencer_until'] = float(now + duration)
+        await self._shop_notify(network, channel, user, cost, channel_stats, f"{self.colorize('You purchased a silencer.', 'green')} It will prevent frightening ducks for 24h.")
+    
+    async def _shop_clover(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 10 - Four-leaf clover: +N XP per duck for 24h; single active at a time"""
+        duration = 24 * 3600
+        bonus = random.choice([1, 2, 3, 4, 5, 6, 7, 8, 9, 10])
+        channel_stats['clover_bonus'] = bonus
+        channel_stats['clover_until'] = float(now + duration)
+        await self._shop_notify(network, channel, user, cost, channel_stats, f"Four-leaf clover activated for 24h. +{bonus} XP per duck.")
+    
+    async def _shop_sunglasses(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 11 - Sunglasses: 24h protection against mirror / reduce accident penalty"""
+        channel_stats['sunglasses_until'] = float(now + 24*3600)
+        await self._shop_notify(network, channel, user, cost, channel_stats, "You put on sunglasses for 24h. You're protected against mirror glare.")
+    
+    async def _shop_spare_clothes(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 12 - Spare clothes: clear soaked and egged if present"""
+        soaked = channel_stats.get('soaked_until', 0) > now
+        egged = channel_stats.get('egged', False)
+        
+        if soaked or egged:
+            if soaked:
+                channel_stats['soaked_until'] = 0
+            if egged:
+                channel_stats['egged'] = False
+        
+            status_msg = []
+            if soaked:
+                status_msg.append("soaked")
+            if egged:
+                status_msg.append("covered in egg")
+        
+            status_text = " and ".join(status_msg)
+            await self._shop_notify(network, channel, user, cost, channel_stats, f"You change into spare clothes. You're no longer {status_text}.")
+        else:
+            await self.send_notice(network, user, "You're not soaked or covered in egg. Refunding XP.")
+            self.safe_xp_operation(channel_stats, 'add', cost)
+    
+    async def _shop_brush(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 13 - Brush for gun: unjam, clear sand, and small reliability buff for 24h"""
+        channel_stats['jammed'] = False
+        # Clear sand debuff if present
+        if channel_stats.get('sand_until', 0) > now:
+            channel_stats['sand_until'] = 0
+        channel_stats['brush_until'] = max(float(channel_stats.get('brush_until', 0)), float(now + 24*3600))
+        await self._shop_notify(network, channel, user, cost, channel_stats, "You clean your gun and remove sand. It feels smoother for 24h.")
+    
+    async def _shop_mirror(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 14 - Mirror: apply dazzle debuff to target unless countered by sunglasses (target required)"""
+        if len(args) < 2:
+            await self.send_notice(network, user, "Usage: !shop 14 <nick>")
+            self.safe_xp_operation(channel_stats, 'add', cost)
+        else:
+            target = args[1]
+            tstats = await self.get_channel_stats(target, channel, network)
+            # If target has sunglasses active, mirror is countered
+            if tstats.get('sunglasses_until', 0) > now:
+                await self.send_message(network, channel, self.pm(user, f"{target} is wearing sunglasses. The mirror has no effect."))
+                self.safe_xp_operation(channel_stats, 'add', cost)
+            else:
+                tstats['mirror_until'] = max(tstats.get('mirror_until', 0), now + 24*3600)
+                await self._shop_notify(network, channel, user, cost, channel_stats, f"You dazzle {target} with a mirror for 24h. Their accuracy is reduced.")
+                # Save target's mirror status to database
+                await self.update_stats_in_backend(target, channel, network, tstats)
+    
+    async def _shop_sand(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 15 - Handful of sand: victim reliability worse for 1h (target required)"""
+        if len(args) < 2:
+            await self.send_notice(network, user, "Usage: !shop 15 <nick>")
+            self.safe_xp_operation(channel_stats, 'add', cost)
+        else:
+            target = args[1]
+            tstats = await self.get_channel_stats(target, channel, network)
+            tstats['sand_until'] = max(tstats.get('sand_until', 0), now + 3600)
+            await self._shop_notify(network, channel, user, cost, channel_stats, f"You throw sand into {target}'s gun. Their gun will jam more for 1h.")
+            # Save target's sand status to database
+            await self.update_stats_in_backend(target, channel, network, tstats)
+    
+    async def _shop_water_bucket(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 16 - Water bucket: soak target for 1h (target required)"""
+        if len(args) < 2:
+            await self.send_notice(network, user, "Usage: !shop 16 <nick>")
+            self.safe_xp_operation(channel_stats, 'add', cost)
+        else:
+            target = args[1]
+            tstats = await self.get_channel_stats(target, channel, network)
+            if tstats.get('soaked_until', 0) > now:
+                await self.send_notice(network, user, f"{target} is already soaked. Refunding XP.")
+                self.safe_xp_operation(channel_stats, 'add', cost)
+            else:
+                tstats['soaked_until'] = max(tstats.get('soaked_until', 0), now + 3600)
+                await self._shop_notify(network, channel, user, cost, channel_stats, f"You soak {target} with a water bucket. They're out for 1h unless they change clothes.")
+                # Save target's soaked status to database
+                await self.update_stats_in_backend(target, channel, network, tstats)
+    
+    async def _shop_sabotage(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 17 - Sabotage: jam target immediately (target required)"""
+        if len(args) < 2:
+            await self.send_notice(network, user, "Usage: !shop 17 <nick>")
+            self.safe_xp_operation(channel_stats, 'add', cost)
+        else:
+            target = args[1]
+            tstats = await self.get_channel_stats(target, channel, network)
+            tstats['jammed'] = True
+            await self._shop_notify(network, channel, user, cost, channel_stats, f"You sabotage {target}'s weapon. It's jammed.")
+            # Save target's jammed status to database
+            await self.update_stats_in_backend(target, channel, network, tstats)
+    
+    async def _shop_life_insurance(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 18 - Life insurance: protect against confiscation for 24h"""
+        channel_stats['life_insurance_until'] = float(now + 24*3600)
+        await self._shop_notify(network, channel, user, cost, channel_stats, "You purchase life insurance. Confiscations will be prevented for 24h.")
+    
+    async def _shop_liability_insurance(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 19 - Liability insurance: reduce penalties by 50% for 24h"""
+        channel_stats['liability_insurance_until'] = float(now + 24*3600)
+        await self._shop_notify(network, channel, user, cost, channel_stats, "You purchase liability insurance. Penalties reduced by 50% for 24h.")
+    
+    async def _shop_bread(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 20 - Bread: next 20 befriends count double vs golden"""
+        channel_stats['bread_uses'] = 20
+        await self._shop_notify(network, channel, user, cost, channel_stats, f"{self.colorize('You purchased bread.', 'green')} Next 20 befriends are more effective.")
+    
+    async def _shop_ducks_detector(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 21 - Ducks detector (shop: 4h duration)"""
+        duration = 4 * 3600
+        self.activate_duck_detector(user, channel, network, channel_stats, float(now + duration))
+        await self._shop_notify(network, channel, user, cost, channel_stats, "Ducks detector activated for 4h. You'll get a 60s pre-spawn notice.")
+        # Check if there's a spawn coming soon and send immediate notice if within 60s
+        schedule = network.channel_schedule.get(network.normalized_channel(channel))
+        next_spawn = schedule.next_spawn if schedule else None
+        if next_spawn:
+            seconds_until = int(next_spawn - now)
+            if 0 < seconds_until <= 60:
+                msg = f"Your duck detector indicates the next duck will arrive any minute now... ({seconds_until}s remaining)"
+                await self.send_notice(network, user, msg)
+    
+    async def _shop_upgrade_magazine(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 22 - Upgrade Magazine: increase magazine_capacity size (level 1-5), dynamic cost per level"""
+        current_level = channel_stats.get('mag_upgrade_level', 0)
+        if current_level >= 5:
+            await self.send_message(network, channel, self.pm(user, "Your magazine is already fully upgraded."))
+            self.safe_xp_operation(channel_stats, 'add', cost)
+        else:
+            next_level = current_level + 1
+            channel_stats['mag_upgrade_level'] = next_level
+            # Recompute magazine_capacity via level bonuses so upgrades stack correctly
+            self.apply_level_bonuses(channel_stats)
+            # Don't add ammo - just increase capacity. Current ammo stays the same.
+            await self._shop_notify(network, channel, user, cost, channel_stats, f"Upgrade applied. Magazine capacity increased to {channel_stats['magazine_capacity']}.")
+    
+    async def _shop_extra_magazine(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 23 - Extra Magazine: increase magazines_max (level 1-5), cost scales"""
+        current_level = channel_stats.get('mag_capacity_level', 0)
+        if current_level >= 5:
+            await self.send_message(network, channel, self.pm(user, "You already carry the maximum extra magazines."))
+            self.safe_xp_operation(channel_stats, 'add', cost)
+        else:
+            channel_stats['mag_capacity_level'] = current_level + 1
+            channel_stats['magazines_max'] = channel_stats.get('magazines_max', 2) + 1
+            # Grant one extra empty magazine immediately
+            channel_stats['magazines'] = min(channel_stats['magazines_max'], channel_stats['magazines'] + 1)
+            await self._shop_notify(network, channel, user, cost, channel_stats, f"Upgrade applied. You can now carry {channel_stats['magazines_max']} magazines.")
+    
+    async def _shop_duck_call(self, user, channel, args, network: NetworkConnection, channel_stats: dict, cost: int, now: float):
+        """!shop 24 - Duck Call: schedule 1-5 ducks with varying probability"""
+        # Determine number of ducks to spawn based on probabilities
+        # 50% = 1 duck, 25% = 2 ducks, 12% = 3 ducks, 6% = 4 ducks, 3% = 5 ducks
+        # Remaining 4% = 1 duck (to sum to 100%)
+        roll = random.random() * 100
+        if roll < 50:
+            num_ducks = 1
+        elif roll < 75:  # 50 + 25
+            num_ducks = 2
+        elif roll < 87:  # 75 + 12
+            num_ducks = 3
+        elif roll < 93:  # 87 + 6
+            num_ducks = 4
+        elif roll < 96:  # 93 + 3
+            num_ducks = 5
+        else:  # remaining 4%
+            num_ducks = 1
+        
+        # Duck calls are keyed like channel_schedule, by normalized channel name
+        channel_key = network.normalized_channel(channel)
+        
+        # Schedule ducks at 1-minute intervals starting 1 minute from now
+        # Store multiple scheduled times in a list for this channel
+        if not hasattr(network, 'duck_call_schedule'):
+            network.duck_call_schedule = {}
+        
+        # One extend with every spawn time: 1min, 2min, 3min, 4min, 5min
+        spawn_times = [now + 60 + (i * 60) for i in range(num_ducks)]
+        network.duck_call_schedule.setdefault(channel_key, []).extend(spawn_times)
+        
+        self.log_action(f"Duck call used in {channel} on {network.name} - scheduled {num_ducks} duck(s) starting in 60s")
+        
+        await self._shop_notify(network, channel, user, cost, channel_stats, f"You use the duck call. {self.colorize('*QUACK*', 'red')} Duck(s) may arrive any minute now.")
+    
     async def handle_duckhelp(self, user, channel, network: NetworkConnection):
         """Handle !duckhelp command"""
         help_text = "Duck Hunt Commands: !bang, !bef, !reload, !shop, !duckstats, !topduck [duck|xpratio], !lastduck, !duckhelp, !ducklang"
@@ -2649,7 +3002,7 @@ shop_extra_magazine = 400
         target = args[0]
         
         player = self.get_player(user)
-        channel_stats = self.get_channel_stats(user, channel, network)
+        channel_stats = await self.get_channel_stats(user, channel, network)
         
         # Check if player has befriended at least 50 ducks (easter egg unlock)
         if channel_stats.get('befriended_ducks', 0) < 50:
@@ -2673,7 +3026,7 @@ shop_extra_magazine = 400
             return
         
         # Apply egged state to target
-        target_stats = self.get_channel_stats(target, channel, network)
+        target_stats = await self.get_channel_stats(target, channel, network)
         target_stats['egged'] = True
         
         # Update last egg time for thrower
@@ -2682,11 +3035,8 @@ shop_extra_magazine = 400
         await self.send_message(network, channel, f"{self.colorize(user, 'red')} throws a duck egg at {self.colorize(target, 'red')}! {self.colorize(target, 'yellow')} is now covered in egg and needs to change clothes!")
         
         # Save changes to database
-        if self.data_storage == 'sql' and self.db_backend:
-            self.db_backend.update_channel_stats(user, network.name, channel, self._filter_computed_stats(channel_stats))
-            self.db_backend.update_channel_stats(target, network.name, channel, self._filter_computed_stats(target_stats))
-        else:
-    
+        await self.update_stats_in_backend(user, channel, network, channel_stats)
+        await self.update_stats_in_backend(target, channel, network, target_stats)
     async def handle_999(self, user, channel, network: NetworkConnection):
         """Handle !999 command - hidden feature that gives 999 ammo"""
         if not self.check_authentication(user):
@@ -2694,16 +3044,13 @@ shop_extra_magazine = 400
             return
         
         # Get user's channel stats
-        channel_stats = self.get_channel_stats(user, channel, network)
+        channel_stats = await self.get_channel_stats(user, channel, network)
         
         # Give 999 ammo
         channel_stats['ammo'] = 999
         
         # Save data
-        if self.data_storage == 'sql' and self.db_backend:
-            self.db_backend.update_channel_stats(user, network.name, channel, self._filter_computed_stats(channel_stats))
-        else:
-        
+        await self.update_stats_in_backend(user, channel, network, channel_stats)
         # Send private notice instead of channel message
         await self.send_notice(network, user, "You received 999 ammo! | Ammo: 999/999")
         self.log_action(f"{user} used !999 command in {channel} - received 999 ammo")
@@ -2773,10 +3120,8 @@ shop_extra_magazine = 400
             
             spawned = 0
             channel_key = self.get_network_channel_key(network, channel)
-            async with self.ducks_lock:
-                if channel_key not in self.active_ducks:
-                    self.active_ducks[channel_key] = []
-                remaining_capacity = max(0, self.get_network_max_ducks(network) - len(self.active_ducks[channel_key]))
+            async with self.duck_lock(channel_key):
+                remaining_capacity = max(0, self.get_network_max_ducks(network) - len(self.active_ducks.get(channel_key, ())))
             to_spawn = min(count, remaining_capacity)
             for _ in range(to_spawn):
                 # Do not push back the automatic timer when spawning manually
@@ -2789,54 +3134,43 @@ shop_extra_magazine = 400
                 await self.send_notice(network, user, f"Cannot spawn ducks in {channel} - already at maximum ({self.get_network_max_ducks(network)})")
         elif command == "spawngold":
             # Spawn a golden duck (respect per-channel capacity)
-            async with self.ducks_lock:
-                channel_key = self.get_network_channel_key(network, channel)
-                if channel_key not in self.active_ducks:
-                    self.active_ducks[channel_key] = []
-                if len(self.active_ducks[channel_key]) >= self.get_network_max_ducks(network):
-                    await self.send_notice(network, user, f"Cannot spawn golden duck in {channel} - already at maximum ({self.get_network_max_ducks(network)})")
-                    return
-                golden_duck = {'golden': True, 'health': 5, 'spawn_time': time.time(), 'revealed': False}
-                self.active_ducks[channel_key].append(golden_duck)
-            # Create duck art with custom coloring: dust=gray, duck=yellow, QUACK=red/green/gold
-            dust = "-.,¸¸.-·°'`'°·-.,¸¸.-·°'`'°· "
-            duck = "\\_O<"
-            quack = "   QUACK"
-            
-            # Color the parts separately
-            dust_colored = self.colorize(dust, 'grey')
-            duck_colored = self.colorize(duck, 'yellow')
-            quack_colored = f"   {self.colorize('Q', 'red')}{self.colorize('U', 'green')}{self.colorize('A', 'yellow')}{self.colorize('C', 'red')}{self.colorize('K', 'green')}"
-            
-            duck_art = f"{dust_colored}{duck_colored}{quack_colored}"
-            await self.send_message(network, channel, duck_art)
+            channel_key = self.get_network_channel_key(network, channel)
+            max_ducks = self.get_network_max_ducks(network)
+            async with self.duck_lock(channel_key):
+                ducks = self.active_ducks.get(channel_key)
+                full = len(ducks or ()) >= max_ducks
+                if not full:
+                    spawn_time = time.time()
+                    if ducks is None:
+                        ducks = self.active_ducks[channel_key] = DuckList()
+                    ducks.append(True, spawn_time)
+                    heapq.heappush(network.duck_spawn_heap, (spawn_time, channel_key))
+            if full:
+                await self.send_notice(network, user, f"Cannot spawn golden duck in {channel} - already at maximum ({max_ducks})")
+                return
+            await self.send_message(network, channel, self._duck_art)
             self.log_action(f"{user} spawned golden duck in {channel}")
             # Do not reset per-channel timer on manual spawns
         elif command == "rearm" and args:
             target = args[0]
             if target in self.players:
-                channel_stats = self.get_channel_stats(target, channel, network)
+                channel_stats = await self.get_channel_stats(target, channel, network)
                 channel_stats['confiscated'] = False
                 magazine_capacity = channel_stats.get('magazine_capacity', 10)
                 mags_max = channel_stats.get('magazines_max', 2)
                 channel_stats['ammo'] = magazine_capacity
                 channel_stats['magazines'] = mags_max
                 await self.send_message(network, channel, f"{target} has been rearmed.")
-                if self.data_storage == 'sql' and self.db_backend:
-                    self.db_backend.update_channel_stats(target, network.name, channel, self._filter_computed_stats(channel_stats))
-                else:
+                await self.update_stats_in_backend(target, channel, network, channel_stats)
         elif command == "disarm" and args:
             target = args[0]
             if target in self.players:
-                channel_stats = self.get_channel_stats(target, channel, network)
-                channel_stats['confiscated'] = True
+                channel_stats = await self.get_channel_stats(target, channel, network)
+                self.confiscate_gun(target, channel, network, channel_stats)
                 # Optionally also empty ammo
                 channel_stats['ammo'] = 0
                 await self.send_message(network, channel, f"{target} has been disarmed.")
-                if self.data_storage == 'sql' and self.db_backend:
-                    self.db_backend.update_channel_stats(target, network.name, channel, self._filter_computed_stats(channel_stats))
-                else:
-    
+                await self.update_stats_in_backend(target, channel, network, channel_stats)
     async def handle_owner_command_in_channel(self, user, channel, command, args, network: NetworkConnection):
         """Handle owner commands in channel context"""
         if not self.is_owner(user, network) and not self.is_admin(user, network):
@@ -2898,20 +3232,28 @@ shop_extra_magazine = 400
             target = args[0]
             channel = args[1]
             if target in self.players:
-                channel_stats = self.get_channel_stats(target, channel, network)
-                channel_stats['confiscated'] = True
+                channel_stats = await self.get_channel_stats(target, channel, network)
+                self.confiscate_gun(target, channel, network, channel_stats)
                 channel_stats['ammo'] = 0
                 await self.send_notice(network, user, f"{target} has been disarmed in {channel}.")
-                if self.data_storage == 'sql' and self.db_backend:
-                    self.db_backend.update_channel_stats(target, network.name, channel, self._filter_computed_stats(channel_stats))
-                else:
+                await self.update_stats_in_backend(target, channel, network, channel_stats)
         elif command == "reload":
-            self.load_config("duckhunt.conf")
+            self.config = self.load_config("duckhunt.conf")
+            for net in self.networks.values():
+                section = f"network:{net.name}"
+                if self.config.has_section(section):
+                    net.config.update(self.config[section])
+            self.refresh_config()
             # Note: This is a global command, so we can't send to a specific network
             # For now, just log the reload
+            self.log_action(f"Configuration reloaded by {user}")
         elif command == "restart":
             self.log_action(f"Restart command received from {user}")
             # Save data before restart
+            if self.db_backend:
+                await self.db_backend.flush()
+            else:
+                self.save_dirty_player_data()
             # Send QUIT message to all networks
             quit_msg = f"{user} requested restart."
             for net in self.networks.values():
@@ -2924,6 +3266,7 @@ shop_extra_magazine = 400
             # Set restart flag
             self.should_restart = True
             # Exit immediately without awaiting anything (to avoid async deadlock)
+            self.flush_log_file()
             import os
             os._exit(0)
         elif command == "join" and args:
@@ -2944,13 +3287,11 @@ shop_extra_magazine = 400
             # Remove the channel from our tracking
             if channel in network.channels:
                 del network.channels[channel]
-            # Clear any scheduled spawns for this channel
-            if channel in network.channel_next_spawn:
-                del network.channel_next_spawn[channel]
-            if channel in network.channel_pre_notice:
-                del network.channel_pre_notice[channel]
-            if channel in network.channel_notice_sent:
-                del network.channel_notice_sent[channel]
+            # Clear any scheduled spawns for this channel (last_spawn is kept)
+            schedule = network.channel_schedule.get(network.normalized_channel(channel))
+            if schedule:
+                schedule.next_spawn = schedule.pre_notice = None
+                schedule.notice_sent = False
             self.log_action(f"Parted {channel} on {network.name} by {user}")
             await self.send_notice(network, user, f"Parted {channel} on {network.name}")
         elif command == "clear" and args:
@@ -2962,9 +3303,9 @@ shop_extra_magazine = 400
             if self.data_storage == 'sql' and self.db_backend:
                 # SQL backend - backup and delete channel stats from database
                 network_name = network.name
-                channel_name = channel
+                channel_name = network.normalized_channel(channel)
                 
-                cleared_count, backup_id = self.db_backend.clear_channel_stats(network_name, channel_name, backup=True)
+                cleared_count, backup_id = await self.db_backend.clear_channel_stats(network_name, channel_name, backup=True)
                 if backup_id:
                     self.log_action(f"Cleared {cleared_count} player stats from SQL for {network_name}:{channel_name} (backup: {backup_id})")
                     await self.send_notice(network, user, f"Cleared all data for {channel} ({cleared_count} players affected). Backup ID: {backup_id}")
@@ -2973,26 +3314,16 @@ shop_extra_magazine = 400
                     await self.send_notice(network, user, f"Cleared all data for {channel} ({cleared_count} players affected)")
             
             # Clear ducks for this channel
-            async with self.ducks_lock:
-                if self.data_storage == 'sql' and self.db_backend:
-                    # For SQL backend, use network:channel format
-                    channel_key = f"{network.name}:{channel}"
-                else:
-                    # For JSON backend, use the existing logic
-                    channel_key = self.get_network_channel_key(network, channel)
-                
-                if channel_key in self.active_ducks:
-                    del self.active_ducks[channel_key]
+            channel_key = self.get_network_channel_key(network, channel)
+            async with self.duck_lock(channel_key):
+                self.active_ducks.pop(channel_key, None)
+            
+            # Clear per-channel player indexes
+            self.confiscated_users.pop(channel_key, None)
+            self.detector_until.pop(channel_key, None)
             
             # Clear network-specific channel data
-            if channel in network.channel_next_spawn:
-                del network.channel_next_spawn[channel]
-            if channel in network.channel_pre_notice:
-                del network.channel_pre_notice[channel]
-            if channel in network.channel_notice_sent:
-                del network.channel_notice_sent[channel]
-            if channel in network.channel_last_spawn:
-                del network.channel_last_spawn[channel]
+            network.channel_schedule.pop(network.normalized_channel(channel), None)
             
             self.log_action(f"{user} cleared all data for {channel} ({cleared_count} players affected)")
             await self.send_notice(network, user, f"Cleared all data for {channel} ({cleared_count} players affected)")
@@ -3002,7 +3333,7 @@ shop_extra_magazine = 400
             
             if self.data_storage == 'sql' and self.db_backend:
                 # SQL backend - restore from backup
-                restored_count = self.db_backend.restore_channel_stats(backup_id)
+                restored_count = await self.db_backend.restore_channel_stats(backup_id)
                 if restored_count > 0:
                     self.log_action(f"Restored {restored_count} player stats from backup {backup_id}")
                     await self.send_notice(network, user, f"Restored {restored_count} player stats from backup {backup_id}")
@@ -3019,7 +3350,7 @@ shop_extra_magazine = 400
                 # SQL backend - list backups
                 if channel:
                     # List backups for specific channel
-                    backups = self.db_backend.list_backups(network.name, channel)
+                    backups = await self.db_backend.list_backups(network.name, network.normalized_channel(channel))
                     if backups:
                         backup_list = []
                         for backup in backups[:5]:  # Show last 5 backups
@@ -3032,7 +3363,7 @@ shop_extra_magazine = 400
                         await self.send_notice(network, user, f"No backups found for {network.name}:{channel}")
                 else:
                     # List all recent backups
-                    backups = self.db_backend.list_backups()
+                    backups = await self.db_backend.list_backups()
                     if backups:
                         backup_list = []
                         for backup in backups[:10]:  # Show last 10 backups
@@ -3118,14 +3449,10 @@ shop_extra_magazine = 400
                 await self.send_notice(network, user, "You don't have permission to use admin commands.")
                 return
             now = time.time()
-            # Match schedule key by normalized channel to avoid trailing-space mismatch
-            norm = self.normalize_channel(channel)
-            key = None
-            for k in list(network.channel_next_spawn.keys()):
-                if self.normalize_channel(k) == norm:
-                    key = k
-                    break
-            next_time = network.channel_next_spawn.get(key) if key else None
+            # Schedules are keyed by normalized channel, so trailing spaces or case don't matter
+            key = network.normalized_channel(channel)
+            schedule = network.channel_schedule.get(key)
+            next_time = schedule.next_spawn if schedule else None
             
             # Also check duck call schedule
             duck_call_times = []
@@ -3224,7 +3551,7 @@ shop_extra_magazine = 400
             match = re.search(r':([^!]+)![^@]+@[^ ]+ JOIN :(.+)', data)
             if match:
                 user = match.group(1)
-                channel = match.group(2).strip().lower()  # Normalize channel name
+                channel = normalize_channel_name(match.group(2))
                 if channel in network.channels:
                     network.channels[channel].add(user)
                 self.log_message("JOIN", f"{user} joined {channel}")
@@ -3234,7 +3561,7 @@ shop_extra_magazine = 400
             # Format: :server 353 bot_nick = channel :user1 user2 user3
             parts = data.split()
             if len(parts) >= 6 and parts[3] == "=":
-                channel = parts[4].strip().lower()  # Normalize channel name
+                channel = normalize_channel_name(parts[4])
                 users_list = ' '.join(parts[5:]).lstrip(':')  # Get all users from parts[5] onwards
                 # Parse users (they might have prefixes like @ or +)
                 users = users_list.split()
@@ -3250,7 +3577,7 @@ shop_extra_magazine = 400
             match = re.search(r':([^!]+)![^@]+@[^ ]+ PART (.+)', data)
             if match:
                 user = match.group(1)
-                channel = match.group(2).lstrip(':').strip().lower()  # Normalize channel name
+                channel = normalize_channel_name(match.group(2).lstrip(':'))
                 if channel in network.channels:
                     network.channels[channel].discard(user)
                 self.log_message("PART", f"{user} left {channel}")
@@ -3320,13 +3647,9 @@ shop_extra_magazine = 400
             if not self.is_admin(user, network) and not self.is_owner(user, network):
                 return
             now = time.time()
-            norm = self.normalize_channel(channel)
-            key = None
-            for k in list(network.channel_next_spawn.keys()):
-                if self.normalize_channel(k) == norm:
-                    key = k
-                    break
-            next_time = network.channel_next_spawn.get(key) if key else None
+            key = network.normalized_channel(channel)
+            schedule = network.channel_schedule.get(key)
+            next_time = schedule.next_spawn if schedule else None
             
             # Also check duck call schedule
             duck_call_times = []
@@ -3431,7 +3754,7 @@ shop_extra_magazine = 400
                 self.safe_xp_operation(channel_stats, 'add', cost)
                 await say(f"You find a ducks detector, but you already have one active. [+{cost} xp]")
             else:
-                channel_stats['ducks_detector_until'] = float(now + 4 * 3600)
+                self.activate_duck_detector(user, channel, network, channel_stats, float(now + 4 * 3600))
                 await say("By searching the bushes, you find a ducks detector! You'll get a 60s pre-spawn notice for 4h.")
         elif choice == "ap_ammo":
             if channel_stats.get('ap_shots', 0) > 0:
@@ -3515,10 +3838,7 @@ shop_extra_magazine = 400
             await say(f"By searching the bushes, you find a {junk}. It's worthless.")
 
         # Save changes to database
-        if self.data_storage == 'sql' and self.db_backend:
-            self.db_backend.update_channel_stats(user, network.name, channel, self._filter_computed_stats(channel_stats))
-        else:
-    
+        await self.update_stats_in_backend(user, channel, network, channel_stats)
     async def handle_private_message(self, user, message, network: NetworkConnection):
         """Handle private message"""
         self.log_action(f"Private message from {user}: {message}")
@@ -3556,10 +3876,7 @@ shop_extra_magazine = 400
         # Now process messages
         while not self.should_restart:
             try:
-                if network.reader:  # SSL connection
-                    data = await network.reader.read(1024)
-                else:  # Non-SSL connection
-                    data = await asyncio.get_event_loop().sock_recv(network.sock, 1024)
+                data = await network.reader.read(1024)
                 
                 if data:
                     # Process each line
@@ -3590,15 +3907,15 @@ shop_extra_magazine = 400
                     await self.notify_duck_detector(network)
                     # Perform any due spawns per channel
                     now = time.time()
-                    for ch, when in list(network.channel_next_spawn.items()):
-                        if when and now >= when:
-                            # If channel can't accept a new duck yet, defer by 5-15s
-                            if not await self.can_spawn_duck(ch, network):
-                                network.channel_next_spawn[ch] = now + random.randint(5, 15)
-                                continue
-                            # Clear schedule BEFORE spawning to prevent race conditions
-                            network.channel_next_spawn[ch] = None
-                            await self.spawn_duck(network, ch)
+                    due = [(ch, schedule) for ch, schedule in network.channel_schedule.items() if schedule.next_spawn and now >= schedule.next_spawn]
+                    for ch, schedule in due:
+                        # If channel can't accept a new duck yet, defer by 5-15s
+                        if not await self.can_spawn_duck(ch, network):
+                            schedule.next_spawn = now + random.randint(5, 15)
+                            continue
+                        # Clear schedule BEFORE spawning to prevent race conditions
+                        schedule.next_spawn = None
+                        await self.spawn_duck(network, ch)
                     
                     # Check for duck call scheduled spawns
                     if hasattr(network, 'duck_call_schedule'):
@@ -3639,14 +3956,14 @@ shop_extra_magazine = 400
                     if hasattr(network, 'registration_complete'):
                         await self.notify_duck_detector(network)
                         now = time.time()
-                        for ch, when in list(network.channel_next_spawn.items()):
-                            if when and now >= when:
-                                if not await self.can_spawn_duck(ch, network):
-                                    network.channel_next_spawn[ch] = now + random.randint(5, 15)
-                                    continue
-                                # Clear schedule BEFORE spawning to prevent race conditions
-                                network.channel_next_spawn[ch] = None
-                                await self.spawn_duck(network, ch)
+                        due = [(ch, schedule) for ch, schedule in network.channel_schedule.items() if schedule.next_spawn and now >= schedule.next_spawn]
+                        for ch, schedule in due:
+                            if not await self.can_spawn_duck(ch, network):
+                                schedule.next_spawn = now + random.randint(5, 15)
+                                continue
+                            # Clear schedule BEFORE spawning to prevent race conditions
+                            schedule.next_spawn = None
+                            await self.spawn_duck(network, ch)
                     
                     
                     await asyncio.sleep(0.1)  # Small delay to prevent busy waiting
@@ -3726,7 +4043,8 @@ shop_extra_magazine = 400
                                AND (cs.xp > 0 OR cs.ducks_shot > 0)
                                ORDER BY {order_by}
                                LIMIT 10"""
-                players = self.db_backend.execute_query(query, (network.name, channel, self.config.get('DEFAULT', 'nickname', fallback='DuckHuntBot')), fetch=True)
+                await self.db_backend.flush()
+                players = await self.db_backend.execute_query(query, (network.name, network.normalized_channel(channel), self.config.get('DEFAULT', 'nickname', fallback='DuckHuntBot')), fetch=True)
                 
                 if not players:
                     await self.send_message(network, channel, "The scoreboard is empty. There are no top ducks.")
@@ -3772,7 +4090,7 @@ shop_extra_magazine = 400
             # Get player stats
             if self.data_storage == 'sql' and self.db_backend:
                 # SQL backend
-                stats = self.db_backend.get_channel_stats(target_user, network.name, channel)
+                stats = await self.db_backend.get_channel_stats(target_user, network.name, network.normalized_channel(channel))
                 
                 if not stats:
                     if target_user == user:
@@ -3785,8 +4103,8 @@ shop_extra_magazine = 400
                 self.apply_level_bonuses(stats)
             
             # Build response
-            xp = float(stats.get('xp', 0))
-            level = min(50, (int(xp) // 100) + 1)
+            xp = stats.get('xp', 0)
+            level = min(50, xp // 100 + 1)
             ducks_shot = stats.get('ducks_shot', 0)
             golden_ducks = stats.get('golden_ducks', 0)
             misses = stats.get('misses', 0)
@@ -3926,27 +4244,16 @@ shop_extra_magazine = 400
         while True:
             try:
                 # Read message from network
-                if network.writer:  # SSL connection
-                    line = await network.reader.readline()
-                    if not line:
-                        break
-                    try:
-                        line = line.decode('utf-8').strip()
-                    except UnicodeDecodeError as e:
-                        self.log_action(f"Unicode decode error on {network.name}: {e} - skipping malformed data")
-                        continue
-                else:  # Non-SSL connection
-                    data = await asyncio.get_event_loop().sock_recv(network.sock, 4096)
-                    if not data:
-                        break
-                    try:
-                        line = data.decode('utf-8').strip()
-                    except UnicodeDecodeError as e:
-                        self.log_action(f"Unicode decode error on {network.name}: {e} - skipping malformed data")
-                        continue
+                line = await network.reader.readline()
+                if not line:
+                    break
+                try:
+                    line = line.decode('utf-8').strip()
+                except UnicodeDecodeError as e:
+                    self.log_action(f"Unicode decode error on {network.name}: {e} - skipping malformed data")
+                    continue
                 
                 if line:
-                    self.log_message("RECV", line)
                     await self.process_message(line, network)
                     network.message_count += 1
                 else:
@@ -3969,15 +4276,15 @@ shop_extra_magazine = 400
                     await self.notify_duck_detector(network)
                     # Perform any due spawns per channel
                     now = time.time()
-                    for ch, when in list(network.channel_next_spawn.items()):
-                        if when and now >= when:
-                            # If channel can't accept a new duck yet, defer by 5-15s
-                            if not await self.can_spawn_duck(ch, network):
-                                network.channel_next_spawn[ch] = now + random.randint(5, 15)
-                                continue
-                            # Clear schedule BEFORE spawning to prevent race conditions
-                            network.channel_next_spawn[ch] = None
-                            await self.spawn_duck(network, ch)
+                    due = [(ch, schedule) for ch, schedule in network.channel_schedule.items() if schedule.next_spawn and now >= schedule.next_spawn]
+                    for ch, schedule in due:
+                        # If channel can't accept a new duck yet, defer by 5-15s
+                        if not await self.can_spawn_duck(ch, network):
+                            schedule.next_spawn = now + random.randint(5, 15)
+                            continue
+                        # Clear schedule BEFORE spawning to prevent race conditions
+                        schedule.next_spawn = None
+                        await self.spawn_duck(network, ch)
                     
                     # Check for duck call scheduled spawns
                     if hasattr(network, 'duck_call_schedule'):
@@ -4018,14 +4325,14 @@ shop_extra_magazine = 400
                     if hasattr(network, 'registration_complete'):
                         await self.notify_duck_detector(network)
                         now = time.time()
-                        for ch, when in list(network.channel_next_spawn.items()):
-                            if when and now >= when:
-                                if not await self.can_spawn_duck(ch, network):
-                                    network.channel_next_spawn[ch] = now + random.randint(5, 15)
-                                    continue
-                                # Clear schedule BEFORE spawning to prevent race conditions
-                                network.channel_next_spawn[ch] = None
-                                await self.spawn_duck(network, ch)
+                        due = [(ch, schedule) for ch, schedule in network.channel_schedule.items() if schedule.next_spawn and now >= schedule.next_spawn]
+                        for ch, schedule in due:
+                            if not await self.can_spawn_duck(ch, network):
+                                schedule.next_spawn = now + random.randint(5, 15)
+                                continue
+                            # Clear schedule BEFORE spawning to prevent race conditions
+                            schedule.next_spawn = None
+                            await self.spawn_duck(network, ch)
                     
                     await asyncio.sleep(0.1)  # Small delay to prevent busy waiting
                     if self.should_restart:
@@ -4052,43 +4359,69 @@ shop_extra_magazine = 400
     async def run(self):
         """Main bot loop"""
         self.log_action("DuckHunt Bot starting...")
+        # SIGTERM cancels run() like Ctrl-C does, so both reach the final save below
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except NotImplementedError:
+            pass  # No loop signal handlers on Windows
         
-        # Create tasks for each network
         tasks = []
-        self.log_action(f"Setting up {len(self.networks)} network(s)")
-        for network_name, network in self.networks.items():
-            self.log_action(f"Creating task for network: {network_name}")
-            task = asyncio.create_task(self.run_network(network))
-            tasks.append(task)
-            self.log_action(f"Task created for {network_name}")
-        
-        self.log_action("Starting network tasks...")
-        
-        # Run all network tasks concurrently
-        if tasks:
-            while not self.should_restart:
-                # Check if any task is done
-                done, pending = await asyncio.wait(tasks, timeout=1.0, return_when=asyncio.FIRST_COMPLETED)
-                if done:
-                    # A network task ended, restart flag should be set
-                    break
+        try:
+            await self.setup_backend()
+            
+            # Create tasks for each network
+            self.log_action(f"Setting up {len(self.networks)} network(s)")
+            for network_name, network in self.networks.items():
+                self.log_action(f"Creating task for network: {network_name}")
+                task = asyncio.create_task(self.run_network(network))
+                tasks.append(task)
+                self.log_action(f"Task created for {network_name}")
+            
+            self.log_action("Starting network tasks...")
+            
+            # Run all network tasks concurrently
+            if tasks:
+                while not self.should_restart:
+                    # Check if any task is done
+                    done, pending = await asyncio.wait(tasks, timeout=1.0, return_when=asyncio.FIRST_COMPLETED)
+                    if done:
+                        # A network task ended, restart flag should be set
+                        break
+            else:
+                self.log_action("No networks configured")
+        finally:
             # Cancel any remaining tasks
             for task in tasks:
                 if not task.done():
                     task.cancel()
             # Wait for cancellation to complete
             await asyncio.gather(*tasks, return_exceptions=True)
-        else:
-            self.log_action("No networks configured")
+            await self.shutdown_backend()
         
         if self.should_restart:
             self.log_action("Restart requested, exiting...")
+            self.flush_log_file()
             import os
             os._exit(0)
 
+    async def shutdown_backend(self):
+        """Stop the periodic save/flush tasks and write everything still pending"""
+        background = [task for task in (self._flush_task, self._save_task) if task]
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        self._flush_task = self._save_task = None
+        if self.db_backend:
+            await self.db_backend.flush()
+        else:
+            self.save_dirty_player_data()
+        self.log_action("Player data saved")
+        self.flush_log_file()
+
     async def _delayed_exit(self):
         """Delayed exit to avoid async context issues"""
         await asyncio.sleep(0.1)  # Brief delay to let QUIT messages send
+        self.flush_log_file()
         import os
         os._exit(0)
 
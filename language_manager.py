@@ -8,6 +8,13 @@ import json
 import os
 from typing import Dict, Optional
 
+# Optional faster JSON parser/serializer
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 class LanguageManager:
     def __init__(self, languages_dir="languages"):
         self.languages_dir = languages_dir
@@ -27,8 +34,8 @@ class LanguageManager:
                 lang_code = filename[:-5]  # Remove .json extension
                 try:
                     filepath = os.path.join(self.languages_dir, filename)
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        self.languages[lang_code] = json.load(f)
+                    with open(filepath, 'rb') as f:
+                        self.languages[lang_code] = orjson.loads(f.read()) if ORJSON_AVAILABLE else json.load(f)
                     print(f"Loaded language: {lang_code} - {self.languages[lang_code].get('language_name', 'Unknown')}")
                 except Exception as e:
                     print(f"Error loading language file {filename}: {e}")
@@ -140,8 +147,11 @@ class LanguageManager:
     def save_user_preferences(self, filename="language_prefs.json"):
         """Save user language preferences to file"""
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.user_languages, f, indent=2, ensure_ascii=False)
+            with open(filename, 'wb') as f:
+                if ORJSON_AVAILABLE:
+                    f.write(orjson.dumps(self.user_languages, option=orjson.OPT_INDENT_2))
+                else:
+                    f.write(json.dumps(self.user_languages, indent=2, ensure_ascii=False).encode('utf-8'))
         except Exception as e:
             print(f"Error saving language preferences: {e}")
     
@@ -149,8 +159,8 @@ class LanguageManager:
         """Load user language preferences from file"""
         if os.path.exists(filename):
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    self.user_languages = json.load(f)
+                with open(filename, 'rb') as f:
+                    self.user_languages = orjson.loads(f.read()) if ORJSON_AVAILABLE else json.load(f)
                 print(f"Loaded language preferences for {len(self.user_languages)} users")
             except Exception as e:
                 print(f"Error loading language preferences: {e}")